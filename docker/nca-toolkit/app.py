@@ -17,87 +17,184 @@
 
 
 from flask import Flask, request
-from queue import Queue
-from services.webhook import send_webhook
+from services.webhook_outbox import enqueue_webhook, get_webhook_dispatcher
+from services.job_executor import JobExecutor, QueuedJob, parse_endpoint_limits, CPU_POOL, IO_POOL
+from services.redis_job_queue import RedisJobExecutor, get_redis_client
 import threading
+import logging
 import uuid
 import os
 import time
 from version import BUILD_NUMBER  # Import the BUILD_NUMBER
-from app_utils import log_job_status, discover_and_register_blueprints  # Import the discover_and_register_blueprints function
+from app_utils import log_job_status, discover_and_register_blueprints, registered_tasks, get_task_name  # Import the discover_and_register_blueprints function
+from services.whisper_models import preload_models
+from services.cloud_storage import get_storage_provider
+from services.idempotency import get_idempotency_key, find_duplicate, subscribe_duplicate, notify_duplicates, IDEMPOTENCY_HEADER
+from config import WHISPER_PRELOAD_MODELS, REDIS_URL
 
 MAX_QUEUE_LENGTH = int(os.environ.get('MAX_QUEUE_LENGTH', 0))
+JOB_WORKERS_CPU = int(os.environ.get('JOB_WORKERS_CPU', 1))
+JOB_WORKERS_IO = int(os.environ.get('JOB_WORKERS_IO', 2))
+JOB_ENDPOINT_CONCURRENCY = parse_endpoint_limits(os.environ.get('JOB_ENDPOINT_CONCURRENCY', ''))
+JOB_QUEUE_BACKEND = os.environ.get('JOB_QUEUE_BACKEND', 'memory').lower()
+JOB_QUEUE_VISIBILITY_TIMEOUT = int(os.environ.get('JOB_QUEUE_VISIBILITY_TIMEOUT', 60))
+JOB_QUEUE_MAX_ATTEMPTS = int(os.environ.get('JOB_QUEUE_MAX_ATTEMPTS', 3))
 
 def create_app():
     app = Flask(__name__)
 
-    # Create a queue to hold tasks
-    task_queue = Queue()
-    queue_id = id(task_queue)  # Generate a single queue_id for this worker
-
-    # Function to process tasks from the queue
-    def process_queue():
-        while True:
-            job_id, data, task_func, queue_start_time = task_queue.get()
-            queue_time = time.time() - queue_start_time
-            run_start_time = time.time()
-            pid = os.getpid()  # Get the PID of the actual processing thread
-            
-            # Log job status as running
-            log_job_status(job_id, {
-                "job_status": "running",
-                "job_id": job_id,
-                "queue_id": queue_id,
-                "process_id": pid,
-                "response": None
-            })
-            
-            response = task_func()
-            run_time = time.time() - run_start_time
-            total_time = time.time() - queue_start_time
-
-            response_data = {
-                "endpoint": response[1],
-                "code": response[2],
-                "id": data.get("id"),
-                "job_id": job_id,
-                "response": response[0] if response[2] == 200 else None,
-                "message": "success" if response[2] == 200 else response[0],
-                "pid": pid,
-                "queue_id": queue_id,
-                "run_time": round(run_time, 3),
-                "queue_time": round(queue_time, 3),
-                "total_time": round(total_time, 3),
-                "queue_length": task_queue.qsize(),
-                "build_number": BUILD_NUMBER  # Add build number to response
-            }
-            
-            # Log job status as done
-            log_job_status(job_id, {
-                "job_status": "done",
-                "job_id": job_id,
-                "queue_id": queue_id,
-                "process_id": pid,
-                "response": response_data
-            })
-
-            # Only send webhook if webhook_url has an actual value (not an empty string)
-            if data.get("webhook_url") and data.get("webhook_url") != "":
-                send_webhook(data.get("webhook_url"), response_data)
-
-            task_queue.task_done()
-
-    # Start the queue processing in a separate thread
-    threading.Thread(target=process_queue, daemon=True).start()
+    # Function to process a task claimed by one of the executor's workers
+    def process_job(job):
+        job_id, data = job.job_id, job.data
+        queue_time = time.time() - job.queue_start_time
+        run_start_time = time.time()
+        pid = os.getpid()  # Get the PID of the actual processing thread
+        
+        # Log job status as running
+        log_job_status(job_id, {
+            "job_status": "running",
+            "job_id": job_id,
+            "queue_id": queue_id,
+            "process_id": pid,
+            "response": None
+        })
+        
+        response = job.task_func()
+        run_time = time.time() - run_start_time
+        total_time = time.time() - job.queue_start_time
+
+        response_data = {
+            "endpoint": response[1],
+            "code": response[2],
+            "id": data.get("id"),
+            "job_id": job_id,
+            "response": response[0] if response[2] == 200 else None,
+            "message": "success" if response[2] == 200 else response[0],
+            "pid": pid,
+            "queue_id": queue_id,
+            "run_time": round(run_time, 3),
+            "queue_time": round(queue_time, 3),
+            "total_time": round(total_time, 3),
+            "queue_length": executor.qsize(),
+            "build_number": BUILD_NUMBER  # Add build number to response
+        }
+        
+        # Log job status as done
+        log_job_status(job_id, {
+            "job_status": "done",
+            "job_id": job_id,
+            "queue_id": queue_id,
+            "process_id": pid,
+            "response": response_data
+        })
+
+        # Only send webhook if webhook_url has an actual value (not an empty string)
+        if data.get("webhook_url") and data.get("webhook_url") != "":
+            enqueue_webhook(data.get("webhook_url"), response_data)
+        notify_duplicates(job_id, response_data)
+
+    # Function to record a queued job that can no longer be run
+    def fail_job(job, message):
+        pid = os.getpid()
+        response_data = {
+            "endpoint": job.endpoint,
+            "code": 500,
+            "id": job.data.get("id"),
+            "job_id": job.job_id,
+            "response": None,
+            "message": message,
+            "pid": pid,
+            "queue_id": queue_id,
+            "queue_length": executor.qsize(),
+            "build_number": BUILD_NUMBER
+        }
+
+        log_job_status(job.job_id, {
+            "job_status": "done",
+            "job_id": job.job_id,
+            "queue_id": queue_id,
+            "process_id": pid,
+            "response": response_data
+        })
+
+        if job.data.get("webhook_url") and job.data.get("webhook_url") != "":
+            enqueue_webhook(job.data.get("webhook_url"), response_data)
+        notify_duplicates(job.job_id, response_data)
+
+    # Rebuild the callable for a job that was persisted by another process
+    def resolve_task(task_name, job_id, data, args, kwargs):
+        f = registered_tasks[task_name]
+        return lambda: f(job_id=job_id, data=data, *args, **kwargs)
+
+    # Create the executor that runs queued tasks on separate CPU and I/O worker pools
+    pool_sizes = {CPU_POOL: JOB_WORKERS_CPU, IO_POOL: JOB_WORKERS_IO}
+    if JOB_QUEUE_BACKEND == 'redis':
+        # Shared, durable queue: any worker process or container can claim the next job
+        executor = RedisJobExecutor(
+            process_job,
+            pool_sizes,
+            JOB_ENDPOINT_CONCURRENCY,
+            get_redis_client(REDIS_URL),
+            resolve_task,
+            fail_job,
+            visibility_timeout=JOB_QUEUE_VISIBILITY_TIMEOUT,
+            max_attempts=JOB_QUEUE_MAX_ATTEMPTS
+        )
+    else:
+        executor = JobExecutor(process_job, pool_sizes, JOB_ENDPOINT_CONCURRENCY)
+    queue_id = id(executor)  # Generate a single queue_id for this worker
+
+    # Warm the Whisper model registry in the background so boot is not delayed
+    if WHISPER_PRELOAD_MODELS:
+        threading.Thread(target=preload_models, daemon=True).start()
+
+    # Start webhook delivery now so deliveries left in the outbox by a previous run resume
+    try:
+        get_webhook_dispatcher()
+    except Exception as e:
+        logging.getLogger(__name__).error(f"Webhook outbox unavailable, webhooks will be sent inline: {e}")
+
+    # Build the storage provider once at startup; a misconfiguration is
+    # reported here and again by the first job that uploads
+    try:
+        get_storage_provider()
+    except ValueError as e:
+        logging.getLogger(__name__).warning(f"Storage provider not configured: {e}")
 
     # Decorator to add tasks to the queue or bypass it
-    def queue_task(bypass_queue=False):
+    def queue_task(bypass_queue=False, pool=CPU_POOL):
         def decorator(f):
             def wrapper(*args, **kwargs):
                 job_id = str(uuid.uuid4())
                 data = request.json if request.is_json else {}
                 pid = os.getpid()  # Get PID for non-queued tasks
                 start_time = time.time()
+
+                # Repeats of a request (same Idempotency-Key, or same endpoint and payload)
+                # attach to the original job instead of running it again
+                idempotency_key = None if bypass_queue else get_idempotency_key(
+                    request.path, data, request.headers.get(IDEMPOTENCY_HEADER))
+                duplicate = find_duplicate(idempotency_key, job_id) if idempotency_key else None
+                if duplicate is not None:
+                    if data.get("webhook_url"):
+                        # Post the original result to this request's own webhook
+                        # once the job finishes, or now if it already has
+                        subscribe_duplicate(duplicate, data["webhook_url"], data.get("id"))
+                    elif duplicate.get("job_status") == "done":
+                        # Replay the original result
+                        return duplicate["response"], duplicate["response"].get("code", 200)
+
+                    status_code = 202 if 'webhook_url' in data else 409
+                    return {
+                        "code": status_code,
+                        "id": data.get("id"),
+                        "job_id": duplicate.get("job_id"),
+                        "message": "processing" if status_code == 202 else "A request with the same idempotency key is still processing",
+                        "pid": pid,
+                        "queue_id": queue_id,
+                        "queue_length": executor.qsize(),
+                        "build_number": BUILD_NUMBER
+                    }, status_code
                 
                 if bypass_queue or 'webhook_url' not in data:
                     
@@ -124,7 +221,7 @@ def create_app():
                         "total_time": round(run_time, 3),
                         "pid": pid,
                         "queue_id": queue_id,
-                        "queue_length": task_queue.qsize(),
+                        "queue_length": executor.qsize(),
                         "build_number": BUILD_NUMBER  # Add build number to response
                     }
                     
@@ -136,10 +233,11 @@ def create_app():
                         "process_id": pid,
                         "response": response_obj
                     })
+                    notify_duplicates(job_id, response_obj)
                     
                     return response_obj, response[2]
                 else:
-                    if MAX_QUEUE_LENGTH > 0 and task_queue.qsize() >= MAX_QUEUE_LENGTH:
+                    if MAX_QUEUE_LENGTH > 0 and executor.qsize() >= MAX_QUEUE_LENGTH:
                         error_response = {
                             "code": 429,
                             "id": data.get("id"),
@@ -147,7 +245,7 @@ def create_app():
                             "message": f"MAX_QUEUE_LENGTH ({MAX_QUEUE_LENGTH}) reached",
                             "pid": pid,
                             "queue_id": queue_id,
-                            "queue_length": task_queue.qsize(),
+                            "queue_length": executor.qsize(),
                             "build_number": BUILD_NUMBER  # Add build number to response
                         }
                         
@@ -159,6 +257,7 @@ def create_app():
                             "process_id": pid,
                             "response": error_response
                         })
+                        notify_duplicates(job_id, error_response)
                         
                         return error_response, 429
                     
@@ -171,7 +270,17 @@ def create_app():
                         "response": None
                     })
                     
-                    task_queue.put((job_id, data, lambda: f(job_id=job_id, data=data, *args, **kwargs), start_time))
+                    executor.submit(QueuedJob(
+                        job_id,
+                        data,
+                        lambda: f(job_id=job_id, data=data, *args, **kwargs),
+                        request.path,
+                        pool,
+                        start_time,
+                        task_name=get_task_name(f),
+                        args=args,
+                        kwargs=kwargs
+                    ))
                     
                     return {
                         "code": 202,
@@ -181,7 +290,7 @@ def create_app():
                         "pid": pid,
                         "queue_id": queue_id,
                         "max_queue_length": MAX_QUEUE_LENGTH if MAX_QUEUE_LENGTH > 0 else "unlimited",
-                        "queue_length": task_queue.qsize(),
+                        "queue_length": executor.qsize(),
                         "build_number": BUILD_NUMBER  # Add build number to response
                     }, 202
             return wrapper
@@ -196,6 +305,10 @@ def create_app():
     # Use the discover_and_register_blueprints function to register all blueprints
     discover_and_register_blueprints(app)
 
+    # Start workers only once every route module has registered its tasks,
+    # so jobs persisted by a previous run can be resolved when claimed
+    executor.start()
+
     return app
 
 app = create_app()
@@ -19,10 +19,9 @@
 from flask import request, jsonify, current_app
 from functools import wraps
 import jsonschema
-import os
-import json
 import time
-from config import LOCAL_STORAGE_PATH
+from services.job_executor import CPU_POOL
+from services.job_store import get_job_store
 
 def validate_payload(schema):
     def decorator(f):
@@ -41,29 +40,34 @@ def validate_payload(schema):
 
 def log_job_status(job_id, data):
     """
-    Log job status to a file in the STORAGE_PATH/jobs folder
+    Record the latest status of a job in the configured job store
     
     Args:
         job_id (str): The unique job ID
-        data (dict): Data to write to the log file
+        data (dict): Status record to store for the job
     """
-    jobs_dir = os.path.join(LOCAL_STORAGE_PATH, 'jobs')
-    
-    # Create jobs directory if it doesn't exist
-    if not os.path.exists(jobs_dir):
-        os.makedirs(jobs_dir, exist_ok=True)
-    
-    # Create or update the job log file
-    job_file = os.path.join(jobs_dir, f"{job_id}.json")
-    
-    # Write data directly to file
-    with open(job_file, 'w') as f:
-        json.dump(data, f, indent=2)
+    get_job_store().save(job_id, data)
+
+# Endpoint functions wrapped by queue_task_wrapper, keyed by task name, so jobs
+# persisted outside this process can be resolved back to their function
+registered_tasks = {}
+
+def get_task_name(f):
+    return f"{f.__module__}.{f.__name__}"
 
-def queue_task_wrapper(bypass_queue=False):
+def queue_task_wrapper(bypass_queue=False, pool=CPU_POOL):
+    """
+    Run the decorated endpoint through the app's job queue.
+
+    Args:
+        bypass_queue (bool): Run immediately in the request thread instead of queueing
+        pool (str): Worker pool for queued jobs, "cpu" for encodes and transcription
+            or "io" for jobs that mostly wait on the network
+    """
     def decorator(f):
+        registered_tasks[get_task_name(f)] = f
         def wrapper(*args, **kwargs):
-            return current_app.queue_task(bypass_queue=bypass_queue)(f)(*args, **kwargs)
+            return current_app.queue_task(bypass_queue=bypass_queue, pool=pool)(f)(*args, **kwargs)
         return wrapper
     return decorator
 
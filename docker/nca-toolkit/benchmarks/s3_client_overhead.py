@@ -0,0 +1,91 @@
+# Copyright (c) 2025 Stephen G. Pope
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+
+"""
+Measure per-upload overhead of creating an S3 client for every upload versus
+reusing the shared client from services.s3_toolkit.
+
+Uses the same S3_ENDPOINT_URL, S3_ACCESS_KEY, S3_SECRET_KEY, S3_BUCKET_NAME
+and S3_REGION variables as the API. Objects are written under a
+benchmark/ prefix and deleted afterwards.
+
+    python benchmarks/s3_client_overhead.py --count 50 --size 65536
+"""
+
+import os
+import sys
+import time
+import uuid
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('API_KEY', 'benchmark')
+
+import boto3
+from services.s3_toolkit import get_s3_client
+
+
+def fresh_client(endpoint_url, access_key, secret_key, region):
+    """What every upload used to do."""
+    session = boto3.Session(
+        aws_access_key_id=access_key,
+        aws_secret_access_key=secret_key,
+        region_name=region or None
+    )
+    return session.client('s3', endpoint_url=endpoint_url or None)
+
+
+def run(label, make_client, count, body, bucket):
+    timings = []
+    keys = []
+    for _ in range(count):
+        key = f"benchmark/{uuid.uuid4()}"
+        start = time.perf_counter()
+        make_client().put_object(Bucket=bucket, Key=key, Body=body)
+        timings.append((time.perf_counter() - start) * 1000)
+        keys.append(key)
+
+    cleanup = get_s3_client(*CREDENTIALS)
+    for i in range(0, len(keys), 1000):
+        cleanup.delete_objects(Bucket=bucket, Delete={'Objects': [{'Key': key} for key in keys[i:i + 1000]]})
+
+    print(f"{label:>14}: mean {statistics.mean(timings):7.1f} ms  median {statistics.median(timings):7.1f} ms  "
+          f"p95 {sorted(timings)[int(len(timings) * 0.95) - 1]:7.1f} ms")
+    return statistics.median(timings)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=50, help='uploads per variant')
+    parser.add_argument('--size', type=int, default=64 * 1024, help='object size in bytes')
+    args = parser.parse_args()
+
+    CREDENTIALS = (
+        os.getenv('S3_ENDPOINT_URL'),
+        os.getenv('S3_ACCESS_KEY'),
+        os.getenv('S3_SECRET_KEY'),
+        os.environ.get('S3_REGION', '')
+    )
+    bucket = os.environ['S3_BUCKET_NAME']
+    body = os.urandom(args.size)
+
+    print(f"{args.count} uploads of {args.size} bytes to {CREDENTIALS[0] or 'AWS'}/{bucket}")
+    before = run("client per call", lambda: fresh_client(*CREDENTIALS), args.count, body, bucket)
+    after = run("shared client", lambda: get_s3_client(*CREDENTIALS), args.count, body, bucket)
+    print(f"Per-upload overhead saved: {before - after:.1f} ms (median)")
@@ -0,0 +1,124 @@
+# Copyright (c) 2025 Stephen G. Pope
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+
+"""
+Compare transcription backends on fixture audio: real-time factor (processing
+time divided by audio duration, lower is faster) and word error rate against
+reference transcripts.
+
+Each fixture is an audio or video file with a reference transcript next to
+it under the same name with a .txt extension (e.g. interview.mp3 and
+interview.txt). Each fixture's audio is extracted to 16 kHz once, as the API
+does, and models are loaded once per backend before timing starts.
+
+    python benchmarks/transcription_backends.py fixtures/*.mp3 --model base
+    python benchmarks/transcription_backends.py fixtures/*.wav --backends whisper faster-whisper --runs 3
+"""
+
+import os
+import re
+import sys
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('API_KEY', 'benchmark')
+
+from services.transcription_backends import TRANSCRIPTION_BACKENDS
+from services.audio_extraction import extract_audio, pcm_duration, read_pcm
+from services.whisper_models import whisper_model
+
+
+def normalize(text):
+    """Lowercase and strip punctuation so WER counts word differences only."""
+    return re.sub(r"[^\w\s']", " ", text.lower()).split()
+
+
+def word_error_rate(reference, hypothesis):
+    """(substitutions + deletions + insertions) / reference words, by word-level edit distance."""
+    ref = normalize(reference)
+    hyp = normalize(hypothesis)
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, start=1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_word in enumerate(hyp, start=1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ref_word != hyp_word)
+            )
+        previous = current
+    return previous[-1] / max(1, len(ref))
+
+
+def run(backend, model_size, fixtures, runs, language):
+    options = {"verbose": None}
+    if language:
+        options["language"] = language
+
+    # The model is loaded on entering the block, before any run is timed
+    with whisper_model(model_size, backend=backend) as model:
+        rtfs = []
+        wers = []
+        for path, reference, audio_path, duration in fixtures:
+            audio = read_pcm(audio_path)
+            timings = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                result = model.transcribe(audio, **options)
+                timings.append(time.perf_counter() - start)
+            rtf = statistics.median(timings) / duration
+            wer = word_error_rate(reference, result["text"])
+            rtfs.append(rtf)
+            wers.append(wer)
+            print(f"{backend:>15}  {os.path.basename(path):<30} {duration:7.1f}s  RTF {rtf:6.3f}  WER {wer:6.1%}")
+
+    total_duration = sum(fixture[-1] for fixture in fixtures)
+    # Weight by duration so a long fixture counts more than a short one
+    mean_rtf = sum(rtf * fixture[-1] for rtf, fixture in zip(rtfs, fixtures)) / total_duration
+    return mean_rtf, statistics.mean(wers)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('audio', nargs='+', help='fixture files, each with a .txt reference transcript beside it')
+    parser.add_argument('--backends', nargs='+', default=list(TRANSCRIPTION_BACKENDS), choices=list(TRANSCRIPTION_BACKENDS))
+    parser.add_argument('--model', default='base', help='model size for every backend')
+    parser.add_argument('--runs', type=int, default=1, help='timed runs per fixture; the median is reported')
+    parser.add_argument('--language', help='skip language detection, e.g. en')
+    args = parser.parse_args()
+
+    fixtures = []
+    for path in args.audio:
+        with open(os.path.splitext(path)[0] + '.txt', encoding='utf-8') as f:
+            reference = f.read()
+        audio_path = extract_audio(path)
+        fixtures.append((path, reference, audio_path, pcm_duration(audio_path)))
+
+    summary = {}
+    try:
+        for backend in args.backends:
+            summary[backend] = run(backend, args.model, fixtures, args.runs, args.language)
+    finally:
+        for fixture in fixtures:
+            os.remove(fixture[2])
+
+    print()
+    for backend, (rtf, wer) in summary.items():
+        print(f"{backend:>15}  mean RTF {rtf:6.3f} ({1 / rtf:5.1f}x real time)  mean WER {wer:6.1%}")
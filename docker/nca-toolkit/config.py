@@ -31,13 +31,142 @@ LOCAL_STORAGE_PATH = os.environ.get('LOCAL_STORAGE_PATH', '/tmp')
 GCP_SA_CREDENTIALS = os.environ.get('GCP_SA_CREDENTIALS', '')
 GCP_BUCKET_NAME = os.environ.get('GCP_BUCKET_NAME', '')
 
+# How media URLs are given to FFmpeg: auto (stream when the server supports
+# range requests), stream (always pass the URL) or download (always download first)
+MEDIA_INPUT_MODE = os.environ.get('MEDIA_INPUT_MODE', 'auto').lower()
+
+# Local cache of downloaded inputs, keyed by URL plus ETag/Last-Modified; 0 disables it
+INPUT_CACHE_DIR = os.environ.get('INPUT_CACHE_DIR', os.path.join(LOCAL_STORAGE_PATH, 'input_cache'))
+INPUT_CACHE_MAX_MB = int(os.environ.get('INPUT_CACHE_MAX_MB', 2048))
+
+# Whisper results keyed by media content hash, model and options; 0 disables it
+TRANSCRIPTION_CACHE_DIR = os.environ.get('TRANSCRIPTION_CACHE_DIR', os.path.join(LOCAL_STORAGE_PATH, 'transcription_cache'))
+TRANSCRIPTION_CACHE_MAX_MB = int(os.environ.get('TRANSCRIPTION_CACHE_MAX_MB', 256))
+
+# /v1/video/split runs one FFmpeg per split, up to this many at once, when the
+# splits are disjoint and each at least SPLIT_PARALLEL_MIN_SECONDS long;
+# otherwise all splits are encoded from a single decode of the input
+SPLIT_PARALLEL_WORKERS = int(os.environ.get('SPLIT_PARALLEL_WORKERS', 2))
+SPLIT_PARALLEL_MIN_SECONDS = float(os.environ.get('SPLIT_PARALLEL_MIN_SECONDS', 300))
+
+# Connections each shared S3 client keeps open; bounds concurrent requests per client
+S3_MAX_POOL_CONNECTIONS = int(os.environ.get('S3_MAX_POOL_CONNECTIONS', 32))
+
+# Files uploaded at once by cloud_storage.upload_files for multi-file outputs
+UPLOAD_BATCH_WORKERS = int(os.environ.get('UPLOAD_BATCH_WORKERS', 4))
+
+# Pipe FFmpeg output straight into a multipart upload instead of writing it to
+# LOCAL_STORAGE_PATH first, for streamable formats (fragmented MP4, MPEG-TS, MP3, WAV, WebM, ...)
+STREAM_OUTPUT_UPLOADS = os.environ.get('STREAM_OUTPUT_UPLOADS', 'false').lower() == 'true'
+
+# Multipart transfer tuning: part size, parts in flight per upload, and bytes
+# of parts a streaming upload may buffer before the producer is paused
+S3_MULTIPART_CHUNK_MB = int(os.environ.get('S3_MULTIPART_CHUNK_MB', 16))
+S3_MAX_CONCURRENCY = int(os.environ.get('S3_MAX_CONCURRENCY', 8))
+S3_UPLOAD_MEMORY_MB = int(os.environ.get('S3_UPLOAD_MEMORY_MB', 256))
+
+# Resumable multipart sessions; recorded uploads older than S3_ORPHAN_UPLOAD_HOURS
+# are aborted (0 disables the sweep)
+S3_UPLOAD_SESSION_DIR = os.environ.get('S3_UPLOAD_SESSION_DIR', os.path.join(LOCAL_STORAGE_PATH, 's3_upload_sessions'))
+S3_ORPHAN_UPLOAD_HOURS = float(os.environ.get('S3_ORPHAN_UPLOAD_HOURS', 24))
+
+# Inputs downloaded at once by multi-input endpoints, and at most this many
+# concurrent downloads from any one host across all jobs in the process
+DOWNLOAD_WORKERS = int(os.environ.get('DOWNLOAD_WORKERS', 4))
+DOWNLOAD_HOST_CONCURRENCY = int(os.environ.get('DOWNLOAD_HOST_CONCURRENCY', 4))
+
+# Shared HTTP session for downloads and webhooks: timeouts in seconds (the read
+# timeout is per wait for data, not per transfer), retries with exponential
+# backoff, and keep-alive pools for up to HTTP_POOL_CONNECTIONS hosts with
+# HTTP_POOL_MAXSIZE connections each
+HTTP_CONNECT_TIMEOUT = float(os.environ.get('HTTP_CONNECT_TIMEOUT', 10))
+HTTP_READ_TIMEOUT = float(os.environ.get('HTTP_READ_TIMEOUT', 300))
+HTTP_MAX_RETRIES = int(os.environ.get('HTTP_MAX_RETRIES', 3))
+HTTP_RETRY_BACKOFF = float(os.environ.get('HTTP_RETRY_BACKOFF', 0.5))
+HTTP_POOL_CONNECTIONS = int(os.environ.get('HTTP_POOL_CONNECTIONS', 16))
+HTTP_POOL_MAXSIZE = int(os.environ.get('HTTP_POOL_MAXSIZE', 32))
+
+# Storage provider for outputs: auto (S3 if S3_ENDPOINT_URL is set, else GCP),
+# s3, gcp or local. The local provider publishes outputs into LOCAL_OUTPUT_DIR,
+# a volume shared with consumers on the same host, and returns URLs under
+# LOCAL_OUTPUT_BASE_URL (or file:// URLs when it is not set)
+STORAGE_PROVIDER = os.environ.get('STORAGE_PROVIDER', 'auto').lower()
+LOCAL_OUTPUT_DIR = os.environ.get('LOCAL_OUTPUT_DIR', '')
+LOCAL_OUTPUT_BASE_URL = os.environ.get('LOCAL_OUTPUT_BASE_URL', '').rstrip('/')
+
+# Directories file:// inputs (and URLs under LOCAL_OUTPUT_BASE_URL) may be read
+# from without a download; comma-separated, defaults to LOCAL_OUTPUT_DIR
+LOCAL_INPUT_DIRS = [path.strip() for path in os.environ.get('LOCAL_INPUT_DIRS', LOCAL_OUTPUT_DIR).split(',') if path.strip()]
+
+# Redis/Valkey connection used by optional Redis-backed components
+REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+
+# Job status store settings
+JOB_STORE_BACKEND = os.environ.get('JOB_STORE_BACKEND', 'sqlite')
+JOB_STATUS_TTL = int(os.environ.get('JOB_STATUS_TTL', 0))
+JOB_STORE_MIGRATE = os.environ.get('JOB_STORE_MIGRATE', 'true').lower() == 'true'
+
+# Idempotency: duplicate requests (same Idempotency-Key header, or with
+# IDEMPOTENCY_DERIVE_KEYS the same endpoint and payload) within
+# IDEMPOTENCY_WINDOW seconds attach to the original job instead of running
+# again; 0 disables it. Keys live in SQLite or Redis (default: Redis when
+# JOB_STORE_BACKEND is redis)
+IDEMPOTENCY_WINDOW = int(os.environ.get('IDEMPOTENCY_WINDOW', 600))
+IDEMPOTENCY_DERIVE_KEYS = os.environ.get('IDEMPOTENCY_DERIVE_KEYS', 'false').lower() == 'true'
+IDEMPOTENCY_STORE_BACKEND = os.environ.get('IDEMPOTENCY_STORE_BACKEND', 'redis' if JOB_STORE_BACKEND.lower() == 'redis' else 'sqlite').lower()
+
+# Webhook outbox: results are queued in SQLite or Redis (default: Redis when
+# JOB_STORE_BACKEND is redis) and delivered by WEBHOOK_WORKERS threads, retried
+# with exponential backoff from WEBHOOK_RETRY_BACKOFF seconds up to
+# WEBHOOK_RETRY_MAX_DELAY, and dead-lettered after WEBHOOK_MAX_ATTEMPTS attempts
+WEBHOOK_OUTBOX_BACKEND = os.environ.get('WEBHOOK_OUTBOX_BACKEND', 'redis' if JOB_STORE_BACKEND.lower() == 'redis' else 'sqlite').lower()
+WEBHOOK_WORKERS = int(os.environ.get('WEBHOOK_WORKERS', 4))
+WEBHOOK_TIMEOUT = float(os.environ.get('WEBHOOK_TIMEOUT', 30))
+WEBHOOK_MAX_ATTEMPTS = int(os.environ.get('WEBHOOK_MAX_ATTEMPTS', 6))
+WEBHOOK_RETRY_BACKOFF = float(os.environ.get('WEBHOOK_RETRY_BACKOFF', 5))
+WEBHOOK_RETRY_MAX_DELAY = float(os.environ.get('WEBHOOK_RETRY_MAX_DELAY', 600))
+
+# Whisper model registry settings
+WHISPER_PRELOAD_MODELS = os.environ.get('WHISPER_PRELOAD_MODELS', '')
+WHISPER_MODEL_MEMORY_MB = int(os.environ.get('WHISPER_MODEL_MEMORY_MB', 0))
+WHISPER_DEVICE = os.environ.get('WHISPER_DEVICE', '')
+
+# Speech recognition engine: "whisper" (openai-whisper) or "faster-whisper"
+# (CTranslate2, int8 on CPU unless FASTER_WHISPER_COMPUTE_TYPE says otherwise)
+TRANSCRIPTION_BACKEND = os.environ.get('TRANSCRIPTION_BACKEND', 'whisper').lower()
+FASTER_WHISPER_COMPUTE_TYPE = os.environ.get('FASTER_WHISPER_COMPUTE_TYPE', '')
+FASTER_WHISPER_CPU_THREADS = int(os.environ.get('FASTER_WHISPER_CPU_THREADS', 0))
+
+# Long-form transcription: media of at least TRANSCRIBE_LONG_FORM_MIN_SECONDS is
+# split at silences into chunks of about TRANSCRIBE_CHUNK_SECONDS and transcribed
+# by TRANSCRIBE_PARALLEL_WORKERS worker processes (0 disables it)
+TRANSCRIBE_PARALLEL_WORKERS = int(os.environ.get('TRANSCRIBE_PARALLEL_WORKERS', 0))
+TRANSCRIBE_LONG_FORM_MIN_SECONDS = float(os.environ.get('TRANSCRIBE_LONG_FORM_MIN_SECONDS', 600))
+TRANSCRIBE_CHUNK_SECONDS = float(os.environ.get('TRANSCRIBE_CHUNK_SECONDS', 300))
+TRANSCRIBE_CHUNK_OVERLAP = float(os.environ.get('TRANSCRIBE_CHUNK_OVERLAP', 2))
+TRANSCRIBE_SILENCE_NOISE = os.environ.get('TRANSCRIBE_SILENCE_NOISE', '-30dB')
+TRANSCRIBE_SILENCE_MIN_DURATION = float(os.environ.get('TRANSCRIBE_SILENCE_MIN_DURATION', 0.5))
+
+# /v1/media/transcribe/batch: clips per request, and clips of up to 30 seconds
+# decoded together in one model pass
+TRANSCRIBE_BATCH_MAX_ITEMS = int(os.environ.get('TRANSCRIBE_BATCH_MAX_ITEMS', 100))
+TRANSCRIBE_BATCH_SIZE = int(os.environ.get('TRANSCRIBE_BATCH_SIZE', 8))
+
+# /v1/media/transcribe/stream: length of the silence-aligned chunks transcribed
+# one after another, and the minimum seconds between job store progress writes
+TRANSCRIBE_STREAM_CHUNK_SECONDS = float(os.environ.get('TRANSCRIBE_STREAM_CHUNK_SECONDS', 60))
+TRANSCRIBE_PROGRESS_INTERVAL = float(os.environ.get('TRANSCRIBE_PROGRESS_INTERVAL', 2))
+# Streams open at once in each worker process; more are refused with a 429
+TRANSCRIBE_STREAM_MAX_CONCURRENT = int(os.environ.get('TRANSCRIBE_STREAM_MAX_CONCURRENT', 1))
+
 def validate_env_vars(provider):
 
     """ Validate the necessary environment variables for the selected storage provider """
     required_vars = {
         'GCP': ['GCP_BUCKET_NAME', 'GCP_SA_CREDENTIALS'],
         'S3': ['S3_ENDPOINT_URL', 'S3_ACCESS_KEY', 'S3_SECRET_KEY', 'S3_BUCKET_NAME', 'S3_REGION'],
-        'S3_DO': ['S3_ENDPOINT_URL', 'S3_ACCESS_KEY', 'S3_SECRET_KEY']
+        'S3_DO': ['S3_ENDPOINT_URL', 'S3_ACCESS_KEY', 'S3_SECRET_KEY'],
+        'LOCAL': ['LOCAL_OUTPUT_DIR']
     }
     
     missing_vars = [var for var in required_vars[provider] if not os.getenv(var)]
@@ -21,6 +21,7 @@ import logging
 from flask import Blueprint, request, jsonify
 import threading
 import requests
+from services import http_client
 import uuid
 import json
 from google.oauth2.service_account import Credentials
@@ -86,7 +87,7 @@ def initiate_resumable_upload(filename, folder_id, mime_type='application/octet-
         'name': filename,
         'parents': [folder_id]
     }
-    response = requests.post(url, headers=headers, data=json.dumps(metadata))
+    response = http_client.post(url, headers=headers, data=json.dumps(metadata))
     response.raise_for_status()
     upload_url = response.headers['Location']
     return upload_url
@@ -106,7 +107,7 @@ def upload_file_in_chunks(file_url, upload_url, total_size, job_id, chunk_size):
         active_uploads.append(progress)
 
     try:
-        with requests.get(file_url, stream=True) as r:
+        with http_client.get(file_url, stream=True) as r:
             r.raise_for_status()
             iterator = r.iter_content(chunk_size=chunk_size)
             for chunk in iterator:
@@ -120,7 +121,7 @@ def upload_file_in_chunks(file_url, upload_url, total_size, job_id, chunk_size):
                             'Content-Range': content_range,
                         }
                         try:
-                            upload_response = requests.put(
+                            upload_response = http_client.put(
                                 upload_url,
                                 headers=headers,
                                 data=chunk
@@ -175,7 +176,7 @@ def upload_file_in_chunks(file_url, upload_url, total_size, job_id, chunk_size):
     "required": ["file_url", "filename", "folder_id"],
     "additionalProperties": False
 })
-@queue_task_wrapper(bypass_queue=False)
+@queue_task_wrapper(bypass_queue=False, pool="io")
 def gdrive_upload(job_id, data):
     logger.info(f"Processing Job ID: {job_id}")
 
@@ -190,15 +191,11 @@ def gdrive_upload(job_id, data):
         mime_type = data.get('mime_type', 'application/octet-stream')
         chunk_size = data.get('chunk_size', 5 * 1024 * 1024)  # Default to 5 MB
 
-        # Get the total size of the file
+        # Get the total size of the file from the GET headers; the body is not read here
         try:
-            head_response = requests.head(file_url, allow_redirects=True, timeout=30)
-            head_response.raise_for_status()
-            total_size = int(head_response.headers.get('Content-Length', 0))
-            
-            get_response = requests.get(file_url, stream=True, timeout=30)
-            get_response.raise_for_status()
-            total_size = int(get_response.headers.get('Content-Length', 0))
+            with http_client.get(file_url, stream=True) as get_response:
+                get_response.raise_for_status()
+                total_size = int(get_response.headers.get('Content-Length', 0))
             if total_size == 0:
                 raise ValueError("Content-Length header is missing or zero")
         except requests.exceptions.RequestException as e:
@@ -36,7 +36,8 @@ logger = logging.getLogger(__name__)
         "output": {"type": "string", "enum": ["transcript", "srt", "vtt", "ass"]},
         "webhook_url": {"type": "string", "format": "uri"},
         "max_chars": {"type": "integer"},
-        "id": {"type": "string"}
+        "id": {"type": "string"},
+        "use_cache": {"type": "boolean"}
     },
     "required": ["media_url"],
     "additionalProperties": False
@@ -48,11 +49,12 @@ def transcribe(job_id, data):
     webhook_url = data.get('webhook_url')
     max_chars = data.get('max_chars', 56)
     id = data.get('id')
+    use_cache = data.get('use_cache', True)
 
     logger.info(f"Job {job_id}: Received transcription request for {media_url}")
 
     try:
-        result = process_transcription(media_url, output, max_chars)
+        result = process_transcription(media_url, output, max_chars, use_cache=use_cache)
         logger.info(f"Job {job_id}: Transcription process completed successfully")
 
         # If the result is a file path, upload it using the unified upload_file() method
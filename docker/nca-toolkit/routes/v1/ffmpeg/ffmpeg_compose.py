@@ -20,7 +20,7 @@ import os
 import logging
 from flask import Blueprint, request, jsonify
 from app_utils import *
-from services.v1.ffmpeg.ffmpeg_compose import process_ffmpeg_compose
+from services.v1.ffmpeg.ffmpeg_compose import process_ffmpeg_compose, can_stream_compose_output
 from services.authentication import authenticate
 from services.cloud_storage import upload_file
 
@@ -38,6 +38,7 @@ logger = logging.getLogger(__name__)
                 "type": "object",
                 "properties": {
                     "file_url": {"type": "string", "format": "uri"},
+                    "input_mode": {"type": "string", "enum": ["auto", "stream", "download"]},
                     "options": {
                         "type": "array",
                         "items": {
@@ -117,7 +118,12 @@ def ffmpeg_api(job_id, data):
     logger.info(f"Job {job_id}: Received flexible FFmpeg request")
 
     try:
-        output_filenames, metadata = process_ffmpeg_compose(data, job_id)
+        stream_to_storage = can_stream_compose_output(data)
+        output_filenames, metadata = process_ffmpeg_compose(data, job_id, stream_to_storage=stream_to_storage)
+
+        if stream_to_storage:
+            # The output was piped straight to cloud storage; output_filenames holds its URL
+            return [{"file_url": output_filenames[0]}], "/v1/ffmpeg/compose", 200
         
         # Upload output files to GCP and create result array
         output_urls = []
@@ -20,6 +20,7 @@ import logging
 from services.v1.media.convert.media_convert import process_media_convert
 from services.authentication import authenticate
 from services.cloud_storage import upload_file
+from services.ffmpeg_stream import can_stream_output
 import os
 
 v1_media_convert_bp = Blueprint('v1_media_convert', __name__)
@@ -58,6 +59,7 @@ def convert_media_format(job_id, data):
     logger.info(f"Job {job_id}: Received media conversion request for media URL: {media_url} to format: {output_format}")
 
     try:
+        stream_to_storage = can_stream_output(output_format)
         output_file = process_media_convert(
             media_url, 
             job_id, 
@@ -67,11 +69,13 @@ def convert_media_format(job_id, data):
             video_crf,
             audio_codec,
             audio_bitrate,
-            webhook_url
+            webhook_url,
+            stream_to_storage=stream_to_storage
         )
         logger.info(f"Job {job_id}: Media format conversion completed successfully")
 
-        cloud_url = upload_file(output_file)
+        # A streamed conversion is already in cloud storage
+        cloud_url = output_file if stream_to_storage else upload_file(output_file)
         logger.info(f"Job {job_id}: Converted media uploaded to cloud storage: {cloud_url}")
         
         return cloud_url, "/v1/media/convert", 200
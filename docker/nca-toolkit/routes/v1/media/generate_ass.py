@@ -81,6 +81,7 @@ logger = logging.getLogger(__name__)
             }
         },
         "language": {"type": "string"},
+        "use_cache": {"type": "boolean"},
         "webhook_url": {"type": "string", "format": "uri"},
         "id": {"type": "string"}
     },
@@ -104,6 +105,7 @@ def generate_ass_v1(job_id, data):
     language = data.get('language', 'auto')
     canvas_width = data.get('canvas_width')
     canvas_height = data.get('canvas_height')
+    use_cache = data.get('use_cache', True)
 
     logger.info(f"Job {job_id}: Received ASS generation request for {media_url}")
     logger.info(f"Job {job_id}: Settings received: {settings}")
@@ -120,7 +122,8 @@ def generate_ass_v1(job_id, data):
             job_id=job_id,
             language=language,
             PlayResX=canvas_width,
-            PlayResY=canvas_height
+            PlayResY=canvas_height,
+            use_cache=use_cache
         )
         if isinstance(output, dict) and 'error' in output:
             if 'available_fonts' in output:
@@ -19,10 +19,10 @@
 from flask import Blueprint
 from app_utils import *
 import logging
-import os
 from services.v1.media.media_transcribe import process_transcribe_media
 from services.authentication import authenticate
-from services.cloud_storage import upload_file
+from services.cloud_storage import upload_files
+from services.transcription_backends import TRANSCRIPTION_BACKENDS
 
 v1_media_transcribe_bp = Blueprint('v1_media_transcribe', __name__)
 logger = logging.getLogger(__name__)
@@ -42,7 +42,9 @@ logger = logging.getLogger(__name__)
         "language": {"type": "string"},
         "webhook_url": {"type": "string", "format": "uri"},
         "id": {"type": "string"},
-        "words_per_line": {"type": "integer", "minimum": 1}
+        "words_per_line": {"type": "integer", "minimum": 1},
+        "use_cache": {"type": "boolean"},
+        "backend": {"type": "string", "enum": list(TRANSCRIPTION_BACKENDS)}
     },
     "required": ["media_url"],
     "additionalProperties": False
@@ -60,14 +62,16 @@ def transcribe(job_id, data):
     webhook_url = data.get('webhook_url')
     id = data.get('id')
     words_per_line = data.get('words_per_line', None)
+    use_cache = data.get('use_cache', True)
+    backend = data.get('backend')
 
     logger.info(f"Job {job_id}: Received transcription request for {media_url}")
 
     try:
-        result = process_transcribe_media(media_url, task, include_text, include_srt, include_segments, word_timestamps, response_type, language, job_id, words_per_line)
+        result = process_transcribe_media(media_url, task, include_text, include_srt, include_segments, word_timestamps, response_type, language, job_id, words_per_line, use_cache, backend)
         logger.info(f"Job {job_id}: Transcription process completed successfully")
 
-        # If the result is a file path, upload it using the unified upload_file() method
+        # If the result is a file path, upload it using the unified upload_files() method
         if response_type == "direct":
            
             result_json = {
@@ -83,23 +87,21 @@ def transcribe(job_id, data):
 
         else:
 
+            # Upload the requested files concurrently; each is removed once uploaded
+            text_upload, srt_upload, segments_upload = upload_files([
+                result[0] if include_text is True else None,
+                result[1] if include_srt is True else None,
+                result[2] if include_segments is True else None
+            ])
+
             cloud_urls = {
                 "text": None,
                 "srt": None,
                 "segments": None,
-                "text_url": upload_file(result[0]) if include_text is True else None,
-                "srt_url": upload_file(result[1]) if include_srt is True else None,
-                "segments_url": upload_file(result[2]) if include_segments is True else None,
+                "text_url": text_upload["file_url"] if text_upload else None,
+                "srt_url": srt_upload["file_url"] if srt_upload else None,
+                "segments_url": segments_upload["file_url"] if segments_upload else None,
             }
-
-            if include_text is True:
-                os.remove(result[0])  # Remove the temporary file after uploading
-            
-            if include_srt is True:
-                os.remove(result[1])
-
-            if include_segments is True:
-                os.remove(result[2])
             
             return cloud_urls, "/v1/transcribe/media", 200
 
@@ -0,0 +1,87 @@
+# Copyright (c) 2025 Stephen G. Pope
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+
+from flask import Blueprint
+from app_utils import *
+import logging
+from services.v1.media.media_transcribe_batch import process_transcribe_batch
+from services.authentication import authenticate
+from services.transcription_backends import TRANSCRIPTION_BACKENDS
+from config import TRANSCRIBE_BATCH_MAX_ITEMS
+
+v1_media_transcribe_batch_bp = Blueprint('v1_media_transcribe_batch', __name__)
+logger = logging.getLogger(__name__)
+
+@v1_media_transcribe_batch_bp.route('/v1/media/transcribe/batch', methods=['POST'])
+@authenticate
+@validate_payload({
+    "type": "object",
+    "properties": {
+        "media_urls": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "media_url": {"type": "string", "format": "uri"},
+                    "id": {"type": "string"}
+                },
+                "required": ["media_url"],
+                "additionalProperties": False
+            },
+            "minItems": 1,
+            "maxItems": TRANSCRIBE_BATCH_MAX_ITEMS
+        },
+        "task": {"type": "string", "enum": ["transcribe", "translate"]},
+        "include_text": {"type": "boolean"},
+        "include_srt": {"type": "boolean"},
+        "include_segments": {"type": "boolean"},
+        "word_timestamps": {"type": "boolean"},
+        "language": {"type": "string"},
+        "use_cache": {"type": "boolean"},
+        "backend": {"type": "string", "enum": list(TRANSCRIPTION_BACKENDS)},
+        "webhook_url": {"type": "string", "format": "uri"},
+        "id": {"type": "string"}
+    },
+    "required": ["media_urls"],
+    "additionalProperties": False
+})
+@queue_task_wrapper(bypass_queue=False)
+def transcribe_batch(job_id, data):
+    media_items = data['media_urls']
+    task = data.get('task', 'transcribe')
+    include_text = data.get('include_text', True)
+    include_srt = data.get('include_srt', False)
+    include_segments = data.get('include_segments', False)
+    word_timestamps = data.get('word_timestamps', False)
+    language = data.get('language', None)
+    use_cache = data.get('use_cache', True)
+    backend = data.get('backend')
+
+    logger.info(f"Job {job_id}: Received batch transcription request for {len(media_items)} clip(s)")
+
+    try:
+        items = process_transcribe_batch(media_items, task, include_text, include_srt, include_segments,
+                                         word_timestamps, language, job_id, use_cache, backend)
+        failed = sum(1 for item in items if "error" in item)
+        logger.info(f"Job {job_id}: Batch transcription completed, {len(items) - failed} succeeded, {failed} failed")
+
+        return {"items": items, "succeeded": len(items) - failed, "failed": failed}, "/v1/media/transcribe/batch", 200
+
+    except Exception as e:
+        logger.error(f"Job {job_id}: Error during batch transcription - {str(e)}")
+        return str(e), "/v1/media/transcribe/batch", 500
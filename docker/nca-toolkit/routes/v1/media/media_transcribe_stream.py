@@ -0,0 +1,163 @@
+# Copyright (c) 2025 Stephen G. Pope
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+from flask import Blueprint, Response, request, stream_with_context
+from app_utils import validate_payload, log_job_status
+from services.authentication import authenticate
+from services.transcription_backends import TRANSCRIPTION_BACKENDS
+from services.v1.media.media_transcribe_stream import stream_transcribe_media
+from config import TRANSCRIBE_STREAM_MAX_CONCURRENT
+from version import BUILD_NUMBER
+
+v1_media_transcribe_stream_bp = Blueprint('v1_media_transcribe_stream', __name__)
+logger = logging.getLogger(__name__)
+
+ENDPOINT = "/v1/media/transcribe/stream"
+
+MIMETYPES = {
+    "sse": "text/event-stream",
+    "ndjson": "application/x-ndjson"
+}
+
+# Streams hold their request thread and run Whisper outside the job queue
+# and its endpoint limits, so cap how many run at once in this process
+_stream_slots = threading.BoundedSemaphore(max(1, TRANSCRIBE_STREAM_MAX_CONCURRENT))
+
+
+def format_event(event, data, stream_format):
+    """Encode one event as a server-sent event or as a JSON line."""
+    if stream_format == "ndjson":
+        return json.dumps({"event": event, "data": data}) + "\n"
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@v1_media_transcribe_stream_bp.route(ENDPOINT, methods=['POST'])
+@authenticate
+@validate_payload({
+    "type": "object",
+    "properties": {
+        "media_url": {"type": "string", "format": "uri"},
+        "task": {"type": "string", "enum": ["transcribe", "translate"]},
+        "word_timestamps": {"type": "boolean"},
+        "language": {"type": "string"},
+        "use_cache": {"type": "boolean"},
+        "backend": {"type": "string", "enum": list(TRANSCRIPTION_BACKENDS)},
+        "format": {"type": "string", "enum": list(MIMETYPES)},
+        "id": {"type": "string"}
+    },
+    "required": ["media_url"],
+    "additionalProperties": False
+})
+def transcribe_stream():
+    # Streams run on the request thread rather than through the job queue,
+    # since the connection stays open until the transcript is complete. They
+    # are still recorded in the job store so progress can be polled.
+    data = request.json
+    job_id = str(uuid.uuid4())
+    pid = os.getpid()
+    media_url = data['media_url']
+    stream_format = data.get('format', 'sse')
+
+    if not _stream_slots.acquire(blocking=False):
+        logger.info(f"Refusing streaming transcription of {media_url}: "
+                    f"{TRANSCRIBE_STREAM_MAX_CONCURRENT} stream(s) already running")
+        return {
+            "code": 429,
+            "id": data.get("id"),
+            "message": f"TRANSCRIBE_STREAM_MAX_CONCURRENT ({TRANSCRIBE_STREAM_MAX_CONCURRENT}) reached",
+            "pid": pid,
+            "build_number": BUILD_NUMBER
+        }, 429
+
+    logger.info(f"Job {job_id}: Received streaming transcription request for {media_url}")
+
+    def generate():
+        start_time = time.time()
+        log_job_status(job_id, {
+            "job_status": "running",
+            "job_id": job_id,
+            "process_id": pid,
+            "response": None
+        })
+
+        summary = None
+        message = "Client disconnected"
+        events = stream_transcribe_media(
+            media_url,
+            data.get('task', 'transcribe'),
+            data.get('word_timestamps', False),
+            data.get('language'),
+            job_id,
+            data.get('use_cache', True),
+            data.get('backend')
+        )
+        try:
+            for event, payload in events:
+                if event == "done":
+                    summary = payload
+                    message = "success"
+                yield format_event(event, payload, stream_format)
+        except Exception as e:
+            logger.error(f"Job {job_id}: Error during streaming transcription - {str(e)}")
+            message = str(e)
+            yield format_event("error", {"job_id": job_id, "message": message}, stream_format)
+        finally:
+            # Stops transcription if the client went away, releasing the model and temporary audio
+            events.close()
+            run_time = round(time.time() - start_time, 3)
+            # The transcript itself was streamed and is not stored; the job record keeps the summary
+            log_job_status(job_id, {
+                "job_status": "done",
+                "job_id": job_id,
+                "process_id": pid,
+                "response": {
+                    "endpoint": ENDPOINT,
+                    "code": 200 if summary else 500,
+                    "id": data.get("id"),
+                    "job_id": job_id,
+                    "response": summary,
+                    "message": message,
+                    "pid": pid,
+                    "run_time": run_time,
+                    "queue_time": 0,
+                    "total_time": run_time,
+                    "build_number": BUILD_NUMBER
+                }
+            })
+            logger.info(f"Job {job_id}: Streaming transcription finished: {message}")
+
+    response = Response(
+        stream_with_context(generate()),
+        mimetype=MIMETYPES[stream_format],
+        headers={
+            "Cache-Control": "no-cache",
+            # Ask reverse proxies such as nginx not to buffer the stream
+            "X-Accel-Buffering": "no",
+            "X-Job-Id": job_id
+        }
+    )
+    # Called by the WSGI server when the response is closed, even if the
+    # client went away before the generator started
+    response.call_on_close(_stream_slots.release)
+    return response
@@ -39,7 +39,7 @@ v1_s3_upload_bp = Blueprint('v1_s3_upload', __name__)
     },
     "required": ["file_url"]
 })
-@queue_task_wrapper(bypass_queue=False)
+@queue_task_wrapper(bypass_queue=False, pool="io")
 def s3_upload_endpoint(job_id, data):
     try:
         file_url = data.get('file_url')
@@ -50,7 +50,7 @@ def s3_upload_endpoint(job_id, data):
         logger.info(f"Job {job_id}: Starting S3 streaming upload from {file_url}")
         
         # Call the service function to handle the upload
-        result = stream_upload_to_s3(file_url, filename, make_public, download_headers)
+        result = stream_upload_to_s3(file_url, filename, make_public, download_headers, job_id=job_id)
         
         logger.info(f"Job {job_id}: Successfully uploaded to S3")
         
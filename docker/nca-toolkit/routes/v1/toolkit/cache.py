@@ -0,0 +1,48 @@
+# Copyright (c) 2025 Stephen G. Pope
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+
+import logging
+from flask import Blueprint
+from services.authentication import authenticate
+from services.input_cache import get_cache_stats
+from app_utils import queue_task_wrapper
+
+v1_toolkit_cache_bp = Blueprint('v1_toolkit_cache', __name__)
+logger = logging.getLogger(__name__)
+
+@v1_toolkit_cache_bp.route('/v1/toolkit/cache', methods=['GET'])
+@authenticate
+@queue_task_wrapper(bypass_queue=True)
+def get_input_cache_stats(job_id, data):
+    """
+    Report hit/miss counters and disk usage of the local input cache
+
+    Args:
+        job_id (str): Job ID assigned by queue_task_wrapper (unused)
+        data (dict): Request data (unused)
+
+    Returns:
+        Tuple of (cache_stats, endpoint_string, status_code)
+    """
+    endpoint = "/v1/toolkit/cache"
+
+    try:
+        return get_cache_stats(), endpoint, 200
+    except Exception as e:
+        logger.error(f"Error reading input cache stats: {str(e)}")
+        return {"error": f"Failed to read input cache stats: {str(e)}"}, endpoint, 500
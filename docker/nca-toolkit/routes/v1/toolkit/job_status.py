@@ -16,12 +16,10 @@
 
 
 
-import os
-import json
 import logging
 from flask import Blueprint, request
-from config import LOCAL_STORAGE_PATH
 from services.authentication import authenticate
+from services.job_store import get_job_store
 from app_utils import queue_task_wrapper, validate_payload
 
 v1_toolkit_job_status_bp = Blueprint('v1_toolkit_job_status', __name__)
@@ -42,23 +40,20 @@ logger = logging.getLogger(__name__)
 def get_job_status(job_id, data):
 
     get_job_id = data.get('job_id')
+    endpoint = "/v1/toolkit/job/status"
 
     logger.info(f"Retrieving status for job {get_job_id}")
     
     try:
-        # Construct the path to the job status file
-        job_file_path = os.path.join(LOCAL_STORAGE_PATH, 'jobs', f"{get_job_id}.json")
+        # Look up the job in the job status store
+        job_status = get_job_store().get(get_job_id)
         
-        # Check if the job file exists
-        if not os.path.exists(job_file_path):
+        # Check if the job exists
+        if job_status is None:
             return {"error": "Job not found", "job_id": get_job_id}, endpoint, 404
         
-        # Read the job status file
-        with open(job_file_path, 'r') as file:
-            job_status = json.load(file)
-        
-        # Return the job status file content directly
-        return job_status, "/v1/toolkit/job/status", 200
+        # Return the stored job status directly
+        return job_status, endpoint, 200
         
     except Exception as e:
         logger.error(f"Error retrieving status for job {get_job_id}: {str(e)}")
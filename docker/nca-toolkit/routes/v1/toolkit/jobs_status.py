@@ -16,13 +16,11 @@
 
 
 
-import os
-import json
 import logging
 import time
 from flask import Blueprint, request
-from config import LOCAL_STORAGE_PATH
 from services.authentication import authenticate
+from services.job_store import get_job_store
 from app_utils import queue_task_wrapper, validate_payload
 
 v1_toolkit_jobs_status_bp = Blueprint('v1_toolkit_jobs_status', __name__)
@@ -37,7 +35,8 @@ def get_all_jobs_status(job_id, data):
     
     Args:
         job_id (str): Job ID assigned by queue_task_wrapper (unused)
-        data (dict): Request data containing optional since_seconds parameter
+        data (dict): Request data containing optional since_seconds, until_seconds,
+            job_status, limit and offset parameters
     
     Returns:
         Tuple of (jobs_status_data, endpoint_string, status_code)
@@ -46,40 +45,27 @@ def get_all_jobs_status(job_id, data):
     endpoint = "/v1/toolkit/jobs/status"
     
     try:
-        # Get time range parameter (default to 600 seconds/10 minutes if not provided)
-        since_seconds = 600
-        if data and "since_seconds" in data:
-            since_seconds = data.get("since_seconds")
-            
-        cutoff_time = time.time() - since_seconds
-        
-        # Construct the path to the jobs directory
-        jobs_dir = os.path.join(LOCAL_STORAGE_PATH, 'jobs')
+        data = data or {}
+
+        # Get time range parameters (default to 600 seconds/10 minutes if not provided)
+        since_seconds = data.get("since_seconds", 600)
+        until_seconds = data.get("until_seconds")
         
-        # Check if the jobs directory exists
-        if not os.path.exists(jobs_dir):
-            return {"error": "Jobs directory not found"}, endpoint, 404
+        now = time.time()
+        cutoff_time = now - since_seconds
+        until_time = now - until_seconds if until_seconds is not None else None
         
-        # Dictionary to store job statuses
-        jobs_status = {}
+        # Query the job store index instead of scanning every job record
+        jobs = get_job_store().list_jobs(
+            since=cutoff_time,
+            until=until_time,
+            job_status=data.get("job_status"),
+            limit=data.get("limit"),
+            offset=data.get("offset", 0)
+        )
         
-        # Iterate through job files in the directory
-        for filename in os.listdir(jobs_dir):
-            if filename.endswith('.json'):
-                job_file_path = os.path.join(jobs_dir, filename)
-                file_mod_time = os.path.getmtime(job_file_path)
-                
-                # Check if the file was modified within the time range
-                if file_mod_time >= cutoff_time:
-                    job_id = filename.split('.')[0]  # Remove .json extension to get job_id
-                    
-                    # Read the job status file
-                    with open(job_file_path, 'r') as file:
-                        job_data = json.load(file)
-                        
-                        # Only include the job_status field, not the response
-                        if "job_status" in job_data:
-                            jobs_status[job_id] = job_data["job_status"]
+        # Only include the job_status field, not the response, most recently updated first
+        jobs_status = {job["job_id"]: job["job_status"] for job in jobs}
         
         # Return the job statuses
         return jobs_status, endpoint, 200
@@ -0,0 +1,53 @@
+# Copyright (c) 2025 Stephen G. Pope
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+
+import logging
+from flask import Blueprint, request
+from services.authentication import authenticate
+from services.webhook_outbox import get_webhook_dispatcher
+from app_utils import queue_task_wrapper
+
+v1_toolkit_webhooks_bp = Blueprint('v1_toolkit_webhooks', __name__)
+logger = logging.getLogger(__name__)
+
+@v1_toolkit_webhooks_bp.route('/v1/toolkit/webhooks', methods=['GET'])
+@authenticate
+@queue_task_wrapper(bypass_queue=True)
+def get_webhook_stats(job_id, data):
+    """
+    Report webhook delivery counters, outbox size and the most recent dead letters
+
+    Args:
+        job_id (str): Job ID assigned by queue_task_wrapper (unused)
+        data (dict): Request data (unused); the number of dead letters returned
+            is read from the optional "dead_letters" query parameter (default 20)
+
+    Returns:
+        Tuple of (webhook_stats, endpoint_string, status_code)
+    """
+    endpoint = "/v1/toolkit/webhooks"
+
+    try:
+        limit = request.args.get('dead_letters', 20, type=int)
+        dispatcher = get_webhook_dispatcher()
+        stats = dispatcher.get_stats()
+        stats["dead_letters"] = dispatcher.outbox.list_dead_letters(min(limit, 1000)) if limit > 0 else []
+        return stats, endpoint, 200
+    except Exception as e:
+        logger.error(f"Error reading webhook stats: {str(e)}")
+        return {"error": f"Failed to read webhook stats: {str(e)}"}, endpoint, 500
@@ -109,7 +109,8 @@ logger = logging.getLogger(__name__)
         },
         "webhook_url": {"type": "string", "format": "uri"},
         "id": {"type": "string"},
-        "language": {"type": "string"}
+        "language": {"type": "string"},
+        "use_cache": {"type": "boolean"}
     },
     "required": ["video_url"],
     "additionalProperties": False
@@ -127,6 +128,7 @@ def caption_video_v1(job_id, data):
     video_crf = data.get('video_crf')
     video_preset = data.get('video_preset')
     video_bitrate = data.get('video_bitrate')
+    use_cache = data.get('use_cache', True)
 
     logger.info(f"Job {job_id}: Received v1 captioning request for {video_url}")
     logger.info(f"Job {job_id}: Settings received: {settings}")
@@ -140,7 +142,8 @@ def caption_video_v1(job_id, data):
         
         # Process video with the enhanced v1 service
         output = generate_ass_captions_v1(video_url, captions, settings, replace, exclude_time_ranges, job_id, language, 
-                                          video_crf=video_crf, video_preset=video_preset, video_bitrate=video_bitrate)
+                                          video_crf=video_crf, video_preset=video_preset, video_bitrate=video_bitrate,
+                                          use_cache=use_cache)
         
         if isinstance(output, dict) and 'error' in output:
             # Check if this is a font-related error by checking for 'available_fonts' key
@@ -49,6 +49,7 @@ logger = logging.getLogger(__name__)
         "video_crf": {"type": "number", "minimum": 0, "maximum": 51},
         "audio_codec": {"type": "string"},
         "audio_bitrate": {"type": "string"},
+        "mode": {"type": "string", "enum": ["encode", "copy", "smart"]},
         "webhook_url": {"type": "string", "format": "uri"},
         "id": {"type": "string"}
     },
@@ -67,6 +68,7 @@ def video_split(job_id, data):
     video_crf = data.get('video_crf', 23)
     audio_codec = data.get('audio_codec', 'aac')
     audio_bitrate = data.get('audio_bitrate', '128k')
+    mode = data.get('mode', 'encode')
     
     logger.info(f"Job {job_id}: Received video split request for {video_url}")
     
@@ -80,24 +82,14 @@ def video_split(job_id, data):
             video_preset=video_preset,
             video_crf=video_crf,
             audio_codec=audio_codec,
-            audio_bitrate=audio_bitrate
+            audio_bitrate=audio_bitrate,
+            mode=mode
         )
         
-        # Upload all output files to cloud storage
-        from services.cloud_storage import upload_file
-        result_files = []
-        
-        for i, output_file in enumerate(output_files):
-            cloud_url = upload_file(output_file)
-            result_files.append({
-                "file_url": cloud_url,
-                "start": splits[i]["start"],
-                "end": splits[i]["end"]
-            })
-            # Remove the local file after upload
-            import os
-            os.remove(output_file)
-            logger.info(f"Job {job_id}: Uploaded and removed split file {i+1}")
+        # Upload all output files to cloud storage concurrently, removing each once uploaded
+        from services.cloud_storage import upload_files
+        result_files = upload_files(output_files)
+        logger.info(f"Job {job_id}: Uploaded and removed {len(result_files)} split file(s)")
         
         # Clean up input file
         import os
@@ -38,6 +38,7 @@ logger = logging.getLogger(__name__)
         "video_crf": {"type": "number", "minimum": 0, "maximum": 51},
         "audio_codec": {"type": "string"},
         "audio_bitrate": {"type": "string"},
+        "mode": {"type": "string", "enum": ["encode", "copy", "smart"]},
         "webhook_url": {"type": "string", "format": "uri"},
         "id": {"type": "string"}
     },
@@ -57,6 +58,7 @@ def video_trim(job_id, data):
     video_crf = data.get('video_crf', 23)
     audio_codec = data.get('audio_codec', 'aac')
     audio_bitrate = data.get('audio_bitrate', '128k')
+    mode = data.get('mode', 'encode')
     
     logger.info(f"Job {job_id}: Received video trim request for {video_url}")
     
@@ -71,7 +73,8 @@ def video_trim(job_id, data):
             video_preset=video_preset,
             video_crf=video_crf,
             audio_codec=audio_codec,
-            audio_bitrate=audio_bitrate
+            audio_bitrate=audio_bitrate,
+            mode=mode
         )
         
         # Upload the processed file to cloud storage
@@ -20,13 +20,13 @@ import os
 import ffmpeg
 import logging
 import subprocess
-import whisper
+from services.transcription_cache import transcribe
 from datetime import timedelta
 import srt
 import re
 from services.file_management import download_file
 from services.cloud_storage import upload_file  # Ensure this import is present
-import requests  # Ensure requests is imported for webhook handling
+from services import http_client
 from urllib.parse import urlparse
 from config import LOCAL_STORAGE_PATH
 
@@ -62,16 +62,15 @@ def rgb_to_ass_color(rgb_color):
             return f"&H00{b:02X}{g:02X}{r:02X}"
     return "&H00FFFFFF"
 
-def generate_transcription(video_path, language='auto'):
+def generate_transcription(video_path, language='auto', use_cache=True):
     try:
-        model = whisper.load_model("base")
         transcription_options = {
             'word_timestamps': True,
             'verbose': True,
         }
         if language != 'auto':
             transcription_options['language'] = language
-        result = model.transcribe(video_path, **transcription_options)
+        result = transcribe(video_path, "base", use_cache=use_cache, **transcription_options)
         logger.info(f"Transcription generated successfully for video: {video_path}")
         return result
     except Exception as e:
@@ -167,7 +166,7 @@ def download_captions(captions_url):
     """Download captions from the given URL."""
     try:
         logger.info(f"Downloading captions from URL: {captions_url}")
-        response = requests.get(captions_url)
+        response = http_client.get(captions_url)
         response.raise_for_status()
         logger.info("Captions downloaded successfully.")
         return response.text
@@ -737,7 +736,7 @@ def normalize_exclude_time_ranges(exclude_time_ranges):
         norm.append({"start": start, "end": end})
     return norm
 
-def generate_ass_captions_v1(video_url, captions, settings, replace, exclude_time_ranges, job_id, language='auto', PlayResX=None, PlayResY=None, video_crf=None, video_preset=None, video_bitrate=None):
+def generate_ass_captions_v1(video_url, captions, settings, replace, exclude_time_ranges, job_id, language='auto', PlayResX=None, PlayResY=None, video_crf=None, video_preset=None, video_bitrate=None, use_cache=True):
     """
     Captioning process with transcription fallback and multiple styles.
     Integrates with the updated logic for positioning and alignment.
@@ -840,7 +839,7 @@ def generate_ass_captions_v1(video_url, captions, settings, replace, exclude_tim
         else:
             # No captions provided, generate transcription
             logger.info(f"Job {job_id}: No captions provided, generating transcription.")
-            transcription_result = generate_transcription(video_path, language=language)
+            transcription_result = generate_transcription(video_path, language=language, use_cache=use_cache)
             # Generate ASS based on chosen style
             subtitle_content = process_subtitle_events(transcription_result, style_type, style_options, replace_dict, video_resolution)
             subtitle_type = 'ass'
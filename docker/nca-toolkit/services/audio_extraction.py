@@ -0,0 +1,93 @@
+# Copyright (c) 2025 Stephen G. Pope
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+
+import os
+import uuid
+import logging
+import subprocess
+from config import LOCAL_STORAGE_PATH
+from services.file_management import stream_input_args
+
+logger = logging.getLogger(__name__)
+
+# Whisper works on 16 kHz mono audio; extracted audio is stored as raw
+# signed 16-bit little-endian samples at this rate
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2
+
+# FFmpeg input options for reading a file written by extract_audio
+PCM_INPUT_ARGS = ['-f', 's16le', '-ar', str(SAMPLE_RATE), '-ac', '1']
+
+
+def extract_audio(source, storage_path=LOCAL_STORAGE_PATH):
+    """
+    Decode the audio of a media file or URL once to raw 16 kHz mono PCM.
+
+    Only the audio stream is decoded (-vn), so a video costs no more than its
+    soundtrack, and an HTTP(S) URL is read by FFmpeg directly without
+    downloading the file first.
+
+    Args:
+        source (str): Local path, or a URL from prepare_media_input
+        storage_path (str): Directory to write the PCM file to
+
+    Returns:
+        str: Path of the PCM file; the caller removes it when done
+    """
+    os.makedirs(storage_path, exist_ok=True)
+    pcm_path = os.path.join(storage_path, f"{uuid.uuid4()}.pcm")
+    cmd = (
+        ['ffmpeg', '-nostdin', '-v', 'error'] + stream_input_args(source) +
+        ['-i', source, '-vn', '-sn', '-dn', '-ac', '1', '-ar', str(SAMPLE_RATE), '-f', 's16le', pcm_path]
+    )
+    result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        if os.path.exists(pcm_path):
+            os.remove(pcm_path)
+        raise RuntimeError(f"Failed to extract audio from {source}: {result.stderr[-500:]}")
+    logger.info(f"Extracted {pcm_duration(pcm_path):.1f}s of 16 kHz audio from {source}")
+    return pcm_path
+
+
+def pcm_duration(pcm_path):
+    """Length in seconds of a file written by extract_audio."""
+    return os.path.getsize(pcm_path) / (SAMPLE_WIDTH * SAMPLE_RATE)
+
+
+def read_pcm(pcm_path, start=None, duration=None):
+    """
+    Read a file written by extract_audio, or part of it, as the float32 array Whisper expects.
+
+    Args:
+        pcm_path (str): Path returned by extract_audio
+        start (float, optional): Offset in seconds
+        duration (float, optional): Seconds to read; defaults to the rest of the file
+
+    Returns:
+        numpy.ndarray: Samples in [-1, 1]
+    """
+    import numpy as np
+
+    if os.path.getsize(pcm_path) == 0:
+        return np.zeros(0, dtype=np.float32)
+    # Map the file instead of reading it, so a window of a long recording
+    # only touches the pages it needs
+    samples = np.memmap(pcm_path, dtype='<i2', mode='r')
+    first = int(round((start or 0) * SAMPLE_RATE))
+    last = None if duration is None else first + int(round(duration * SAMPLE_RATE))
+    return samples[first:last].astype(np.float32) / 32768.0
@@ -18,7 +18,7 @@
 
 import os
 import subprocess
-from services.file_management import download_file
+from services.file_management import download_files
 
 STORAGE_PATH = "/tmp/"
 
@@ -28,8 +28,7 @@ def get_duration(file_path):
     return float(result.stdout)
 
 def process_audio_mixing(video_url, audio_url, video_vol, audio_vol, output_length, job_id, webhook_url=None):
-    video_path = download_file(video_url, STORAGE_PATH)
-    audio_path = download_file(audio_url, STORAGE_PATH)
+    video_path, audio_path = download_files([video_url, audio_url], STORAGE_PATH)
     output_path = os.path.join(STORAGE_PATH, f"{job_id}.mp4")
 
     video_duration = get_duration(video_path)
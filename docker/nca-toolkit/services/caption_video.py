@@ -19,7 +19,7 @@
 import os
 import ffmpeg
 import logging
-import requests
+from services import http_client
 import subprocess
 from services.file_management import download_file
 
@@ -133,7 +133,7 @@ Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
         if caption_srt.startswith("https"):
             # Download the file if caption_srt is a URL
             logger.info(f"Job {job_id}: Downloading caption file from {caption_srt}")
-            response = requests.get(caption_srt)
+            response = http_client.get(caption_srt)
             response.raise_for_status()  # Raise an exception for bad status codes
             if caption_type in ['srt','vtt']:
                 with open(srt_path, 'wb') as srt_file:
@@ -17,12 +17,18 @@
 
 
 import os
+import time
+import uuid
+import shutil
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from abc import ABC, abstractmethod
 from services.gcp_toolkit import upload_to_gcs
-from services.s3_toolkit import upload_to_s3
-from config import validate_env_vars
-from urllib.parse import urlparse
+from services.s3_toolkit import upload_to_s3, get_s3_client
+from config import validate_env_vars, UPLOAD_BATCH_WORKERS, STORAGE_PROVIDER, LOCAL_OUTPUT_DIR, LOCAL_OUTPUT_BASE_URL
+from urllib.parse import urlparse, quote
+from services.s3_multipart import MultipartUpload
 
 logger = logging.getLogger(__name__)
 
@@ -39,10 +45,16 @@ def parse_s3_url(s3_url):
     return bucket_name, region
 
 class CloudStorageProvider(ABC):
+    # Whether upload_stream can write an object from chunks without a local file
+    supports_stream_upload = False
+
     @abstractmethod
     def upload_file(self, file_path: str) -> str:
         pass
 
+    def upload_stream(self, object_name: str, chunks) -> str:
+        raise NotImplementedError(f"{type(self).__name__} does not support streaming uploads")
+
 class GCPStorageProvider(CloudStorageProvider):
     def __init__(self):
         self.bucket_name = os.getenv('GCP_BUCKET_NAME')
@@ -51,6 +63,8 @@ class GCPStorageProvider(CloudStorageProvider):
         return upload_to_gcs(file_path, self.bucket_name)
 
 class S3CompatibleProvider(CloudStorageProvider):
+    supports_stream_upload = True
+
     def __init__(self):
 
         self.endpoint_url = os.getenv('S3_ENDPOINT_URL')
@@ -83,28 +97,125 @@ class S3CompatibleProvider(CloudStorageProvider):
             except Exception as e:
                 logger.warning(f"Failed to parse Digital Ocean URL: {e}. Using provided values.")
 
+    @property
+    def client(self):
+        """The process-wide S3 client for this provider's endpoint and credentials."""
+        return get_s3_client(self.endpoint_url, self.access_key, self.secret_key, self.region)
+
     def upload_file(self, file_path: str) -> str:
         return upload_to_s3(file_path, self.endpoint_url, self.access_key, self.secret_key, self.bucket_name, self.region)
 
-def get_storage_provider() -> CloudStorageProvider:
-    
-    if os.getenv('S3_ENDPOINT_URL'):
+    def upload_stream(self, object_name: str, chunks) -> str:
+        """Write an object from an iterable of byte chunks as a parallel multipart upload.
 
-        if ('digitalocean' in os.getenv('S3_ENDPOINT_URL').lower()):
+        The upload is aborted if the iterable raises, e.g. because FFmpeg failed.
+        """
+        with MultipartUpload(self.client, self.bucket_name, object_name, extra_args={'ACL': 'public-read'}) as upload:
+            for chunk in chunks:
+                upload.write(chunk)
+        return f"{self.endpoint_url}/{self.bucket_name}/{quote(object_name)}"
 
-            validate_env_vars('S3_DO')
-        else:
-            validate_env_vars('S3')
+class LocalStorageProvider(CloudStorageProvider):
+    """
+    Publishes outputs into LOCAL_OUTPUT_DIR, a volume shared with consumers on
+    the same host (e.g. n8n on the same Docker network), instead of uploading them.
 
-        return S3CompatibleProvider()
-    
-    if os.getenv('GCP_BUCKET_NAME'):
+    Files are hard-linked into the directory, so nothing is copied when it is
+    on the same filesystem as LOCAL_STORAGE_PATH.
+    """
+    supports_stream_upload = True
 
-        validate_env_vars('GCP')
-        return GCPStorageProvider()
-    
+    def __init__(self):
+        self.output_dir = os.path.abspath(LOCAL_OUTPUT_DIR)
+        self.base_url = LOCAL_OUTPUT_BASE_URL
+        os.makedirs(self.output_dir, exist_ok=True)
+
+    def get_url(self, object_name: str) -> str:
+        if self.base_url:
+            return f"{self.base_url}/{quote(object_name)}"
+        return f"file://{quote(os.path.join(self.output_dir, object_name))}"
+
+    def upload_file(self, file_path: str) -> str:
+        object_name = os.path.basename(file_path)
+        destination = os.path.join(self.output_dir, object_name)
+        # Link under a temporary name first so consumers never see a partial file
+        tmp_path = os.path.join(self.output_dir, f".{object_name}.{uuid.uuid4()}.tmp")
+        try:
+            try:
+                os.link(file_path, tmp_path)
+            except OSError:
+                # Different filesystem or no hardlink support
+                shutil.copyfile(file_path, tmp_path)
+            os.replace(tmp_path, destination)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return self.get_url(object_name)
+
+    def upload_stream(self, object_name: str, chunks) -> str:
+        destination = os.path.join(self.output_dir, object_name)
+        tmp_path = os.path.join(self.output_dir, f".{object_name}.{uuid.uuid4()}.tmp")
+        try:
+            with open(tmp_path, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+            os.replace(tmp_path, destination)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return self.get_url(object_name)
+
+def _create_s3_provider():
+    if 'digitalocean' in os.getenv('S3_ENDPOINT_URL', '').lower():
+        validate_env_vars('S3_DO')
+    else:
+        validate_env_vars('S3')
+    return S3CompatibleProvider()
+
+def _create_gcp_provider():
+    validate_env_vars('GCP')
+    return GCPStorageProvider()
+
+def _create_local_provider():
+    validate_env_vars('LOCAL')
+    return LocalStorageProvider()
+
+# Values of STORAGE_PROVIDER, mapped to factories that validate the settings and build the provider
+STORAGE_PROVIDERS = {
+    's3': _create_s3_provider,
+    'gcp': _create_gcp_provider,
+    'local': _create_local_provider
+}
+
+_provider = None
+_provider_lock = threading.Lock()
+
+def _resolve_provider_name():
+    if STORAGE_PROVIDER != 'auto':
+        if STORAGE_PROVIDER not in STORAGE_PROVIDERS:
+            raise ValueError(f"Unknown STORAGE_PROVIDER '{STORAGE_PROVIDER}', expected auto or one of: {', '.join(STORAGE_PROVIDERS)}")
+        return STORAGE_PROVIDER
+    if os.getenv('S3_ENDPOINT_URL'):
+        return 's3'
+    if os.getenv('GCP_BUCKET_NAME'):
+        return 'gcp'
+    if LOCAL_OUTPUT_DIR:
+        return 'local'
     raise ValueError(f"No cloud storage settings provided.")
 
+def get_storage_provider() -> CloudStorageProvider:
+    """The process-wide storage provider, built and validated on first use."""
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                name = _resolve_provider_name()
+                _provider = STORAGE_PROVIDERS[name]()
+                logger.info(f"Using {name} storage provider")
+    return _provider
+
 def upload_file(file_path: str) -> str:
     provider = get_storage_provider()
     try:
@@ -115,4 +226,71 @@ def upload_file(file_path: str) -> str:
     except Exception as e:
         logger.error(f"Error uploading file to cloud storage: {e}")
         raise
-    
\ No newline at end of file
+
+def upload_stream(object_name: str, chunks) -> str:
+    """Upload an object from an iterable of byte chunks without writing it to local disk."""
+    provider = get_storage_provider()
+    try:
+        logger.info(f"Streaming upload to cloud storage: {object_name}")
+        url = provider.upload_stream(object_name, chunks)
+        logger.info(f"File uploaded successfully: {url}")
+        return url
+    except Exception as e:
+        logger.error(f"Error streaming upload to cloud storage: {e}")
+        raise
+
+def supports_stream_upload() -> bool:
+    try:
+        return get_storage_provider().supports_stream_upload
+    except ValueError:
+        return False
+
+def upload_files(file_paths, max_workers=None, remove_after_upload=True):
+    """
+    Upload several files concurrently on a bounded thread pool.
+
+    Args:
+        file_paths (list): Local paths to upload; None entries are passed through
+        max_workers (int, optional): Concurrent uploads (default UPLOAD_BATCH_WORKERS)
+        remove_after_upload (bool, optional): Delete each local file as soon as its upload succeeds
+
+    Returns:
+        list: One dict per input path, in the same order, with 'file_path',
+        'file_url' and 'upload_time' (seconds); None for None entries
+
+    Raises:
+        Exception: The first upload error, after the remaining uploads have finished
+    """
+    provider = get_storage_provider()
+    workers = max(1, min(max_workers or UPLOAD_BATCH_WORKERS, len(file_paths) or 1))
+
+    def upload(file_path):
+        start_time = time.time()
+        url = provider.upload_file(file_path)
+        upload_time = time.time() - start_time
+        logger.info(f"File uploaded successfully in {upload_time:.2f}s: {url}")
+        if remove_after_upload:
+            os.remove(file_path)
+        return {"file_path": file_path, "file_url": url, "upload_time": round(upload_time, 3)}
+
+    start_time = time.time()
+    logger.info(f"Uploading {len(file_paths)} file(s) to cloud storage with {workers} worker(s)")
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="upload") as executor:
+        futures = [executor.submit(upload, file_path) if file_path else None for file_path in file_paths]
+
+    results = []
+    errors = []
+    for file_path, future in zip(file_paths, futures):
+        if future is None:
+            results.append(None)
+        elif future.exception() is not None:
+            logger.error(f"Error uploading file to cloud storage: {file_path}: {future.exception()}")
+            errors.append(future.exception())
+        else:
+            results.append(future.result())
+
+    if errors:
+        raise errors[0]
+    logger.info(f"Uploaded {len(file_paths)} file(s) in {time.time() - start_time:.2f}s")
+    return results
+
@@ -0,0 +1,118 @@
+# Copyright (c) 2025 Stephen G. Pope
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+
+import logging
+import threading
+import subprocess
+from collections import deque
+from config import STREAM_OUTPUT_UPLOADS
+from services.cloud_storage import upload_stream, supports_stream_upload
+
+logger = logging.getLogger(__name__)
+
+# Output formats FFmpeg can write to a pipe without seeking back, mapped to
+# the muxer and the options that make the result valid when written sequentially.
+# WAV (RIFF sizes) and MP3 (Xing/LAME header) need to seek back to finish
+# their headers, so they are always written to a local file first.
+STREAMABLE_FORMATS = {
+    'mp4': ('mp4', {'movflags': 'frag_keyframe+empty_moov+default_base_moof'}),
+    'mov': ('mov', {'movflags': 'frag_keyframe+empty_moov+default_base_moof'}),
+    'ts': ('mpegts', {}),
+    'mpegts': ('mpegts', {}),
+    'webm': ('webm', {}),
+    'mkv': ('matroska', {}),
+    'matroska': ('matroska', {}),
+    'aac': ('adts', {}),
+    'adts': ('adts', {}),
+    'ogg': ('ogg', {})
+}
+
+READ_SIZE = 1024 * 1024
+STDERR_TAIL_LINES = 200
+
+
+def can_stream_output(output_format):
+    """True when STREAM_OUTPUT_UPLOADS is on, the format is streamable and the storage provider accepts streams."""
+    return (STREAM_OUTPUT_UPLOADS
+            and (output_format or '').lower() in STREAMABLE_FORMATS
+            and supports_stream_upload())
+
+
+def stream_output_options(output_format):
+    """Output options for writing output_format to a pipe, as keyword arguments for ffmpeg-python."""
+    muxer, options = STREAMABLE_FORMATS[output_format.lower()]
+    return dict(options, format=muxer)
+
+
+def stream_output_args(output_format):
+    """Output options for writing output_format to a pipe, as FFmpeg command-line arguments."""
+    args = []
+    for key, value in stream_output_options(output_format).items():
+        args.extend([f"-{'f' if key == 'format' else key}", value])
+    return args
+
+
+def run_ffmpeg_to_storage(cmd, object_name):
+    """
+    Run an FFmpeg command that writes to pipe:1 and upload its output as it is produced.
+
+    Nothing is written to LOCAL_STORAGE_PATH. When the upload falls behind,
+    its memory budget fills, reads from the pipe stop and FFmpeg blocks on
+    the full pipe until parts have been sent. If FFmpeg fails, the partial
+    upload is aborted.
+
+    Args:
+        cmd (list): FFmpeg command whose output is 'pipe:1', including stream_output_args()
+        object_name (str): Name of the object in cloud storage
+
+    Returns:
+        str: URL of the uploaded object
+    """
+    logger.info(f"Running ffmpeg command with streamed upload: {' '.join(cmd)}")
+    process = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    # FFmpeg stalls if its stderr pipe fills up, so drain it on another thread
+    stderr_tail = deque(maxlen=STDERR_TAIL_LINES)
+    stderr_thread = threading.Thread(
+        target=lambda: stderr_tail.extend(line.decode('utf-8', 'replace') for line in process.stderr),
+        daemon=True
+    )
+    stderr_thread.start()
+
+    def chunks():
+        total = 0
+        while True:
+            data = process.stdout.read(READ_SIZE)
+            if not data:
+                break
+            total += len(data)
+            yield data
+        returncode = process.wait()
+        stderr_thread.join()
+        if returncode != 0:
+            raise Exception(f"FFmpeg error: {''.join(stderr_tail)}")
+        if total == 0:
+            raise Exception("FFmpeg produced no output")
+        logger.info(f"FFmpeg finished, streamed {total} bytes to {object_name}")
+
+    try:
+        return upload_stream(object_name, chunks())
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
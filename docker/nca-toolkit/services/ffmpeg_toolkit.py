@@ -19,7 +19,7 @@
 import os
 import ffmpeg
 import requests
-from services.file_management import download_file
+from services.file_management import download_file, download_files
 
 # Set the default local storage directory
 STORAGE_PATH = "/tmp/"
@@ -59,11 +59,8 @@ def process_video_combination(media_urls, job_id, webhook_url=None):
     output_path = os.path.join(STORAGE_PATH, output_filename)
 
     try:
-        # Download all media files
-        for i, media_item in enumerate(media_urls):
-            url = media_item['video_url']
-            input_filename = download_file(url, os.path.join(STORAGE_PATH, f"{job_id}_input_{i}"))
-            input_files.append(input_filename)
+        # Download all media files concurrently
+        input_files = download_files([media_item['video_url'] for media_item in media_urls], STORAGE_PATH)
 
         # Generate an absolute path concat list file for FFmpeg
         concat_file_path = os.path.join(STORAGE_PATH, f"{job_id}_concat_list.txt")
@@ -18,15 +18,32 @@
 
 import os
 import uuid
-import requests
-from urllib.parse import urlparse, parse_qs
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
+from urllib.parse import urlparse, parse_qs, unquote
 import mimetypes
+import logging
+from config import MEDIA_INPUT_MODE, DOWNLOAD_WORKERS, DOWNLOAD_HOST_CONCURRENCY, LOCAL_INPUT_DIRS, LOCAL_OUTPUT_DIR, LOCAL_OUTPUT_BASE_URL
+from services import input_cache, http_client
 
-def get_extension_from_url(url):
+logger = logging.getLogger(__name__)
+
+# FFmpeg input options that let the HTTP protocol survive dropped connections
+# when a URL is read directly instead of downloaded first
+STREAM_INPUT_OPTIONS = {
+    'reconnect': 1,
+    'reconnect_on_network_error': 1,
+    'reconnect_delay_max': 5
+}
+
+def get_extension_from_url(url, headers=None):
     """Extract file extension from URL or content type.
     
     Args:
         url (str): The URL to extract the extension from
+        headers (dict, optional): Response headers already fetched for the URL,
+            e.g. from the GET that downloads it, used instead of a new HEAD request
         
     Returns:
         str: The file extension including the dot (e.g., '.jpg')
@@ -44,8 +61,9 @@ def get_extension_from_url(url):
 
     # If no extension in URL, try to determine from content type
     try:
-        response = requests.head(url, allow_redirects=True)
-        content_type = response.headers.get('content-type', '').split(';')[0]
+        if headers is None:
+            headers = http_client.head(url).headers
+        content_type = headers.get('content-type', '').split(';')[0]
         ext = mimetypes.guess_extension(content_type)
         if ext:
             return ext.lower()
@@ -55,21 +73,175 @@ def get_extension_from_url(url):
     # If we can't determine the extension, raise an error
     raise ValueError(f"Could not determine file extension from URL: {url}")
 
+def resolve_local_input(url):
+    """Map a file:// URL, or a URL under LOCAL_OUTPUT_BASE_URL, to a file in LOCAL_INPUT_DIRS.
+    
+    Args:
+        url (str): The input URL
+        
+    Returns:
+        str or None: Absolute path of the file, or None if the URL is not a local input
+        
+    Raises:
+        ValueError: If a file:// URL points outside LOCAL_INPUT_DIRS or does not exist
+    """
+    parsed_url = urlparse(url)
+    if parsed_url.scheme == 'file':
+        path = unquote(parsed_url.path)
+    elif LOCAL_OUTPUT_BASE_URL and LOCAL_OUTPUT_DIR and url.startswith(LOCAL_OUTPUT_BASE_URL + '/'):
+        # Our own output served from the shared volume: read it in place
+        path = os.path.join(LOCAL_OUTPUT_DIR, unquote(url[len(LOCAL_OUTPUT_BASE_URL) + 1:].split('?')[0]))
+    else:
+        return None
+
+    path = os.path.realpath(path)
+    allowed = any(path.startswith(os.path.realpath(directory) + os.sep) for directory in LOCAL_INPUT_DIRS)
+    if allowed and os.path.isfile(path):
+        return path
+    if parsed_url.scheme == 'file':
+        raise ValueError(f"Local input is not a file in LOCAL_INPUT_DIRS: {url}")
+    # Not on the volume after all; let it be downloaded over HTTP
+    return None
+
+def _link_local_input(path, storage_path, extension):
+    """Give the caller its own name for a local input without copying it, so removing it leaves the original."""
+    local_filename = os.path.join(storage_path, f"{uuid.uuid4()}{extension}")
+    try:
+        os.link(path, local_filename)
+    except OSError:
+        # Different filesystem or no hardlink support
+        shutil.copyfile(path, local_filename)
+    return local_filename
+
 def download_file(url, storage_path="/tmp/"):
-    """Download a file from URL to local storage."""
+    """Download a file from URL to local storage.
+    
+    file:// URLs and URLs of our own outputs on the shared volume (see
+    resolve_local_input) are linked in place instead of downloaded.
+    When the input cache is enabled and the server sends an ETag or
+    Last-Modified header, the file is served from the shared local cache and
+    only downloaded on a miss. Either way the caller gets its own file, which
+    it may delete when done.
+    """
     # Create storage directory if it doesn't exist
     os.makedirs(storage_path, exist_ok=True)
-    
-    file_id = str(uuid.uuid4())
-    extension = get_extension_from_url(url)
-    local_filename = os.path.join(storage_path, f"{file_id}{extension}")
 
-    try:
-        response = requests.get(url, stream=True)
+    local_path = resolve_local_input(url)
+    if local_path:
+        logger.info(f"Using local input {local_path} without downloading")
+        return _link_local_input(local_path, storage_path, get_extension_from_url(local_path))
+
+    if not is_remote_url(url):
+        return _download(url, storage_path, get_extension_from_url(url))
+
+    # A single GET: its headers give the extension and the cache validators,
+    # and its body is only read when the file is not already cached
+    with http_client.get(url, stream=True) as response:
         response.raise_for_status()
+        extension = get_extension_from_url(url, response.headers)
+        consumed = []
+        released = []
+
+        def save(url, path):
+            consumed.append(True)
+            if released:
+                return _download(url, path, extension)
+            return _save_response(response, path, extension)
+
+        def release():
+            # Another thread or worker is downloading the same key; don't keep
+            # this response open, unread, while waiting for it
+            released.append(True)
+            response.close()
+
+        if input_cache.is_enabled():
+            local_filename = input_cache.fetch(url, response.headers, extension, storage_path, save, on_wait=release)
+            if local_filename:
+                return local_filename
+
+        if not consumed and not released:
+            return save(url, storage_path)
+
+    # The cached copy vanished after our body went into it, or our response
+    # was closed while waiting for another download; fetch it again
+    return _download(url, storage_path, extension)
+
+_host_slots = {}
+_host_slots_lock = threading.Lock()
+
+def _host_slot(url):
+    """Semaphore limiting concurrent downloads from url's host across all jobs in this process."""
+    host = urlparse(url).netloc
+    with _host_slots_lock:
+        slot = _host_slots.get(host)
+        if slot is None:
+            slot = _host_slots[host] = threading.BoundedSemaphore(max(1, DOWNLOAD_HOST_CONCURRENCY))
+        return slot
+
+def download_files(urls, storage_path="/tmp/", max_workers=None, return_exceptions=False):
+    """Download several files concurrently, e.g. the inputs of a concatenation.
+    
+    Downloads run on a pool of up to DOWNLOAD_WORKERS threads, with at most
+    DOWNLOAD_HOST_CONCURRENCY at a time from any one host, so the total time
+    approaches that of the largest input rather than the sum of all of them.
+    
+    Args:
+        urls (list): URLs to download
+        storage_path (str): Directory to download into
+        max_workers (int, optional): Concurrent downloads (default DOWNLOAD_WORKERS)
+        return_exceptions (bool): Download every URL and return the error in place
+            of the path for those that fail, instead of failing them all
+        
+    Returns:
+        list: Local paths, in the same order as urls
+        
+    Raises:
+        Exception: The first download error, after every file already downloaded has been removed
+            (unless return_exceptions is set)
+    """
+    if not urls:
+        return []
+    workers = max(1, min(max_workers or DOWNLOAD_WORKERS, len(urls)))
 
+    def download(url):
+        if not is_remote_url(url):
+            return download_file(url, storage_path)
+        with _host_slot(url):
+            return download_file(url, storage_path)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="download") as executor:
+        futures = [executor.submit(download, url) for url in urls]
+        if return_exceptions:
+            wait(futures)
+            return [future.exception() or future.result() for future in futures]
+
+        done, pending = wait(futures, return_when=FIRST_EXCEPTION)
+        failed = [future for future in done if future.exception() is not None]
+        if failed:
+            # Don't start downloads that are no longer needed; the executor waits for those in progress
+            for future in pending:
+                future.cancel()
+
+    if failed:
+        for url, future in zip(urls, futures):
+            if not future.cancelled() and future.exception() is None:
+                try:
+                    os.remove(future.result())
+                except OSError:
+                    pass
+        error = failed[0].exception()
+        logger.error(f"Download failed, removed the other downloaded inputs: {error}")
+        raise error
+
+    return [future.result() for future in futures]
+
+def _save_response(response, storage_path, extension):
+    """Write a streamed response body to a new uniquely named file in storage_path."""
+    local_filename = os.path.join(storage_path, f"{uuid.uuid4()}{extension}")
+
+    try:
         with open(local_filename, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
+            for chunk in response.iter_content(chunk_size=1024 * 1024):
                 if chunk:
                     f.write(chunk)
 
@@ -79,3 +251,94 @@ def download_file(url, storage_path="/tmp/"):
             os.remove(local_filename)
         raise e
 
+def _download(url, storage_path, extension):
+    """Stream a URL to a new uniquely named file in storage_path."""
+    with http_client.get(url, stream=True) as response:
+        response.raise_for_status()
+        return _save_response(response, storage_path, extension)
+
+def is_remote_url(path):
+    """Check whether the path is an HTTP(S) URL that FFmpeg can read directly."""
+    return urlparse(path).scheme in ('http', 'https')
+
+def supports_range_requests(url):
+    """Check whether a URL can be read with seekable HTTP range requests.
+    
+    Args:
+        url (str): The URL to check
+        
+    Returns:
+        tuple: (bool, int or None) whether byte ranges are accepted, and the Content-Length if known
+    """
+    try:
+        response = http_client.head(url)
+        response.raise_for_status()
+    except Exception as e:
+        logger.info(f"HEAD request failed for {url}, assuming no range support: {e}")
+        return False, None
+
+    accepts_ranges = response.headers.get('accept-ranges', '').lower() == 'bytes'
+    content_length = response.headers.get('content-length')
+    return accepts_ranges, int(content_length) if content_length and content_length.isdigit() else None
+
+def should_stream_input(url, mode=None, random_access=False):
+    """Decide whether FFmpeg should read an HTTP(S) URL directly instead of a downloaded copy.
+    
+    Args:
+        url (str): The media URL
+        mode (str, optional): auto, stream or download; defaults to MEDIA_INPUT_MODE
+        random_access (bool): The caller needs a local file (e.g. for repeated seeking)
+        
+    Returns:
+        bool: True to pass the URL to FFmpeg, False to download it first
+    """
+    mode = (mode or MEDIA_INPUT_MODE).lower()
+    if random_access or not is_remote_url(url) or mode == 'download':
+        return False
+    if mode == 'stream':
+        logger.info(f"Streaming media input directly from {url}")
+        return True
+    if supports_range_requests(url)[0]:
+        logger.info(f"Server supports range requests, streaming media input directly from {url}")
+        return True
+    return False
+
+def prepare_media_input(url, storage_path="/tmp/", random_access=False, mode=None):
+    """Return something FFmpeg/ffprobe can open for the URL, downloading only when needed.
+    
+    With MEDIA_INPUT_MODE=auto (default), HTTP(S) URLs whose server accepts byte
+    ranges are passed straight to FFmpeg, which reads only the parts it needs and
+    can seek with range requests. Everything else is downloaded as before.
+    MEDIA_INPUT_MODE=stream always passes URLs through; download always downloads.
+    Local inputs (see resolve_local_input) are opened in place.
+    
+    Args:
+        url (str): The media URL
+        storage_path (str): Where to download the file if a local copy is needed
+        random_access (bool): The caller needs a local file (e.g. for repeated seeking)
+        mode (str, optional): Overrides MEDIA_INPUT_MODE for this input
+        
+    Returns:
+        tuple: (str, bool) the path or URL to open, and whether it is a local file
+            the caller must remove when done
+    """
+    if not random_access:
+        local_path = resolve_local_input(url)
+        if local_path:
+            return local_path, False
+
+    if should_stream_input(url, mode, random_access):
+        return url, False
+
+    return download_file(url, storage_path), True
+
+def stream_input_options(media_input):
+    """FFmpeg input options (for ffmpeg-python) appropriate for a path returned by prepare_media_input."""
+    return dict(STREAM_INPUT_OPTIONS) if is_remote_url(media_input) else {}
+
+def stream_input_args(media_input):
+    """Same as stream_input_options, as command-line arguments to place before -i."""
+    args = []
+    for key, value in stream_input_options(media_input).items():
+        args.extend([f'-{key}', str(value)])
+    return args
@@ -0,0 +1,136 @@
+# Copyright (c) 2025 Stephen G. Pope
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+
+import time
+import logging
+import threading
+from collections import defaultdict
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from config import (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT, HTTP_MAX_RETRIES, HTTP_RETRY_BACKOFF,
+                    HTTP_POOL_CONNECTIONS, HTTP_POOL_MAXSIZE)
+
+logger = logging.getLogger(__name__)
+
+# Statuses worth retrying: rate limiting and transient server or gateway errors
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_session = None
+_session_lock = threading.Lock()
+
+_stats = defaultdict(lambda: {"requests": 0, "errors": 0, "retries": 0, "seconds": 0.0})
+_stats_lock = threading.Lock()
+
+
+def _record(host, seconds, error=False, retries=0):
+    with _stats_lock:
+        stats = _stats[host]
+        stats["requests"] += 1
+        stats["seconds"] += seconds
+        stats["retries"] += retries
+        if error:
+            stats["errors"] += 1
+
+
+def _create_session():
+    # Connection failures are retried for every method since nothing reached
+    # the server; bad statuses only for reads, so a POST or PUT is never
+    # repeated after the server may have acted on it.
+    retry = Retry(
+        total=HTTP_MAX_RETRIES,
+        connect=HTTP_MAX_RETRIES,
+        read=HTTP_MAX_RETRIES,
+        status=HTTP_MAX_RETRIES,
+        backoff_factor=HTTP_RETRY_BACKOFF,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset(['HEAD', 'GET', 'OPTIONS']),
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    # One pool of keep-alive connections per host, for up to HTTP_POOL_CONNECTIONS hosts
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def get_session():
+    """The process-wide requests.Session shared by downloads, webhooks and other outgoing calls."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _create_session()
+    return _session
+
+
+def request(method, url, **kwargs):
+    """
+    Send a request through the shared session.
+
+    Takes the same arguments as requests.request. A timeout of
+    (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT) applies unless one is given;
+    the read timeout bounds each wait for data, not the whole transfer.
+    """
+    kwargs.setdefault('timeout', (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT))
+    host = urlparse(url).netloc
+    start_time = time.time()
+    try:
+        response = get_session().request(method, url, **kwargs)
+    except requests.RequestException:
+        _record(host, time.time() - start_time, error=True)
+        raise
+
+    retries = response.raw.retries.history if getattr(response.raw, 'retries', None) else ()
+    _record(host, time.time() - start_time, error=response.status_code >= 400, retries=len(retries))
+    return response
+
+
+def get(url, **kwargs):
+    return request('GET', url, **kwargs)
+
+
+def head(url, **kwargs):
+    kwargs.setdefault('allow_redirects', True)
+    return request('HEAD', url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request('POST', url, **kwargs)
+
+
+def put(url, **kwargs):
+    return request('PUT', url, **kwargs)
+
+
+def get_http_stats():
+    """Per-host request counters for this worker process; seconds count time to response headers."""
+    with _stats_lock:
+        hosts = {host: dict(stats) for host, stats in _stats.items()}
+
+    for stats in hosts.values():
+        stats["seconds"] = round(stats["seconds"], 3)
+    return {
+        "hosts": hosts,
+        "requests": sum(stats["requests"] for stats in hosts.values()),
+        "errors": sum(stats["errors"] for stats in hosts.values()),
+        "retries": sum(stats["retries"] for stats in hosts.values())
+    }
@@ -0,0 +1,306 @@
+# Copyright (c) 2025 Stephen G. Pope
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from abc import ABC, abstractmethod
+from services.job_store import get_job_store
+from services.webhook_outbox import enqueue_webhook
+from config import (LOCAL_STORAGE_PATH, REDIS_URL, IDEMPOTENCY_WINDOW, IDEMPOTENCY_DERIVE_KEYS,
+                    IDEMPOTENCY_STORE_BACKEND)
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+
+# How often, in seconds, the SQLite store removes expired keys
+PURGE_INTERVAL = 300
+
+# A key is claimed just before its job's first status record is written, so a
+# duplicate arriving in between waits this long for the record to appear
+OWNER_RECORD_WAIT = 1.0
+
+# How long, in seconds, the webhooks of duplicates wait for their original job
+SUBSCRIBER_TTL = 24 * 3600
+
+
+class IdempotencyStore(ABC):
+    """Maps idempotency keys to the job that owns them for a limited window."""
+
+    @abstractmethod
+    def claim(self, key: str, job_id: str, ttl: int) -> str:
+        """Make job_id the owner of key unless an unexpired owner exists; return the owner's job id."""
+        pass
+
+    @abstractmethod
+    def replace(self, key: str, old_job_id: str, job_id: str, ttl: int) -> bool:
+        """Hand key from old_job_id to job_id; False if another request took it over first."""
+        pass
+
+    @abstractmethod
+    def add_subscriber(self, job_id: str, webhook_url: str, request_id, ttl: int) -> None:
+        """Remember a duplicate's webhook_url (and its request id) to notify when job_id finishes."""
+        pass
+
+    @abstractmethod
+    def pop_subscribers(self, job_id: str) -> list:
+        """Remove and return the (webhook_url, request_id) pairs waiting on job_id; each is returned once."""
+        pass
+
+
+class SQLiteIdempotencyStore(IdempotencyStore):
+    """Key table in a WAL-mode SQLite database shared by all worker processes on the host."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._last_purge = 0
+        self._connection().executescript("""
+            CREATE TABLE IF NOT EXISTS idempotency_keys (
+                key TEXT PRIMARY KEY,
+                job_id TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_idempotency_keys_expires_at ON idempotency_keys (expires_at);
+            CREATE TABLE IF NOT EXISTS idempotency_subscribers (
+                job_id TEXT NOT NULL,
+                webhook_url TEXT NOT NULL,
+                request_id TEXT,
+                expires_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_idempotency_subscribers_job_id ON idempotency_subscribers (job_id);
+        """)
+
+    def _connection(self):
+        # sqlite3 connections must not be shared across threads, so keep one per thread
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def claim(self, key, job_id, ttl):
+        conn = self._connection()
+        now = time.time()
+        if now - self._last_purge > PURGE_INTERVAL:
+            self._last_purge = now
+            conn.execute("DELETE FROM idempotency_keys WHERE expires_at < ?", (now,))
+            conn.execute("DELETE FROM idempotency_subscribers WHERE expires_at < ?", (now,))
+        # An expired owner is replaced in the same statement, so only one request can win
+        conn.execute(
+            "INSERT INTO idempotency_keys (key, job_id, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET job_id = excluded.job_id, expires_at = excluded.expires_at "
+            "WHERE idempotency_keys.expires_at < ?",
+            (key, job_id, now + ttl, now)
+        )
+        row = conn.execute("SELECT job_id FROM idempotency_keys WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else job_id
+
+    def replace(self, key, old_job_id, job_id, ttl):
+        cursor = self._connection().execute(
+            "UPDATE idempotency_keys SET job_id = ?, expires_at = ? WHERE key = ? AND job_id = ?",
+            (job_id, time.time() + ttl, key, old_job_id)
+        )
+        return cursor.rowcount == 1
+
+    def add_subscriber(self, job_id, webhook_url, request_id, ttl):
+        self._connection().execute(
+            "INSERT INTO idempotency_subscribers (job_id, webhook_url, request_id, expires_at) VALUES (?, ?, ?, ?)",
+            (job_id, webhook_url, json.dumps(request_id), time.time() + ttl)
+        )
+
+    def pop_subscribers(self, job_id):
+        rows = self._connection().execute(
+            "DELETE FROM idempotency_subscribers WHERE job_id = ? RETURNING webhook_url, request_id", (job_id,)
+        ).fetchall()
+        return [(webhook_url, json.loads(request_id)) for webhook_url, request_id in rows]
+
+
+# Compare-and-set, so a key is only handed over by the request that saw the old owner
+REPLACE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+    return 1
+end
+return 0
+"""
+
+
+class RedisIdempotencyStore(IdempotencyStore):
+    """Keys in Redis with a TTL, shared across hosts."""
+
+    def __init__(self, client, key_prefix="nca:idempotency"):
+        self.client = client
+        self.prefix = key_prefix
+        self._replace_script = client.register_script(REPLACE_SCRIPT)
+
+    def _key(self, key):
+        return f"{self.prefix}:{key}"
+
+    def _subscribers_key(self, job_id):
+        return f"{self.prefix}:subscribers:{job_id}"
+
+    def claim(self, key, job_id, ttl):
+        if self.client.set(self._key(key), job_id, nx=True, ex=ttl):
+            return job_id
+        return self.client.get(self._key(key)) or job_id
+
+    def replace(self, key, old_job_id, job_id, ttl):
+        return bool(self._replace_script(keys=[self._key(key)], args=[old_job_id, job_id, ttl]))
+
+    def add_subscriber(self, job_id, webhook_url, request_id, ttl):
+        pipe = self.client.pipeline()
+        pipe.rpush(self._subscribers_key(job_id), json.dumps([webhook_url, request_id]))
+        pipe.expire(self._subscribers_key(job_id), ttl)
+        pipe.execute()
+
+    def pop_subscribers(self, job_id):
+        # MULTI/EXEC, so a subscriber is read and removed by only one caller
+        pipe = self.client.pipeline(transaction=True)
+        pipe.lrange(self._subscribers_key(job_id), 0, -1)
+        pipe.delete(self._subscribers_key(job_id))
+        entries, _ = pipe.execute()
+        return [tuple(json.loads(entry)) for entry in entries]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_idempotency_store() -> IdempotencyStore:
+    """Return the process-wide store selected by IDEMPOTENCY_STORE_BACKEND, creating it on first use."""
+    global _store
+    if _store is not None:
+        return _store
+
+    with _store_lock:
+        if _store is None:
+            if IDEMPOTENCY_STORE_BACKEND == 'redis':
+                from services.redis_job_queue import get_redis_client
+                _store = RedisIdempotencyStore(get_redis_client(REDIS_URL))
+            elif IDEMPOTENCY_STORE_BACKEND == 'sqlite':
+                os.makedirs(LOCAL_STORAGE_PATH, exist_ok=True)
+                _store = SQLiteIdempotencyStore(os.path.join(LOCAL_STORAGE_PATH, 'idempotency.db'))
+            else:
+                raise ValueError(f"Unknown IDEMPOTENCY_STORE_BACKEND: {IDEMPOTENCY_STORE_BACKEND}")
+    return _store
+
+
+def get_idempotency_key(endpoint, data, client_key=None):
+    """
+    Key identifying repeats of a request to endpoint.
+
+    Args:
+        endpoint (str): Request path; keys are scoped to it
+        data (dict): Request payload, hashed when the client sends no key and IDEMPOTENCY_DERIVE_KEYS is on
+        client_key (str, optional): Value of the Idempotency-Key header
+
+    Returns:
+        str or None: The key, or None if the request should not be deduplicated
+    """
+    if IDEMPOTENCY_WINDOW <= 0:
+        return None
+    if client_key:
+        source = f"key\n{endpoint}\n{client_key}"
+    elif IDEMPOTENCY_DERIVE_KEYS:
+        source = f"payload\n{endpoint}\n{json.dumps(data, sort_keys=True, separators=(',', ':'))}"
+    else:
+        return None
+    return hashlib.sha256(source.encode('utf-8')).hexdigest()
+
+
+def _wait_for_record(job_id):
+    deadline = time.time() + OWNER_RECORD_WAIT
+    while True:
+        record = get_job_store().get(job_id)
+        if record is not None or time.time() >= deadline:
+            return record
+        time.sleep(0.05)
+
+
+def find_duplicate(key, job_id):
+    """
+    Claim key for job_id, or find the job that already owns it.
+
+    A previous owner whose job failed, or whose status record is gone, gives
+    the key up so the request runs again; only successful results are reused.
+
+    Returns:
+        dict or None: The owning job's status record, or None if job_id should run
+    """
+    try:
+        store = get_idempotency_store()
+        owner = store.claim(key, job_id, IDEMPOTENCY_WINDOW)
+        while owner != job_id:
+            record = _wait_for_record(owner)
+            finished_with_error = (record is not None and record.get("job_status") == "done"
+                                   and (record.get("response") or {}).get("code") != 200)
+            if record is not None and not finished_with_error:
+                logger.info(f"Job {job_id}: Duplicate of job {owner} ({record.get('job_status')})")
+                return record
+            if store.replace(key, owner, job_id, IDEMPOTENCY_WINDOW):
+                return None
+            owner = store.claim(key, job_id, IDEMPOTENCY_WINDOW)
+        return None
+    except Exception as e:
+        # Never turn a store outage into a failed request; just run it
+        logger.error(f"Job {job_id}: Idempotency check failed, running without it: {e}")
+        return None
+
+
+def subscribe_duplicate(record, webhook_url, request_id):
+    """
+    Send the result of the job in record to webhook_url once it finishes.
+
+    Called for a duplicate request with a webhook_url, so its caller gets a
+    webhook like any other asynchronous request. If the job has already
+    finished, the webhook is queued straight away.
+    """
+    job_id = record.get("job_id")
+    try:
+        get_idempotency_store().add_subscriber(job_id, webhook_url, request_id, SUBSCRIBER_TTL)
+    except Exception as e:
+        logger.error(f"Job {job_id}: Failed to record webhook of a duplicate request: {e}")
+        return
+
+    # The job may have finished, and notified its subscribers, since the
+    # record was read; the store hands each subscriber out only once
+    if record.get("job_status") != "done":
+        record = get_job_store().get(job_id) or record
+    if record.get("job_status") == "done":
+        notify_duplicates(job_id, record["response"])
+
+
+def notify_duplicates(job_id, response_data):
+    """Queue the result of a finished job for the webhooks of duplicates waiting on it."""
+    if IDEMPOTENCY_WINDOW <= 0:
+        return
+    try:
+        subscribers = get_idempotency_store().pop_subscribers(job_id)
+    except Exception as e:
+        logger.error(f"Job {job_id}: Failed to read webhooks of duplicate requests: {e}")
+        return
+    for webhook_url, request_id in subscribers:
+        enqueue_webhook(webhook_url, dict(response_data, id=request_id))
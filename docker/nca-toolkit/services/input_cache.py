@@ -0,0 +1,263 @@
+# Copyright (c) 2025 Stephen G. Pope
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+
+import os
+import json
+import uuid
+import fcntl
+import shutil
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from config import INPUT_CACHE_DIR, INPUT_CACHE_MAX_MB
+
+logger = logging.getLogger(__name__)
+
+# Layout under INPUT_CACHE_DIR:
+#   blobs/<sha256><ext>   downloaded content, named by its hash so identical files are stored once
+#   index/<key>.json      maps a URL plus its ETag/Last-Modified to a blob
+#   locks/<nnnn>.lock     flock targets, one of LOCK_STRIPES picked by key, so only one thread or process downloads a given key
+#   tmp/                  downloads in progress
+BLOBS_DIR = os.path.join(INPUT_CACHE_DIR, 'blobs')
+INDEX_DIR = os.path.join(INPUT_CACHE_DIR, 'index')
+LOCKS_DIR = os.path.join(INPUT_CACHE_DIR, 'locks')
+TMP_DIR = os.path.join(INPUT_CACHE_DIR, 'tmp')
+
+# Fixed number of lock files, so the locks directory does not grow with every
+# distinct input; two keys share a lock with probability 1/LOCK_STRIPES
+LOCK_STRIPES = 4096
+
+_stats = {"hits": 0, "misses": 0, "uncacheable": 0, "deduplicated": 0, "evictions": 0, "bytes_served_from_cache": 0}
+_stats_lock = threading.Lock()
+
+
+def is_enabled():
+    return INPUT_CACHE_MAX_MB > 0
+
+
+def _count(name, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+
+
+def get_validator(headers):
+    """Return the ETag or Last-Modified header that identifies this version of a remote file, if any."""
+    etag = headers.get('etag')
+    if etag:
+        return f"etag:{etag}"
+    last_modified = headers.get('last-modified')
+    if last_modified:
+        return f"last-modified:{last_modified}"
+    return None
+
+
+def _cache_key(url, validator):
+    return hashlib.sha256(f"{url}\n{validator}".encode('utf-8')).hexdigest()
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _lookup(key):
+    """Return the blob path for a cache key if both the index entry and the blob exist."""
+    try:
+        with open(os.path.join(INDEX_DIR, f"{key}.json"), 'r') as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    blob_path = os.path.join(BLOBS_DIR, entry['blob'])
+    return blob_path if os.path.exists(blob_path) else None
+
+
+@contextmanager
+def _key_lock(key, on_wait=None):
+    # flock locks belong to the open file, so this serialises threads in this
+    # process as well as other gunicorn workers sharing the cache directory
+    stripe = int(key[:4], 16) % LOCK_STRIPES
+    with open(os.path.join(LOCKS_DIR, f"{stripe:04d}.lock"), 'w') as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            if on_wait is not None:
+                on_wait()
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _link_into(blob_path, storage_path, extension):
+    """Give the caller its own name for the cached file; callers delete their copy when done."""
+    os.makedirs(storage_path, exist_ok=True)
+    local_filename = os.path.join(storage_path, f"{uuid.uuid4()}{extension}")
+    try:
+        os.link(blob_path, local_filename)
+    except OSError:
+        # Different filesystem or no hardlink support
+        shutil.copyfile(blob_path, local_filename)
+    # Touch the blob so eviction treats it as recently used
+    os.utime(blob_path)
+    return local_filename
+
+
+def _evict(keep=None):
+    """Remove least recently used blobs until the cache fits in INPUT_CACHE_MAX_MB.
+
+    The blob at keep (the one just stored) is never removed, even if it alone exceeds the budget.
+    """
+    budget = INPUT_CACHE_MAX_MB * 1024 * 1024
+    blobs = []
+    total = 0
+    with os.scandir(BLOBS_DIR) as entries:
+        for entry in entries:
+            stat = entry.stat()
+            blobs.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+
+    evicted = False
+    for _, size, path in sorted(blobs):
+        if total <= budget:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+            total -= size
+            evicted = True
+            _count("evictions")
+            logger.info(f"Evicted cached input {os.path.basename(path)} ({size} bytes)")
+        except OSError:
+            pass
+
+    if evicted:
+        # Drop index entries that now point at missing blobs
+        with os.scandir(INDEX_DIR) as entries:
+            for entry in entries:
+                if _lookup(entry.name[:-len('.json')]) is None:
+                    try:
+                        os.remove(entry.path)
+                    except OSError:
+                        pass
+
+
+def fetch(url, headers, extension, storage_path, download, on_wait=None):
+    """
+    Return a local copy of url from the cache, downloading it on a miss.
+
+    Args:
+        url (str): Remote URL
+        headers (dict): Response headers for the URL, used for ETag/Last-Modified
+        extension (str): File extension for the returned path
+        storage_path (str): Directory to place the caller's copy in
+        download (callable): download(url, directory) -> path of a fresh download; only called on a miss
+        on_wait (callable, optional): Called before blocking on a lock held by another download,
+            e.g. to close a response whose body would otherwise sit unread while waiting
+
+    Returns:
+        str or None: Path in storage_path, or None if the URL has no validator and cannot be cached
+    """
+    validator = get_validator(headers)
+    if not validator:
+        _count("uncacheable")
+        return None
+
+    for directory in (BLOBS_DIR, INDEX_DIR, LOCKS_DIR, TMP_DIR):
+        os.makedirs(directory, exist_ok=True)
+
+    key = _cache_key(url, validator)
+    blob_path = _lookup(key)
+    hit = blob_path is not None
+    if not hit:
+        with _key_lock(key, on_wait):
+            # Another thread or worker may have fetched it while we waited for the lock
+            blob_path = _lookup(key)
+            hit = blob_path is not None
+            if not hit:
+                blob_path = _store(url, key, extension, download)
+
+    try:
+        local_filename = _link_into(blob_path, storage_path, extension)
+    except FileNotFoundError:
+        # Evicted by another worker between lookup and link
+        logger.info(f"Cached input for {url} was evicted before use, downloading without cache")
+        return None
+
+    if hit:
+        _count("hits")
+        _count("bytes_served_from_cache", os.path.getsize(local_filename))
+        logger.info(f"Input cache hit for {url}")
+    else:
+        _count("misses")
+    return local_filename
+
+
+def _store(url, key, extension, download):
+    tmp_path = download(url, TMP_DIR)
+    try:
+        digest = _file_sha256(tmp_path)
+        blob_name = f"{digest}{extension}"
+        blob_path = os.path.join(BLOBS_DIR, blob_name)
+        if os.path.exists(blob_path):
+            # Same content already cached under another URL or validator
+            _count("deduplicated")
+            os.remove(tmp_path)
+        else:
+            os.replace(tmp_path, blob_path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    index_tmp = os.path.join(TMP_DIR, f"{key}.{uuid.uuid4()}.json")
+    with open(index_tmp, 'w') as f:
+        json.dump({"url": url, "blob": blob_name, "sha256": digest}, f)
+    os.replace(index_tmp, os.path.join(INDEX_DIR, f"{key}.json"))
+
+    try:
+        _evict(keep=blob_path)
+    except OSError as e:
+        logger.warning(f"Input cache eviction failed: {e}")
+    return blob_path
+
+
+def get_cache_stats():
+    """Hit/miss counters for this worker process and the current size of the shared cache."""
+    with _stats_lock:
+        stats = dict(_stats)
+
+    size = 0
+    files = 0
+    if os.path.isdir(BLOBS_DIR):
+        with os.scandir(BLOBS_DIR) as entries:
+            for entry in entries:
+                size += entry.stat().st_size
+                files += 1
+
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_ratio"] = round(stats["hits"] / lookups, 3) if lookups else None
+    stats["files"] = files
+    stats["size_mb"] = round(size / (1024 * 1024), 1)
+    stats["max_size_mb"] = INPUT_CACHE_MAX_MB
+    return stats
@@ -0,0 +1,145 @@
+# Copyright (c) 2025 Stephen G. Pope
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+
+import logging
+import threading
+from collections import deque, defaultdict
+
+logger = logging.getLogger(__name__)
+
+CPU_POOL = "cpu"
+IO_POOL = "io"
+
+
+def parse_endpoint_limits(value):
+    """
+    Parse per-endpoint concurrency limits from a string like "/v1/video/caption=1,/v1/media/transcribe=2".
+
+    Args:
+        value (str): Comma-separated endpoint=limit pairs
+
+    Returns:
+        dict: Mapping of endpoint path to maximum concurrent jobs
+    """
+    limits = {}
+    for item in (value or '').split(','):
+        item = item.strip()
+        if not item:
+            continue
+        endpoint, _, limit = item.rpartition('=')
+        if not endpoint or not limit.strip().isdigit():
+            logger.warning(f"Ignoring invalid endpoint concurrency limit: {item}")
+            continue
+        limits[endpoint.strip()] = int(limit)
+    return limits
+
+
+class QueuedJob:
+    def __init__(self, job_id, data, task_func, endpoint, pool, queue_start_time, task_name=None, args=(), kwargs=None):
+        self.job_id = job_id
+        self.data = data
+        self.task_func = task_func
+        self.endpoint = endpoint
+        self.pool = pool
+        self.queue_start_time = queue_start_time
+        # Name, positional and keyword arguments of the registered endpoint
+        # function, so executors that persist jobs can rebuild task_func
+        self.task_name = task_name
+        self.args = args
+        self.kwargs = kwargs or {}
+
+
+class JobExecutor:
+    """
+    Runs queued jobs on named pools of worker threads.
+
+    Each pool (e.g. "cpu" for encodes and Whisper, "io" for downloads and
+    uploads) has its own FIFO of pending jobs and its own workers. A job is
+    only started while its endpoint is below its concurrency limit; jobs
+    behind it whose endpoints still have capacity may start first.
+    """
+
+    def __init__(self, run_job, pool_sizes, endpoint_limits=None):
+        """
+        Args:
+            run_job (callable): Called with a QueuedJob on a worker thread
+            pool_sizes (dict): Mapping of pool name to number of worker threads
+            endpoint_limits (dict): Mapping of endpoint path to maximum concurrent jobs
+        """
+        self._run_job = run_job
+        self._pool_sizes = {pool: max(1, size) for pool, size in pool_sizes.items()}
+        self._endpoint_limits = endpoint_limits or {}
+        self._pending = {pool: deque() for pool in self._pool_sizes}
+        self._running = defaultdict(int)
+        self._condition = threading.Condition()
+
+    def start(self):
+        for pool, size in self._pool_sizes.items():
+            for i in range(size):
+                threading.Thread(target=self._worker, args=(pool,), name=f"job-{pool}-{i}", daemon=True).start()
+            logger.info(f"Started {size} worker thread(s) for the {pool} job pool")
+
+    def submit(self, job):
+        if job.pool not in self._pending:
+            logger.warning(f"Job {job.job_id}: Unknown pool '{job.pool}', using '{CPU_POOL}'")
+            job.pool = CPU_POOL
+        with self._condition:
+            self._pending[job.pool].append(job)
+            self._condition.notify_all()
+
+    def qsize(self):
+        """Number of jobs waiting to start across all pools."""
+        with self._condition:
+            return sum(len(pending) for pending in self._pending.values())
+
+    def running_count(self):
+        with self._condition:
+            return sum(self._running.values())
+
+    def _has_capacity(self, endpoint):
+        limit = self._endpoint_limits.get(endpoint)
+        return not limit or self._running[endpoint] < limit
+
+    def _claim(self, pool):
+        """Take the oldest pending job in the pool whose endpoint has capacity. Caller holds the condition."""
+        pending = self._pending[pool]
+        for job in pending:
+            if self._has_capacity(job.endpoint):
+                pending.remove(job)
+                self._running[job.endpoint] += 1
+                return job
+        return None
+
+    def _worker(self, pool):
+        while True:
+            with self._condition:
+                job = self._claim(pool)
+                while job is None:
+                    self._condition.wait()
+                    job = self._claim(pool)
+
+            try:
+                self._run_job(job)
+            except Exception as e:
+                logger.error(f"Job {job.job_id}: Unhandled error in {pool} worker: {str(e)}", exc_info=True)
+            finally:
+                with self._condition:
+                    self._running[job.endpoint] -= 1
+                    # A slot for this endpoint is free again; wake every pool
+                    # since jobs for it may be waiting in any of them.
+                    self._condition.notify_all()
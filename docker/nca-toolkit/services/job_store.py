@@ -0,0 +1,393 @@
+# Copyright (c) 2025 Stephen G. Pope
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from abc import ABC, abstractmethod
+from config import LOCAL_STORAGE_PATH, JOB_STORE_BACKEND, JOB_STATUS_TTL, JOB_STORE_MIGRATE, REDIS_URL
+
+logger = logging.getLogger(__name__)
+
+# How often, in seconds, a store removes entries older than JOB_STATUS_TTL
+PURGE_INTERVAL = 300
+
+
+class JobStore(ABC):
+    """Persists the latest status record of each job, indexed by update time and status."""
+
+    def __init__(self, ttl=0):
+        self.ttl = ttl
+        self._last_purge = 0
+
+    @abstractmethod
+    def save(self, job_id: str, data: dict) -> None:
+        pass
+
+    @abstractmethod
+    def get(self, job_id: str):
+        """Return the stored record for job_id, or None if it is unknown or expired."""
+        pass
+
+    @abstractmethod
+    def list_jobs(self, since=None, until=None, job_status=None, limit=None, offset=0) -> list:
+        """
+        Return jobs updated within [since, until], most recently updated first.
+
+        Args:
+            since (float): Earliest update time (epoch seconds), inclusive
+            until (float): Latest update time (epoch seconds), inclusive
+            job_status (str): Only return jobs in this status (queued, running, done)
+            limit (int): Maximum number of jobs to return; None for no limit
+            offset (int): Number of matching jobs to skip, for pagination
+
+        Returns:
+            list: Dicts with job_id, job_status and updated_at
+        """
+        pass
+
+    @abstractmethod
+    def purge_expired(self) -> int:
+        """Remove records older than the TTL and return how many were removed."""
+        pass
+
+    def _maybe_purge(self):
+        if self.ttl <= 0 or time.time() - self._last_purge < PURGE_INTERVAL:
+            return
+        self._last_purge = time.time()
+        try:
+            removed = self.purge_expired()
+            if removed:
+                logger.info(f"Purged {removed} expired job status record(s)")
+        except Exception as e:
+            logger.error(f"Failed to purge expired job status records: {e}")
+
+
+class FileJobStore(JobStore):
+    """Original layout: one JSON file per job in LOCAL_STORAGE_PATH/jobs. Listing scans the directory."""
+
+    def __init__(self, jobs_dir, ttl=0):
+        super().__init__(ttl)
+        self.jobs_dir = jobs_dir
+        os.makedirs(jobs_dir, exist_ok=True)
+
+    def save(self, job_id, data):
+        job_file = os.path.join(self.jobs_dir, f"{job_id}.json")
+        with open(job_file, 'w') as f:
+            json.dump(data, f)
+        self._maybe_purge()
+
+    def get(self, job_id):
+        job_file = os.path.join(self.jobs_dir, f"{job_id}.json")
+        if not os.path.exists(job_file):
+            return None
+        with open(job_file, 'r') as f:
+            return json.load(f)
+
+    def list_jobs(self, since=None, until=None, job_status=None, limit=None, offset=0):
+        jobs = []
+        with os.scandir(self.jobs_dir) as entries:
+            for entry in entries:
+                if not entry.name.endswith('.json'):
+                    continue
+                updated_at = entry.stat().st_mtime
+                if (since is not None and updated_at < since) or (until is not None and updated_at > until):
+                    continue
+                try:
+                    with open(entry.path, 'r') as f:
+                        status = json.load(f).get("job_status")
+                except (OSError, ValueError):
+                    continue
+                if job_status and status != job_status:
+                    continue
+                jobs.append({"job_id": entry.name[:-len('.json')], "job_status": status, "updated_at": updated_at})
+
+        jobs.sort(key=lambda job: job["updated_at"], reverse=True)
+        end = offset + limit if limit is not None else None
+        return jobs[offset:end]
+
+    def purge_expired(self):
+        cutoff = time.time() - self.ttl
+        removed = 0
+        with os.scandir(self.jobs_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith('.json') and entry.stat().st_mtime < cutoff:
+                    try:
+                        os.remove(entry.path)
+                        removed += 1
+                    except OSError:
+                        pass
+        return removed
+
+
+class SQLiteJobStore(JobStore):
+    """Single SQLite database in WAL mode, shared by all worker processes on the host."""
+
+    def __init__(self, db_path, ttl=0):
+        super().__init__(ttl)
+        self.db_path = db_path
+        self._local = threading.local()
+        conn = self._connection()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                job_status TEXT,
+                updated_at REAL NOT NULL,
+                data TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_updated_at ON jobs (updated_at);
+            CREATE INDEX IF NOT EXISTS idx_jobs_status_updated_at ON jobs (job_status, updated_at);
+        """)
+
+    def _connection(self):
+        # sqlite3 connections must not be shared across threads, so keep one per thread
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def save(self, job_id, data):
+        self._connection().execute(
+            "INSERT INTO jobs (job_id, job_status, updated_at, data) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(job_id) DO UPDATE SET job_status = excluded.job_status, "
+            "updated_at = excluded.updated_at, data = excluded.data",
+            (job_id, data.get("job_status"), time.time(), json.dumps(data))
+        )
+        self._maybe_purge()
+
+    def get(self, job_id):
+        row = self._connection().execute("SELECT data, updated_at FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None or (self.ttl > 0 and row[1] < time.time() - self.ttl):
+            return None
+        return json.loads(row[0])
+
+    def list_jobs(self, since=None, until=None, job_status=None, limit=None, offset=0):
+        clauses, params = [], []
+        if since is not None:
+            clauses.append("updated_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("updated_at <= ?")
+            params.append(until)
+        if job_status:
+            clauses.append("job_status = ?")
+            params.append(job_status)
+
+        query = "SELECT job_id, job_status, updated_at FROM jobs"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY updated_at DESC LIMIT ? OFFSET ?"
+        params.extend([limit if limit is not None else -1, offset])
+
+        rows = self._connection().execute(query, params).fetchall()
+        return [{"job_id": row[0], "job_status": row[1], "updated_at": row[2]} for row in rows]
+
+    def purge_expired(self):
+        cursor = self._connection().execute("DELETE FROM jobs WHERE updated_at < ?", (time.time() - self.ttl,))
+        return cursor.rowcount
+
+    def migrate_json_files(self, jobs_dir):
+        """
+        Import legacy per-job JSON files, using each file's mtime as its update time.
+
+        Each file is renamed to <job_id>.json.migrated once imported, so the
+        migration is not repeated but the files are still there for an older
+        version to use after a rollback. Existing rows are never overwritten.
+
+        Returns:
+            int: Number of files imported
+        """
+        if not os.path.isdir(jobs_dir):
+            return 0
+
+        conn = self._connection()
+        imported = 0
+        batch = []
+
+        def flush():
+            conn.execute("BEGIN")
+            conn.executemany(
+                "INSERT OR IGNORE INTO jobs (job_id, job_status, updated_at, data) VALUES (?, ?, ?, ?)",
+                [row for row, _ in batch]
+            )
+            conn.execute("COMMIT")
+            for _, path in batch:
+                try:
+                    os.replace(path, f"{path}.migrated")
+                except OSError:
+                    pass
+            batch.clear()
+
+        with os.scandir(jobs_dir) as entries:
+            for entry in entries:
+                if not entry.name.endswith('.json'):
+                    continue
+                try:
+                    updated_at = entry.stat().st_mtime
+                    with open(entry.path, 'r') as f:
+                        data = json.load(f)
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Skipping unreadable job status file {entry.path}: {e}")
+                    continue
+                batch.append(((entry.name[:-len('.json')], data.get("job_status"), updated_at, json.dumps(data)), entry.path))
+                imported += 1
+                if len(batch) >= 1000:
+                    flush()
+        if batch:
+            flush()
+
+        if imported:
+            logger.info(f"Migrated {imported} job status file(s) from {jobs_dir} into {self.db_path}")
+        return imported
+
+
+class RedisJobStore(JobStore):
+    """
+    Job records in Redis, shared across hosts.
+
+    Each record is a JSON string with a TTL, indexed by update time in one
+    sorted set for all jobs and one per status.
+    """
+
+    def __init__(self, client, ttl=0, key_prefix="nca:job_status"):
+        super().__init__(ttl)
+        self.client = client
+        self.prefix = key_prefix
+
+    def _job_key(self, job_id):
+        return f"{self.prefix}:job:{job_id}"
+
+    def _index_key(self, job_status=None):
+        return f"{self.prefix}:index:{job_status}" if job_status else f"{self.prefix}:index"
+
+    def save(self, job_id, data):
+        updated_at = time.time()
+        status = data.get("job_status")
+        previous = self.client.get(self._job_key(job_id))
+        previous_status = json.loads(previous).get("job_status") if previous else None
+
+        pipe = self.client.pipeline()
+        pipe.set(self._job_key(job_id), json.dumps(data), ex=self.ttl if self.ttl > 0 else None)
+        pipe.zadd(self._index_key(), {job_id: updated_at})
+        if previous_status and previous_status != status:
+            pipe.zrem(self._index_key(previous_status), job_id)
+        if status:
+            pipe.zadd(self._index_key(status), {job_id: updated_at})
+        pipe.execute()
+        self._maybe_purge()
+
+    def get(self, job_id):
+        raw = self.client.get(self._job_key(job_id))
+        return json.loads(raw) if raw else None
+
+    def list_jobs(self, since=None, until=None, job_status=None, limit=None, offset=0):
+        entries = self.client.zrevrangebyscore(
+            self._index_key(job_status),
+            until if until is not None else '+inf',
+            since if since is not None else '-inf',
+            start=offset,
+            num=limit if limit is not None else -1,
+            withscores=True
+        )
+        jobs = []
+        for job_id, updated_at in entries:
+            if job_status:
+                status = job_status
+            else:
+                raw = self.client.get(self._job_key(job_id))
+                if raw is None:
+                    continue
+                status = json.loads(raw).get("job_status")
+            jobs.append({"job_id": job_id, "job_status": status, "updated_at": updated_at})
+        return jobs
+
+    def purge_expired(self):
+        # Records expire on their own; only the index entries need trimming
+        cutoff = time.time() - self.ttl
+        removed = self.client.zremrangebyscore(self._index_key(), '-inf', cutoff)
+        for status in ("queued", "running", "done"):
+            self.client.zremrangebyscore(self._index_key(status), '-inf', cutoff)
+        return removed
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_job_store() -> JobStore:
+    """Return the process-wide job store selected by JOB_STORE_BACKEND, creating it on first use."""
+    global _store
+    if _store is not None:
+        return _store
+
+    with _store_lock:
+        if _store is None:
+            jobs_dir = os.path.join(LOCAL_STORAGE_PATH, 'jobs')
+            backend = JOB_STORE_BACKEND.lower()
+
+            if backend == 'file':
+                _store = FileJobStore(jobs_dir, JOB_STATUS_TTL)
+            elif backend == 'redis':
+                from services.redis_job_queue import get_redis_client
+                _store = RedisJobStore(get_redis_client(REDIS_URL), JOB_STATUS_TTL)
+            elif backend == 'sqlite':
+                os.makedirs(LOCAL_STORAGE_PATH, exist_ok=True)
+                store = SQLiteJobStore(os.path.join(LOCAL_STORAGE_PATH, 'jobs.db'), JOB_STATUS_TTL)
+                if JOB_STORE_MIGRATE and os.path.isdir(jobs_dir):
+                    # Importing a large legacy directory can take a while; do not hold up startup
+                    threading.Thread(target=store.migrate_json_files, args=(jobs_dir,), daemon=True).start()
+                _store = store
+            else:
+                raise ValueError(f"Unknown JOB_STORE_BACKEND: {JOB_STORE_BACKEND}")
+
+            logger.info(f"Using {type(_store).__name__} for job status")
+    return _store
+
+
+def update_job_progress(job_id, last_timestamp, duration, **extra):
+    """
+    Record how far a running media job has got, so /v1/toolkit/job/status can report it.
+
+    Progress is best effort: a failure to write it is logged and otherwise ignored.
+
+    Args:
+        job_id (str): The job to update; ignored unless its status is "running"
+        last_timestamp (float): Media time in seconds processed so far
+        duration (float): Total media duration in seconds
+        **extra: Additional fields for the progress record (e.g. segments)
+    """
+    try:
+        store = get_job_store()
+        record = store.get(job_id)
+        if record is None or record.get("job_status") != "running":
+            return
+        record["progress"] = {
+            "percent": round(min(100.0, 100.0 * last_timestamp / duration), 1) if duration else None,
+            "last_timestamp": round(last_timestamp, 3),
+            "duration": round(duration, 3),
+            **extra
+        }
+        store.save(job_id, record)
+    except Exception as e:
+        logger.warning(f"Job {job_id}: Could not record progress: {e}")
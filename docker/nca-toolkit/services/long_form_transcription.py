@@ -0,0 +1,274 @@
+# Copyright (c) 2025 Stephen G. Pope
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+
+import os
+import logging
+import threading
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from collections import Counter
+from config import (
+    TRANSCRIBE_PARALLEL_WORKERS, TRANSCRIBE_LONG_FORM_MIN_SECONDS, TRANSCRIBE_CHUNK_SECONDS,
+    TRANSCRIBE_CHUNK_OVERLAP, TRANSCRIBE_SILENCE_NOISE, TRANSCRIBE_SILENCE_MIN_DURATION
+)
+from services.whisper_models import whisper_model
+from services.audio_extraction import PCM_INPUT_ARGS, pcm_duration, read_pcm
+from services.v1.media.silence import parse_silencedetect_output
+
+logger = logging.getLogger(__name__)
+
+# Options that carry context from one window into the next and so cannot be
+# honoured across independently transcribed chunks
+_SEQUENTIAL_OPTIONS = ("clip_timestamps",)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def is_enabled():
+    return TRANSCRIBE_PARALLEL_WORKERS > 0
+
+
+def should_use_long_form(duration):
+    """Whether audio of this many seconds is worth splitting across the chunk worker pool."""
+    return is_enabled() and duration >= TRANSCRIBE_LONG_FORM_MIN_SECONDS
+
+
+def find_silences(audio_path, noise=TRANSCRIBE_SILENCE_NOISE, min_duration=TRANSCRIBE_SILENCE_MIN_DURATION):
+    """Run FFmpeg silencedetect over extracted audio and return (start, end) pairs in seconds."""
+    cmd = (
+        ['ffmpeg', '-nostdin'] + PCM_INPUT_ARGS + ['-i', audio_path,
+        '-af', f'silencedetect=noise={noise}:d={min_duration}',
+        '-f', 'null', '-']
+    )
+    result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Silence detection failed: {result.stderr[-500:]}")
+    return [(start, end) for start, end, _ in parse_silencedetect_output(result.stderr)]
+
+
+def plan_chunks(duration, silences, chunk_seconds=TRANSCRIBE_CHUNK_SECONDS, overlap=TRANSCRIBE_CHUNK_OVERLAP):
+    """
+    Split [0, duration) into chunks of roughly chunk_seconds, cutting inside silences.
+
+    Each cut is placed at the middle of the silence closest to the target
+    length, looking between half and one and a half chunk lengths ahead. When
+    there is no silence in that range (music, continuous speech) the chunk is
+    cut at the target length instead, and the audio windows on both sides of
+    that hard cut are widened by overlap seconds so words crossing it are
+    heard whole by at least one chunk.
+
+    Args:
+        duration (float): Length of the media in seconds
+        silences (list): (start, end) silence intervals in seconds
+        chunk_seconds (float): Target chunk length
+        overlap (float): Extra audio on each side of a hard cut
+
+    Returns:
+        list: Dicts with 'start'/'end' (audio window to transcribe) and
+              'keep_start'/'keep_end' (the part of the timeline this chunk owns)
+    """
+    midpoints = sorted((start + end) / 2 for start, end in silences)
+
+    cuts = []
+    position = 0.0
+    # Stop once the remainder fits in one and a half chunks so the last chunk is never tiny
+    while duration - position > chunk_seconds * 1.5:
+        target = position + chunk_seconds
+        low = position + chunk_seconds * 0.5
+        high = position + chunk_seconds * 1.5
+        candidates = [m for m in midpoints if low <= m <= high]
+        if candidates:
+            cut = min(candidates, key=lambda m: abs(m - target))
+            cuts.append((cut, False))
+        else:
+            cut = target
+            cuts.append((cut, True))
+        position = cut
+
+    boundaries = [(0.0, False)] + cuts + [(duration, False)]
+    chunks = []
+    for (keep_start, hard_start), (keep_end, hard_end) in zip(boundaries, boundaries[1:]):
+        chunks.append({
+            "start": max(0.0, keep_start - overlap) if hard_start else keep_start,
+            "end": min(duration, keep_end + overlap) if hard_end else keep_end,
+            "keep_start": keep_start,
+            "keep_end": keep_end
+        })
+    return chunks
+
+
+def _init_worker(threads):
+    # Split the cores between the chunk workers instead of every worker
+    # starting one thread per core; CTranslate2 reads OMP_NUM_THREADS
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+
+def _transcribe_window(audio_path, start, duration, model_size, backend, options):
+    """Runs in a chunk worker process; each worker keeps its own resident model."""
+    audio = read_pcm(audio_path, start, duration)
+    with whisper_model(model_size, backend=backend) as model:
+        return model.transcribe(audio, **options)
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                threads = max(1, (os.cpu_count() or 1) // TRANSCRIBE_PARALLEL_WORKERS)
+                # spawn rather than fork: the API process runs many threads and
+                # may hold a model and CUDA context that must not be inherited
+                _pool = ProcessPoolExecutor(
+                    max_workers=TRANSCRIBE_PARALLEL_WORKERS,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                    initargs=(threads,)
+                )
+                logger.info(f"Started {TRANSCRIBE_PARALLEL_WORKERS} transcription chunk worker(s) "
+                            f"with {threads} thread(s) each")
+    return _pool
+
+
+def _reset_pool(pool):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _keep(start, end, chunk):
+    """Whether a span (in global seconds) belongs to this chunk's part of the timeline."""
+    midpoint = (start + end) / 2
+    return chunk["keep_start"] <= midpoint < chunk["keep_end"]
+
+
+def shift_segment(segment, offset, chunk):
+    """Move a chunk-relative segment onto the global timeline and drop words owned by a neighbour.
+
+    Returns None when nothing of the segment belongs to this chunk.
+    """
+    segment = dict(segment)
+    segment["start"] = round(segment["start"] + offset, 3)
+    segment["end"] = round(segment["end"] + offset, 3)
+    segment["seek"] = segment.get("seek", 0) + int(round(offset * 100))
+
+    words = segment.get("words")
+    if words is None:
+        return segment if _keep(segment["start"], segment["end"], chunk) else None
+
+    kept = []
+    for word in words:
+        word = dict(word)
+        word["start"] = round(word["start"] + offset, 3)
+        word["end"] = round(word["end"] + offset, 3)
+        if _keep(word["start"], word["end"], chunk):
+            kept.append(word)
+    if not kept:
+        return None
+
+    if len(kept) != len(words):
+        # Only part of the segment falls in this chunk; rebuild it from the words we keep
+        segment["start"] = kept[0]["start"]
+        segment["end"] = kept[-1]["end"]
+        segment["text"] = "".join(word["word"] for word in kept)
+        segment.pop("tokens", None)
+    segment["words"] = kept
+    return segment
+
+
+def stitch_results(chunks, results):
+    """
+    Merge per-chunk Whisper results into one result on the global timeline.
+
+    Segment and word timestamps are shifted by each chunk's start. Where
+    neighbouring chunks overlap, each segment (or, with word timestamps, each
+    word) is kept only by the chunk whose part of the timeline contains its
+    midpoint, so nothing in the overlap appears twice. Segment ids are
+    renumbered from 0.
+    """
+    segments = []
+    for chunk, result in zip(chunks, results):
+        for segment in result.get("segments", []):
+            shifted = shift_segment(segment, chunk["start"], chunk)
+            if shifted is not None:
+                segments.append(shifted)
+
+    segments.sort(key=lambda segment: segment["start"])
+    for index, segment in enumerate(segments):
+        segment["id"] = index
+
+    languages = Counter(result.get("language") for result in results if result.get("language"))
+    return {
+        "text": "".join(segment["text"] for segment in segments),
+        "segments": segments,
+        "language": languages.most_common(1)[0][0] if languages else None
+    }
+
+
+def transcribe_long_form(audio_path, model_size="base", backend=None, on_progress=None, **options):
+    """
+    Transcribe long audio as silence-aligned chunks in parallel worker processes.
+
+    Args:
+        audio_path (str): 16 kHz mono PCM written by audio_extraction.extract_audio
+        model_size (str): Whisper model name
+        backend (str): Transcription backend name; defaults to TRANSCRIPTION_BACKEND
+        on_progress (callable, optional): Called with (last_timestamp, duration) as
+            each chunk, in order, finishes
+        **options: Keyword arguments for model.transcribe
+
+    Returns:
+        dict: Whisper-style result with 'text', 'segments' and 'language'
+    """
+    duration = pcm_duration(audio_path)
+    chunks = plan_chunks(duration, find_silences(audio_path))
+    options = {k: v for k, v in options.items() if k not in _SEQUENTIAL_OPTIONS}
+    options["verbose"] = None
+    logger.info(f"Transcribing {duration:.0f}s of audio as {len(chunks)} chunk(s) "
+                f"across {TRANSCRIBE_PARALLEL_WORKERS} worker(s)")
+
+    pool = _get_pool()
+    futures = []
+    try:
+        for chunk in chunks:
+            futures.append(pool.submit(_transcribe_window, audio_path, chunk["start"],
+                                       chunk["end"] - chunk["start"], model_size, backend, options))
+        results = []
+        for chunk, future in zip(chunks, futures):
+            results.append(future.result())
+            if on_progress:
+                on_progress(chunk["keep_end"], duration)
+    except BrokenProcessPool:
+        # A worker died (usually out of memory); start a fresh pool for the next job
+        _reset_pool(pool)
+        raise RuntimeError("A transcription chunk worker exited unexpectedly")
+    except Exception:
+        for future in futures:
+            future.cancel()
+        raise
+
+    return stitch_results(chunks, results)
@@ -0,0 +1,284 @@
+# Copyright (c) 2025 Stephen G. Pope
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+
+import json
+import time
+import logging
+import threading
+from services.job_executor import JobExecutor, QueuedJob
+
+logger = logging.getLogger(__name__)
+
+# Pop the oldest pending job id and lease it in the processing set in one step,
+# so two workers can never claim the same job.
+CLAIM_SCRIPT = """
+local job_id = redis.call('RPOP', KEYS[1])
+if not job_id then
+    return false
+end
+redis.call('ZADD', KEYS[2], ARGV[1], job_id)
+return job_id
+"""
+
+
+def get_redis_client(redis_url):
+    """Create a Redis/Valkey client; the redis package is only needed when this backend is enabled."""
+    try:
+        import redis
+    except ImportError:
+        raise ValueError("The redis package is required for JOB_QUEUE_BACKEND=redis. Install it with 'pip install redis'.")
+    return redis.Redis.from_url(redis_url, decode_responses=True)
+
+
+class RedisJobExecutor(JobExecutor):
+    """
+    JobExecutor whose pending jobs live in Redis instead of process memory.
+
+    Any worker process or container pointed at the same Redis can claim the
+    next job. A claimed job is leased in a sorted set with a deadline that
+    the owning process keeps extending while the job runs. If the process
+    dies, the lease expires and the job is put back on its pending list,
+    up to max_attempts times.
+
+    Keys (all under key_prefix):
+        pending:<pool>  LIST of job ids, pushed on the left and claimed from the right
+        processing      ZSET of leased job ids scored by lease deadline
+        job:<job_id>    JSON payload needed to rebuild and run the job
+    """
+
+    def __init__(self, run_job, pool_sizes, endpoint_limits, client, resolve_task, fail_job,
+                 key_prefix="nca:jobs", visibility_timeout=60, max_attempts=3, poll_interval=0.5):
+        """
+        Args:
+            run_job (callable): Called with a QueuedJob on a worker thread
+            pool_sizes (dict): Mapping of pool name to number of worker threads
+            endpoint_limits (dict): Mapping of endpoint path to maximum concurrent jobs in this process
+            client (redis.Redis): Client created with decode_responses=True
+            resolve_task (callable): Maps (task_name, job_id, data, args, kwargs) to a zero-argument callable
+            fail_job (callable): Called with (QueuedJob, message) when a job exhausts its attempts,
+                including a task that cannot be resolved on any of them
+            key_prefix (str): Namespace for all keys used by the queue
+            visibility_timeout (int): Seconds a lease lasts without a heartbeat
+            max_attempts (int): Times a job may be claimed before it is failed
+            poll_interval (float): Seconds an idle worker waits before polling again
+        """
+        super().__init__(run_job, pool_sizes, endpoint_limits)
+        self._client = client
+        self._resolve_task = resolve_task
+        self._fail_job = fail_job
+        self._prefix = key_prefix
+        self._visibility_timeout = visibility_timeout
+        self._max_attempts = max_attempts
+        self._poll_interval = poll_interval
+        self._leased = set()
+        self._claim_script = client.register_script(CLAIM_SCRIPT)
+
+    def _pending_key(self, pool):
+        return f"{self._prefix}:pending:{pool}"
+
+    def _job_key(self, job_id):
+        return f"{self._prefix}:job:{job_id}"
+
+    @property
+    def _processing_key(self):
+        return f"{self._prefix}:processing"
+
+    def start(self):
+        super().start()
+        threading.Thread(target=self._maintain_leases, name="job-leases", daemon=True).start()
+
+    def submit(self, job):
+        if job.pool not in self._pool_sizes:
+            logger.warning(f"Job {job.job_id}: Unknown pool '{job.pool}', using the first configured pool")
+            job.pool = next(iter(self._pool_sizes))
+
+        payload = {
+            "job_id": job.job_id,
+            "data": job.data,
+            "task_name": job.task_name,
+            "args": list(job.args),
+            "kwargs": job.kwargs,
+            "endpoint": job.endpoint,
+            "pool": job.pool,
+            "queue_start_time": job.queue_start_time,
+            "attempts": 0
+        }
+        pipe = self._client.pipeline()
+        pipe.set(self._job_key(job.job_id), json.dumps(payload))
+        pipe.lpush(self._pending_key(job.pool), job.job_id)
+        pipe.execute()
+
+    def qsize(self):
+        pipe = self._client.pipeline()
+        for pool in self._pool_sizes:
+            pipe.llen(self._pending_key(pool))
+        return sum(pipe.execute())
+
+    def _load_job(self, job_id):
+        raw = self._client.get(self._job_key(job_id))
+        if raw is None:
+            return None, None
+        payload = json.loads(raw)
+        job = QueuedJob(
+            payload["job_id"],
+            payload["data"],
+            None,
+            payload["endpoint"],
+            payload["pool"],
+            payload["queue_start_time"],
+            task_name=payload["task_name"],
+            args=payload["args"],
+            kwargs=payload["kwargs"]
+        )
+        return job, payload
+
+    def _release(self, job_id, pool):
+        """Give a claimed job back, behind the jobs already pending."""
+        pipe = self._client.pipeline()
+        pipe.zrem(self._processing_key, job_id)
+        pipe.lpush(self._pending_key(pool), job_id)
+        pipe.execute()
+
+    def _ack(self, job_id):
+        pipe = self._client.pipeline()
+        pipe.zrem(self._processing_key, job_id)
+        pipe.delete(self._job_key(job_id))
+        pipe.execute()
+
+    def _claim_next(self, pool):
+        deadline = time.time() + self._visibility_timeout
+        job_id = self._claim_script(keys=[self._pending_key(pool), self._processing_key], args=[deadline])
+        if not job_id:
+            return None
+
+        job, payload = self._load_job(job_id)
+        if job is None:
+            logger.warning(f"Job {job_id}: Claimed job has no payload, dropping it")
+            self._client.zrem(self._processing_key, job_id)
+            return None
+
+        try:
+            job.task_func = self._resolve_task(job.task_name, job.job_id, job.data, job.args, job.kwargs)
+        except Exception as e:
+            # Another process sharing the queue may serve this endpoint, so put
+            # the job back behind the others; each try counts as an attempt so
+            # a task that no process can run is eventually failed
+            payload["attempts"] += 1
+            message = f"Cannot resolve task {job.task_name}: {str(e)}"
+            if payload["attempts"] >= self._max_attempts:
+                logger.error(f"Job {job_id}: {message}, giving up after {payload['attempts']} attempt(s)")
+                self._ack(job_id)
+                self._fail_job(job, f"{message} (after {payload['attempts']} attempt(s))")
+                return None
+            logger.warning(f"Job {job_id}: {message}, returning it to the queue "
+                           f"(attempt {payload['attempts']} of {self._max_attempts})")
+            self._client.set(self._job_key(job_id), json.dumps(payload))
+            self._release(job_id, pool)
+            return None
+
+        with self._condition:
+            reserved = self._has_capacity(job.endpoint)
+            if reserved:
+                self._running[job.endpoint] += 1
+                self._leased.add(job_id)
+
+        if not reserved:
+            # Behind the other jobs, so workers move on to jobs for endpoints
+            # with free capacity instead of reclaiming this one
+            self._release(job_id, pool)
+            return None
+
+        try:
+            payload["attempts"] += 1
+            self._client.set(self._job_key(job_id), json.dumps(payload))
+        except Exception:
+            with self._condition:
+                self._running[job.endpoint] -= 1
+                self._leased.discard(job_id)
+            raise
+
+        return job
+
+    def _worker(self, pool):
+        while True:
+            try:
+                job = self._claim_next(pool)
+            except Exception as e:
+                logger.error(f"Error claiming job from the {pool} queue: {str(e)}")
+                job = None
+
+            if job is None:
+                time.sleep(self._poll_interval)
+                continue
+
+            try:
+                self._run_job(job)
+            except Exception as e:
+                logger.error(f"Job {job.job_id}: Unhandled error in {pool} worker: {str(e)}", exc_info=True)
+            finally:
+                with self._condition:
+                    self._running[job.endpoint] -= 1
+                    self._leased.discard(job.job_id)
+                try:
+                    self._ack(job.job_id)
+                except Exception as e:
+                    logger.error(f"Job {job.job_id}: Failed to acknowledge job: {str(e)}")
+
+    def _maintain_leases(self):
+        """Extend leases for jobs running here and requeue jobs whose owner stopped heartbeating."""
+        interval = max(1, self._visibility_timeout / 3)
+        while True:
+            time.sleep(interval)
+            try:
+                self._extend_leases()
+                self._requeue_expired()
+            except Exception as e:
+                logger.error(f"Error maintaining job leases: {str(e)}")
+
+    def _extend_leases(self):
+        with self._condition:
+            leased = list(self._leased)
+        if not leased:
+            return
+        deadline = time.time() + self._visibility_timeout
+        # XX only updates existing members, so a lease that was already
+        # reclaimed by another process is not resurrected.
+        self._client.zadd(self._processing_key, {job_id: deadline for job_id in leased}, xx=True)
+
+    def _requeue_expired(self):
+        expired = self._client.zrangebyscore(self._processing_key, '-inf', time.time(), start=0, num=100)
+        for job_id in expired:
+            # Only the process whose ZREM succeeds handles the expired lease
+            if not self._client.zrem(self._processing_key, job_id):
+                continue
+
+            job, payload = self._load_job(job_id)
+            if job is None:
+                continue
+
+            if payload["attempts"] >= self._max_attempts:
+                logger.error(f"Job {job_id}: Lease expired after {payload['attempts']} attempt(s), giving up")
+                self._client.delete(self._job_key(job_id))
+                try:
+                    self._fail_job(job, f"Job abandoned after {payload['attempts']} attempt(s): worker stopped responding")
+                except Exception as e:
+                    logger.error(f"Job {job_id}: Failed to record abandoned job: {str(e)}")
+                continue
+
+            logger.warning(f"Job {job_id}: Lease expired, requeueing (attempt {payload['attempts']} of {self._max_attempts})")
+            self._client.rpush(self._pending_key(job.pool), job_id)
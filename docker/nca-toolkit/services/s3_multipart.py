@@ -0,0 +1,315 @@
+# Copyright (c) 2025 Stephen G. Pope
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from config import (S3_MULTIPART_CHUNK_MB, S3_MAX_CONCURRENCY, S3_UPLOAD_MEMORY_MB,
+                    S3_UPLOAD_SESSION_DIR, S3_ORPHAN_UPLOAD_HOURS)
+
+logger = logging.getLogger(__name__)
+
+# S3 rejects multipart parts smaller than this, except the last one
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+ORPHAN_SWEEP_INTERVAL = 3600
+_last_orphan_sweep = {}
+_orphan_sweep_lock = threading.Lock()
+
+
+def _session_path(session_id):
+    return os.path.join(S3_UPLOAD_SESSION_DIR, f"{session_id}.json")
+
+
+def _load_session(session_id):
+    try:
+        with open(_session_path(session_id), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_session(session_id, session):
+    os.makedirs(S3_UPLOAD_SESSION_DIR, exist_ok=True)
+    tmp_path = f"{_session_path(session_id)}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(session, f)
+    os.replace(tmp_path, _session_path(session_id))
+
+
+def _delete_session(session_id):
+    try:
+        os.remove(_session_path(session_id))
+    except OSError:
+        pass
+
+
+def abort_orphaned_uploads(client, bucket, older_than_hours=None):
+    """
+    Abort multipart uploads this service started in the bucket more than older_than_hours ago.
+
+    Uploads whose worker was killed are never completed or aborted, and S3
+    keeps billing for their parts until they are. Only uploads recorded in a
+    session file under S3_UPLOAD_SESSION_DIR are considered, so uploads that
+    other applications have in progress in a shared bucket are left alone.
+    The session files of aborted uploads are removed.
+
+    Returns:
+        int: Number of uploads aborted
+    """
+    if older_than_hours is None:
+        older_than_hours = S3_ORPHAN_UPLOAD_HOURS
+    cutoff = time.time() - older_than_hours * 3600
+
+    if not os.path.isdir(S3_UPLOAD_SESSION_DIR):
+        return 0
+
+    aborted = 0
+    for name in os.listdir(S3_UPLOAD_SESSION_DIR):
+        if not name.endswith('.json'):
+            continue
+        session_id = name[:-len('.json')]
+        try:
+            # The session file is written once, when the upload is created
+            if os.path.getmtime(_session_path(session_id)) >= cutoff:
+                continue
+        except OSError:
+            continue
+        session = _load_session(session_id)
+        if not session or session.get('bucket') != bucket:
+            continue
+
+        try:
+            client.abort_multipart_upload(Bucket=bucket, Key=session['key'], UploadId=session['upload_id'])
+            aborted += 1
+            logger.info(f"Aborted orphaned multipart upload of {session['key']}")
+        except Exception as e:
+            error_code = getattr(e, 'response', {}).get('Error', {}).get('Code')
+            if error_code != 'NoSuchUpload':
+                logger.warning(f"Failed to abort orphaned upload {session['upload_id']}: {e}")
+                continue
+        _delete_session(session_id)
+    return aborted
+
+
+def _maybe_abort_orphaned_uploads(client, bucket):
+    """Run abort_orphaned_uploads at most once per ORPHAN_SWEEP_INTERVAL per bucket in this process."""
+    if S3_ORPHAN_UPLOAD_HOURS <= 0:
+        return
+    now = time.time()
+    with _orphan_sweep_lock:
+        if now - _last_orphan_sweep.get(bucket, 0) < ORPHAN_SWEEP_INTERVAL:
+            return
+        _last_orphan_sweep[bucket] = now
+    try:
+        abort_orphaned_uploads(client, bucket)
+    except Exception as e:
+        logger.warning(f"Failed to sweep orphaned multipart uploads in {bucket}: {e}")
+
+
+class MultipartUpload:
+    """
+    Write a stream of bytes to S3 as a multipart upload with parts sent in parallel.
+
+    write() buffers data into parts of part_size and hands each full part to
+    a thread pool, so the producer (a download or an FFmpeg pipe) keeps
+    running while earlier parts upload. At most memory_budget bytes of
+    parts are held at once; write() blocks until a slot frees up.
+
+    The upload id is recorded under S3_UPLOAD_SESSION_DIR until the upload is
+    completed or aborted, so the orphan sweep can find it if the worker dies.
+    With a session_id the record is named after it, and if the job runs
+    again with the same session_id the upload resumes: parts already in S3
+    are kept and resume_offset says how many bytes of input to skip. Used as a context manager, the upload is
+    completed on success and aborted on an exception, including one raised
+    while completing it.
+    """
+
+    def __init__(self, client, bucket, key, extra_args=None, part_size=None, max_concurrency=None,
+                 memory_budget=None, session_id=None):
+        """
+        Args:
+            client: boto3 S3 client
+            bucket (str): Destination bucket
+            key (str): Destination object key
+            extra_args (dict): Extra arguments for create_multipart_upload, e.g. {'ACL': 'public-read'}
+            part_size (int): Bytes per part (default S3_MULTIPART_CHUNK_MB)
+            max_concurrency (int): Parts uploaded at once (default S3_MAX_CONCURRENCY)
+            memory_budget (int): Bytes of parts buffered at once (default S3_UPLOAD_MEMORY_MB)
+            session_id (str): Stable id, such as the job id, that makes the upload resumable
+        """
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.extra_args = extra_args or {}
+        self.part_size = max(MIN_PART_SIZE, part_size or S3_MULTIPART_CHUNK_MB * 1024 * 1024)
+        self.max_concurrency = max(1, max_concurrency or S3_MAX_CONCURRENCY)
+        memory_budget = memory_budget or S3_UPLOAD_MEMORY_MB * 1024 * 1024
+        self.session_id = session_id
+        # Uploads without a session_id are recorded too, under a name nothing resumes
+        self._session_name = session_id or f"upload-{uuid.uuid4()}"
+        self.upload_id = None
+        self.resume_offset = 0
+
+        self._buffer = bytearray()
+        self._next_part = 1
+        self._parts = {}
+        self._parts_lock = threading.Lock()
+        self._futures = []
+        self._slots = threading.BoundedSemaphore(max(1, memory_budget // self.part_size))
+        self._executor = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.abort()
+            return False
+        try:
+            self.complete()
+        except Exception:
+            # A failed part or a rejected completion leaves the upload open
+            self.abort()
+            raise
+        return False
+
+    def start(self):
+        _maybe_abort_orphaned_uploads(self.client, self.bucket)
+
+        if self.session_id and self._resume():
+            return
+
+        response = self.client.create_multipart_upload(Bucket=self.bucket, Key=self.key, **self.extra_args)
+        self.upload_id = response['UploadId']
+        _save_session(self._session_name, {
+            "bucket": self.bucket,
+            "key": self.key,
+            "upload_id": self.upload_id,
+            "part_size": self.part_size
+        })
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="s3-part")
+        logger.info(f"Started multipart upload of {self.key} ({self.part_size // (1024 * 1024)} MB parts, "
+                    f"{self.max_concurrency} concurrent)")
+
+    def _resume(self):
+        """Pick up a persisted session for the same object, keeping the leading run of uploaded parts."""
+        session = _load_session(self.session_id)
+        if not session or session.get('bucket') != self.bucket or session.get('key') != self.key:
+            return False
+
+        part_size = session['part_size']
+        uploaded = {}
+        try:
+            paginator = self.client.get_paginator('list_parts')
+            for page in paginator.paginate(Bucket=self.bucket, Key=self.key, UploadId=session['upload_id']):
+                for part in page.get('Parts', []):
+                    uploaded[part['PartNumber']] = part
+        except Exception as e:
+            logger.info(f"Cannot resume upload of {self.key}, starting over: {e}")
+            _delete_session(self.session_id)
+            return False
+
+        # Only a contiguous run of full-size parts lines up with a byte offset in the input
+        part_number = 1
+        while part_number in uploaded and uploaded[part_number]['Size'] == part_size:
+            self._parts[part_number] = uploaded[part_number]['ETag']
+            part_number += 1
+
+        self.upload_id = session['upload_id']
+        self.part_size = part_size
+        self._next_part = part_number
+        self.resume_offset = (part_number - 1) * part_size
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="s3-part")
+        logger.info(f"Resuming multipart upload of {self.key} at part {part_number} "
+                    f"({self.resume_offset} bytes already uploaded)")
+        return True
+
+    def _raise_failed_parts(self):
+        for future in self._futures:
+            if future.done() and future.exception() is not None:
+                raise future.exception()
+
+    def _upload_part(self, part_number, body):
+        try:
+            response = self.client.upload_part(
+                Bucket=self.bucket,
+                Key=self.key,
+                PartNumber=part_number,
+                UploadId=self.upload_id,
+                Body=body
+            )
+            with self._parts_lock:
+                self._parts[part_number] = response['ETag']
+        finally:
+            self._slots.release()
+
+    def _submit(self, body):
+        self._raise_failed_parts()
+        # Blocks while memory_budget worth of parts are waiting or uploading
+        self._slots.acquire()
+        part_number = self._next_part
+        self._next_part += 1
+        self._futures.append(self._executor.submit(self._upload_part, part_number, body))
+
+    def write(self, data):
+        self._buffer.extend(data)
+        while len(self._buffer) >= self.part_size:
+            body = bytes(self._buffer[:self.part_size])
+            del self._buffer[:self.part_size]
+            self._submit(body)
+
+    def complete(self):
+        """Upload the remaining buffered bytes, wait for every part and assemble the object."""
+        try:
+            if self._buffer or self._next_part == 1:
+                self._submit(bytes(self._buffer))
+                self._buffer = bytearray()
+            for future in self._futures:
+                future.result()
+        finally:
+            self._executor.shutdown(wait=True)
+
+        parts = [{'PartNumber': number, 'ETag': etag} for number, etag in sorted(self._parts.items())]
+        self.client.complete_multipart_upload(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            MultipartUpload={'Parts': parts}
+        )
+        _delete_session(self._session_name)
+        logger.info(f"Completed multipart upload of {self.key} in {len(parts)} part(s)")
+
+    def abort(self):
+        """Cancel in-flight parts and abort the upload so S3 does not keep orphaned parts."""
+        if self._executor is not None:
+            for future in self._futures:
+                future.cancel()
+            self._executor.shutdown(wait=True)
+        if self.upload_id:
+            try:
+                self.client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+                logger.info(f"Aborted multipart upload of {self.key}")
+            except Exception as e:
+                logger.warning(f"Failed to abort multipart upload of {self.key}: {e}")
+        _delete_session(self._session_name)
@@ -19,26 +19,67 @@
 import os
 import boto3
 import logging
+import threading
+from botocore.config import Config
+from boto3.s3.transfer import TransferConfig
 from urllib.parse import urlparse, quote
+from config import S3_MAX_POOL_CONNECTIONS, S3_MULTIPART_CHUNK_MB, S3_MAX_CONCURRENCY
 
 logger = logging.getLogger(__name__)
 
+# Process-wide S3 clients keyed by (endpoint_url, access_key, secret_key, region).
+# boto3 clients are thread-safe once created, so every upload in the worker
+# reuses one client and its pool of kept-alive TLS connections instead of
+# resolving credentials and handshaking again.
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_s3_client(endpoint_url, access_key, secret_key, region):
+    """Return the shared S3 client for these credentials, creating it on first use."""
+    key = (endpoint_url, access_key, secret_key, region)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            # Sessions are not thread-safe, so create the client under the lock
+            session = boto3.Session(
+                aws_access_key_id=access_key,
+                aws_secret_access_key=secret_key,
+                region_name=region or None
+            )
+            client = session.client('s3', endpoint_url=endpoint_url or None, config=Config(
+                max_pool_connections=S3_MAX_POOL_CONNECTIONS,
+                tcp_keepalive=True,
+                retries={'max_attempts': 5, 'mode': 'standard'}
+            ))
+            _clients[key] = client
+            logger.info(f"Created S3 client for {endpoint_url or 'AWS'} (pool size {S3_MAX_POOL_CONNECTIONS})")
+        return client
+
+def get_transfer_config():
+    """Multipart settings for upload_fileobj: parts of S3_MULTIPART_CHUNK_MB sent S3_MAX_CONCURRENCY at a time."""
+    chunk_size = S3_MULTIPART_CHUNK_MB * 1024 * 1024
+    return TransferConfig(
+        multipart_threshold=chunk_size,
+        multipart_chunksize=chunk_size,
+        max_concurrency=S3_MAX_CONCURRENCY,
+        use_threads=True
+    )
+
 def upload_to_s3(file_path, s3_url, access_key, secret_key, bucket_name, region):
     # Parse the S3 URL into bucket, region, and endpoint
     #bucket_name, region, endpoint_url = parse_s3_url(s3_url)
     
-    session = boto3.Session(
-        aws_access_key_id=access_key,
-        aws_secret_access_key=secret_key,
-        region_name=region
-    )
-    
-    client = session.client('s3', endpoint_url=s3_url)
+    client = get_s3_client(s3_url, access_key, secret_key, region)
 
     try:
         # Upload the file to the specified S3 bucket
         with open(file_path, 'rb') as data:
-            client.upload_fileobj(data, bucket_name, os.path.basename(file_path), ExtraArgs={'ACL': 'public-read'})
+            client.upload_fileobj(data, bucket_name, os.path.basename(file_path), ExtraArgs={'ACL': 'public-read'},
+                                  Config=get_transfer_config())
 
         # URL encode the filename for the URL
         encoded_filename = quote(os.path.basename(file_path))
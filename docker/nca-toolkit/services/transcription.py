@@ -17,11 +17,10 @@
 
 
 import os
-import whisper
 import srt
 from datetime import timedelta
-from whisper.utils import WriteSRT, WriteVTT
-from services.file_management import download_file
+from services.file_management import prepare_media_input
+from services.transcription_cache import transcribe
 import logging
 import uuid
 
@@ -32,26 +31,20 @@ logging.basicConfig(level=logging.INFO)
 # Set the default local storage directory
 STORAGE_PATH = "/tmp/"
 
-def process_transcription(media_url, output_type, max_chars=56, language=None,):
+def process_transcription(media_url, output_type, max_chars=56, language=None, use_cache=True):
     """Transcribe media and return the transcript, SRT or ASS file path."""
     logger.info(f"Starting transcription for media URL: {media_url} with output type: {output_type}")
-    input_filename = download_file(media_url, os.path.join(STORAGE_PATH, 'input_media'))
-    logger.info(f"Downloaded media to local file: {input_filename}")
+    # Only the audio is needed, so let FFmpeg read it straight from the URL when it can
+    media_input, is_downloaded = prepare_media_input(media_url, os.path.join(STORAGE_PATH, 'input_media'))
 
     try:
-        model = whisper.load_model("base")
-        logger.info("Loaded Whisper model")
-
-        # result = model.transcribe(input_filename)
-        # logger.info("Transcription completed")
-
         if output_type == 'transcript':
-            result = model.transcribe(input_filename, language=language)
+            result = transcribe(media_input, "base", use_cache=use_cache, language=language)
             output = result['text']
             logger.info("Generated transcript output")
         elif output_type in ['srt', 'vtt']:
 
-            result = model.transcribe(input_filename)
+            result = transcribe(media_input, "base", use_cache=use_cache)
             srt_subtitles = []
             for i, segment in enumerate(result['segments'], start=1):
                 start = timedelta(seconds=segment['start'])
@@ -70,8 +63,10 @@ def process_transcription(media_url, output_type, max_chars=56, language=None,):
             logger.info(f"Generated {output_type.upper()} output: {output}")
 
         elif output_type == 'ass':
-            result = model.transcribe(
-                input_filename,
+            result = transcribe(
+                media_input,
+                "base",
+                use_cache=use_cache,
                 word_timestamps=True,
                 task='transcribe',
                 verbose=False
@@ -92,8 +87,9 @@ def process_transcription(media_url, output_type, max_chars=56, language=None,):
         else:
             raise ValueError("Invalid output type. Must be 'transcript', 'srt', or 'vtt'.")
 
-        os.remove(input_filename)
-        logger.info(f"Removed local file: {input_filename}")
+        if is_downloaded:
+            os.remove(media_input)
+            logger.info(f"Removed local file: {media_input}")
         logger.info(f"Transcription successful, output type: {output_type}")
         return output
     except Exception as e:
@@ -0,0 +1,326 @@
+# Copyright (c) 2025 Stephen G. Pope
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+
+import os
+import logging
+from abc import ABC, abstractmethod
+from config import TRANSCRIPTION_BACKEND, FASTER_WHISPER_COMPUTE_TYPE, FASTER_WHISPER_CPU_THREADS
+from services.audio_extraction import SAMPLE_RATE
+
+logger = logging.getLogger(__name__)
+
+# Whisper decodes 30 second windows, with 0.02 s per timestamp token
+WINDOW_SAMPLES = 30 * SAMPLE_RATE
+TIME_PRECISION = 0.02
+
+
+class TranscriptionBackend(ABC):
+    """
+    Loads speech recognition models for the shared model registry.
+
+    A loaded model exposes transcribe(audio, **options) with the arguments
+    and return value of openai-whisper's model.transcribe: audio is a path
+    or a 16 kHz mono float32 array, and the result is a dict with 'text',
+    'language' and 'segments', each segment carrying 'id', 'start', 'end',
+    'text' and, with word_timestamps, 'words'.
+    """
+
+    name = None
+
+    @abstractmethod
+    def load(self, model_size, device):
+        """Load a model on a torch-style device string ("cpu", "cuda", "cuda:1")."""
+        pass
+
+    @abstractmethod
+    def memory_bytes(self, model):
+        """Estimated resident size of a loaded model."""
+        pass
+
+    def iter_segments(self, model, audio, **options):
+        """
+        Transcribe audio, handing segments out one at a time.
+
+        Backends that decode incrementally yield each segment as soon as it is
+        decoded; the default transcribes the whole audio first.
+
+        Returns:
+            tuple: (language, iterator of segment dicts)
+        """
+        result = model.transcribe(audio, **options)
+        return result.get("language"), iter(result["segments"])
+
+    def transcribe_batch(self, model, audios, batch_size=8, **options):
+        """
+        Transcribe several clips with one loaded model.
+
+        Args:
+            model: A model returned by load()
+            audios (list): 16 kHz mono float32 arrays
+            batch_size (int): Clips to decode together, for backends that can
+            **options: Keyword arguments for model.transcribe
+
+        Returns:
+            list: A result, or the exception raised for that clip, per clip in order
+        """
+        results = []
+        for audio in audios:
+            try:
+                results.append(model.transcribe(audio, **options))
+            except Exception as e:
+                results.append(e)
+        return results
+
+
+class WhisperBackend(TranscriptionBackend):
+    """openai-whisper on PyTorch, in fp32 on CPU and fp16 on CUDA."""
+
+    name = "whisper"
+
+    def load(self, model_size, device):
+        import whisper
+        return whisper.load_model(model_size, device=device)
+
+    def memory_bytes(self, model):
+        total = 0
+        for tensor in list(model.parameters()) + list(model.buffers()):
+            total += tensor.numel() * tensor.element_size()
+        return total
+
+    def transcribe_batch(self, model, audios, batch_size=8, **options):
+        """
+        Decode clips that fit in a single 30 second window together as one
+        batch of mel spectrograms, instead of one model pass per clip.
+
+        Clips that are longer, requests for word timestamps and batch results
+        that transcribe() would have retried at a higher temperature go
+        through model.transcribe one at a time.
+        """
+        results = [None] * len(audios)
+        batchable = [] if options.get("word_timestamps") else [i for i, audio in enumerate(audios) if len(audio) <= WINDOW_SAMPLES]
+
+        for start in range(0, len(batchable), max(1, batch_size)):
+            indices = batchable[start:start + batch_size]
+            try:
+                decoded = self._decode_windows(model, [audios[i] for i in indices], options)
+            except Exception as e:
+                logger.warning(f"Batched decoding of {len(indices)} clip(s) failed, transcribing them one at a time: {e}")
+                continue
+            for i, result in zip(indices, decoded):
+                results[i] = result
+
+        for i, audio in enumerate(audios):
+            if results[i] is None:
+                try:
+                    results[i] = model.transcribe(audio, **options)
+                except Exception as e:
+                    results[i] = e
+        return results
+
+    def _decode_windows(self, model, audios, options):
+        """Greedy-decode single-window clips in one batch; None for a clip that needs temperature fallback."""
+        import torch
+        import whisper
+        from whisper.tokenizer import get_tokenizer
+
+        task = options.get("task", "transcribe")
+        mel = torch.stack([
+            whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), model.dims.n_mels) for audio in audios
+        ]).to(model.device)
+        decoded = whisper.decode(model, mel, whisper.DecodingOptions(
+            task=task,
+            language=options.get("language"),
+            temperature=0.0,
+            prompt=options.get("initial_prompt"),
+            without_timestamps=False,
+            fp16=model.device.type == "cuda" and options.get("fp16", True)
+        ))
+        tokenizer = get_tokenizer(model.is_multilingual, num_languages=model.num_languages, task=task)
+
+        # Same thresholds and precedence as model.transcribe
+        compression_ratio_threshold = options.get("compression_ratio_threshold", 2.4)
+        logprob_threshold = options.get("logprob_threshold", -1.0)
+        no_speech_threshold = options.get("no_speech_threshold", 0.6)
+
+        results = []
+        for audio, result in zip(audios, decoded):
+            if result.no_speech_prob > no_speech_threshold and result.avg_logprob < logprob_threshold:
+                results.append({"text": "", "segments": [], "language": result.language})
+            elif result.compression_ratio > compression_ratio_threshold or result.avg_logprob < logprob_threshold:
+                results.append(None)
+            else:
+                segments = self._segments_from_tokens(result, tokenizer, len(audio) / SAMPLE_RATE)
+                results.append({
+                    "text": "".join(segment["text"] for segment in segments),
+                    "segments": segments,
+                    "language": result.language
+                })
+        return results
+
+    @staticmethod
+    def _segments_from_tokens(result, tokenizer, duration):
+        """Split a decoded window into segments at its timestamp tokens, as model.transcribe does."""
+        segments = []
+        start = None
+        text_tokens = []
+
+        def add_segment(end):
+            segments.append({
+                "id": len(segments),
+                "seek": 0,
+                "start": round(start or 0.0, 3),
+                "end": round(min(end, duration), 3),
+                "text": tokenizer.decode(text_tokens),
+                "tokens": list(text_tokens),
+                "temperature": result.temperature,
+                "avg_logprob": result.avg_logprob,
+                "compression_ratio": result.compression_ratio,
+                "no_speech_prob": result.no_speech_prob
+            })
+
+        # Tokens look like <|0.00|> text <|2.40|><|2.40|> more text <|5.00|>
+        for token in result.tokens:
+            if token < tokenizer.timestamp_begin:
+                text_tokens.append(token)
+                continue
+            time = (token - tokenizer.timestamp_begin) * TIME_PRECISION
+            if start is None or not text_tokens:
+                start = time
+            else:
+                add_segment(time)
+                # Text without an opening timestamp continues from here
+                start = time
+                text_tokens = []
+
+        if text_tokens:
+            # No closing timestamp: the text runs to the end of the clip
+            add_segment(duration)
+        return segments
+
+
+class FasterWhisperModel:
+    """Gives a faster-whisper model the transcribe() interface of an openai-whisper model."""
+
+    # Only used by openai-whisper for console output and precision selection
+    _IGNORED_OPTIONS = ("verbose", "fp16")
+
+    def __init__(self, model, model_path):
+        self.model = model
+        self.model_path = model_path
+
+    def transcribe(self, audio, **options):
+        language, segments = self.iter_transcribe(audio, **options)
+        result_segments = list(segments)
+        return {
+            "text": "".join(segment["text"] for segment in result_segments),
+            "segments": result_segments,
+            "language": language
+        }
+
+    def iter_transcribe(self, audio, **options):
+        """Like transcribe(), but returns (language, iterator of segment dicts) decoded lazily."""
+        options = {k: v for k, v in options.items() if k not in self._IGNORED_OPTIONS}
+        # openai-whisper's transcribe() decodes greedily unless asked otherwise;
+        # faster-whisper defaults to a beam of 5, which would be slower and
+        # give different text for the same request
+        options.setdefault("beam_size", 1)
+        word_timestamps = options.get("word_timestamps", False)
+
+        # faster-whisper detects the language up front and then decodes
+        # as the segment generator is consumed
+        segments, info = self.model.transcribe(audio, **options)
+        return info.language, (self._segment_dict(segment, word_timestamps) for segment in segments)
+
+    @staticmethod
+    def _segment_dict(segment, word_timestamps):
+        result = {
+            "id": segment.id,
+            "seek": segment.seek,
+            "start": segment.start,
+            "end": segment.end,
+            "text": segment.text,
+            "tokens": list(segment.tokens),
+            "temperature": segment.temperature,
+            "avg_logprob": segment.avg_logprob,
+            "compression_ratio": segment.compression_ratio,
+            "no_speech_prob": segment.no_speech_prob
+        }
+        if word_timestamps:
+            result["words"] = [
+                {"word": word.word, "start": word.start, "end": word.end, "probability": word.probability}
+                for word in (segment.words or [])
+            ]
+        return result
+
+
+class FasterWhisperBackend(TranscriptionBackend):
+    """
+    faster-whisper on CTranslate2, int8-quantized on CPU by default.
+
+    Uses the same model names as openai-whisper ("base", "small", ...); the
+    converted weights are downloaded from the Hugging Face Hub on first use.
+    """
+
+    name = "faster-whisper"
+
+    def load(self, model_size, device):
+        try:
+            from faster_whisper import WhisperModel
+            from faster_whisper.utils import download_model
+        except ImportError:
+            raise ValueError("The faster-whisper package is required for the faster-whisper transcription backend. "
+                             "Install it with 'pip install faster-whisper'.")
+
+        device_type, _, index = device.partition(':')
+        compute_type = FASTER_WHISPER_COMPUTE_TYPE or ("float16" if device_type == "cuda" else "int8")
+        model_path = model_size if os.path.isdir(model_size) else download_model(model_size)
+        model = WhisperModel(
+            model_path,
+            device=device_type,
+            device_index=int(index) if index else 0,
+            compute_type=compute_type,
+            # 0 lets CTranslate2 use OMP_NUM_THREADS, or 4 threads without it
+            cpu_threads=FASTER_WHISPER_CPU_THREADS
+        )
+        return FasterWhisperModel(model, model_path)
+
+    def iter_segments(self, model, audio, **options):
+        return model.iter_transcribe(audio, **options)
+
+    def memory_bytes(self, model):
+        # CTranslate2 does not report its allocations; the weights file is a
+        # close upper bound (int8 weights take about half of it once loaded)
+        try:
+            return os.path.getsize(os.path.join(model.model_path, "model.bin"))
+        except OSError:
+            return 0
+
+
+# Values of TRANSCRIPTION_BACKEND and the per-request "backend" option
+TRANSCRIPTION_BACKENDS = {
+    WhisperBackend.name: WhisperBackend(),
+    FasterWhisperBackend.name: FasterWhisperBackend()
+}
+
+
+def get_backend(name=None):
+    """Look up a backend by name, defaulting to TRANSCRIPTION_BACKEND."""
+    name = name or TRANSCRIPTION_BACKEND
+    if name not in TRANSCRIPTION_BACKENDS:
+        raise ValueError(f"Unknown transcription backend '{name}', expected one of: {', '.join(TRANSCRIPTION_BACKENDS)}")
+    return TRANSCRIPTION_BACKENDS[name]
@@ -0,0 +1,176 @@
+# Copyright (c) 2025 Stephen G. Pope
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+
+import os
+import json
+import uuid
+import hashlib
+import logging
+from config import TRANSCRIPTION_CACHE_DIR, TRANSCRIPTION_CACHE_MAX_MB
+from services.whisper_models import whisper_model
+from services.transcription_backends import get_backend
+from services.long_form_transcription import should_use_long_form, transcribe_long_form
+from services.audio_extraction import extract_audio, pcm_duration, read_pcm
+
+logger = logging.getLogger(__name__)
+
+# Options that change how Whisper prints progress but not what it returns
+_IGNORED_OPTIONS = ("verbose",)
+
+
+def is_enabled():
+    return TRANSCRIPTION_CACHE_MAX_MB > 0
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _cache_key(audio_hash, backend, model_size, options):
+    key_options = {k: v for k, v in options.items() if k not in _IGNORED_OPTIONS}
+    # Spell out Whisper's defaults so omitting an option and passing its default share an entry
+    key_options.setdefault("task", "transcribe")
+    key_options.setdefault("word_timestamps", False)
+    key_options.setdefault("language", None)
+    key = json.dumps({"audio": audio_hash, "backend": backend, "model": model_size, "options": key_options}, sort_keys=True)
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def _load(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            result = json.load(f)
+    except (OSError, ValueError):
+        return None
+    # Touch the entry so eviction treats it as recently used
+    os.utime(path)
+    return result
+
+
+def _save(path, result):
+    tmp_path = f"{path}.{uuid.uuid4()}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(result, f)
+        os.replace(tmp_path, path)
+    except (OSError, TypeError, ValueError) as e:
+        logger.warning(f"Could not cache transcription result: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return
+    try:
+        _evict(keep=path)
+    except OSError as e:
+        logger.warning(f"Transcription cache eviction failed: {e}")
+
+
+def _evict(keep=None):
+    """Remove least recently used results until the cache fits in TRANSCRIPTION_CACHE_MAX_MB."""
+    budget = TRANSCRIPTION_CACHE_MAX_MB * 1024 * 1024
+    entries = []
+    total = 0
+    with os.scandir(TRANSCRIPTION_CACHE_DIR) as scan:
+        for entry in scan:
+            if not entry.name.endswith('.json'):
+                continue
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+
+    for _, size, path in sorted(entries):
+        if total <= budget:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+            total -= size
+            logger.info(f"Evicted cached transcription {os.path.basename(path)} ({size} bytes)")
+        except OSError:
+            pass
+
+
+def _run(audio_path, model_size, backend, options, on_progress=None):
+    if should_use_long_form(pcm_duration(audio_path)):
+        return transcribe_long_form(audio_path, model_size, backend=backend, on_progress=on_progress, **options)
+    audio = read_pcm(audio_path)
+    with whisper_model(model_size, backend=backend) as model:
+        return model.transcribe(audio, **options)
+
+
+def transcribe(media_path, model_size="base", use_cache=True, backend=None, on_progress=None, **options):
+    """
+    Run Whisper on a media file or URL, reusing an earlier result for the same audio and options.
+
+    The audio is first extracted once to 16 kHz mono PCM (see
+    audio_extraction.extract_audio), which is what the model is given. Results
+    are keyed by the SHA-256 of that audio, the backend, the model size and the
+    transcription options (task, language, word_timestamps, ...), so the same
+    audio fetched from different URLs, in a different container, or by
+    different endpoints is only transcribed once. Audio longer than
+    TRANSCRIBE_LONG_FORM_MIN_SECONDS is transcribed in parallel chunks when
+    TRANSCRIBE_PARALLEL_WORKERS is set.
+
+    Args:
+        media_path (str): Local path of the media file, or a URL from prepare_media_input
+        model_size (str): Whisper model name
+        use_cache (bool): Set to False to always run Whisper and leave the cache untouched
+        backend (str): Transcription backend name; defaults to TRANSCRIPTION_BACKEND
+        on_progress (callable, optional): Called with (last_timestamp, duration) as
+            long-form chunks finish
+        **options: Keyword arguments for model.transcribe
+
+    Returns:
+        dict: Whisper result with 'text', 'segments' and 'language'
+    """
+    backend = get_backend(backend).name
+    audio_path = extract_audio(media_path)
+    try:
+        if not use_cache or not is_enabled():
+            return _run(audio_path, model_size, backend, options, on_progress)
+
+        key = get_cache_key(audio_path, model_size, backend, options)
+        result = load_cached(key)
+        if result is not None:
+            logger.info(f"Transcription cache hit for {media_path}")
+            return result
+
+        result = _run(audio_path, model_size, backend, options, on_progress)
+        save_cached(key, result)
+        return result
+    finally:
+        os.remove(audio_path)
+
+
+def get_cache_key(audio_path, model_size, backend, options):
+    """Key of the cached result for extracted audio; for callers that run the model themselves, e.g. in batches."""
+    return _cache_key(_file_sha256(audio_path), get_backend(backend).name, model_size, options)
+
+
+def load_cached(key):
+    """The cached result for a key from get_cache_key, or None."""
+    return _load(os.path.join(TRANSCRIPTION_CACHE_DIR, f"{key}.json"))
+
+
+def save_cached(key, result):
+    os.makedirs(TRANSCRIPTION_CACHE_DIR, exist_ok=True)
+    _save(os.path.join(TRANSCRIPTION_CACHE_DIR, f"{key}.json"), result)
@@ -18,7 +18,7 @@
 
 import os
 import ffmpeg
-from services.file_management import download_file
+from services.file_management import download_files
 from config import LOCAL_STORAGE_PATH
 
 def process_audio_concatenate(media_urls, job_id, webhook_url=None):
@@ -28,11 +28,8 @@ def process_audio_concatenate(media_urls, job_id, webhook_url=None):
     output_path = os.path.join(LOCAL_STORAGE_PATH, output_filename)
 
     try:
-        # Download all media files
-        for i, media_item in enumerate(media_urls):
-            url = media_item['audio_url']
-            input_filename = download_file(url, os.path.join(LOCAL_STORAGE_PATH, f"{job_id}_input_{i}"))
-            input_files.append(input_filename)
+        # Download all media files concurrently
+        input_files = download_files([media_item['audio_url'] for media_item in media_urls], LOCAL_STORAGE_PATH)
 
         # Generate an absolute path concat list file for FFmpeg
         concat_file_path = os.path.join(LOCAL_STORAGE_PATH, f"{job_id}_concat_list.txt")
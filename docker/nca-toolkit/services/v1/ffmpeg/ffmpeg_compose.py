@@ -20,7 +20,9 @@ import os
 import subprocess
 import json
 import re
-from services.file_management import download_file
+from urllib.parse import urlparse
+from services.file_management import download_files, should_stream_input, stream_input_args
+from services.ffmpeg_stream import can_stream_output, stream_output_args, run_ffmpeg_to_storage
 from config import LOCAL_STORAGE_PATH
 
 def get_extension_from_format(format_name):
@@ -94,7 +96,54 @@ def get_metadata(filename, metadata_requests, job_id):
 
     return metadata
 
-def process_ffmpeg_compose(data, job_id):
+# Input options that make FFmpeg re-read an input from the start, which needs a local file
+# (-loop makes the image2 demuxer reopen the image for every output frame)
+RANDOM_ACCESS_INPUT_OPTIONS = {"-stream_loop", "-loop"}
+
+# Still images are read by the image2 demuxer, which opens the file anew each
+# time it reads it; over HTTP that is a request per read, so they are downloaded
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".gif", ".tif", ".tiff", ".webp"}
+
+def is_image_input(input_data):
+    options = input_data.get("options", [])
+    if any(option["option"] == "-f" and option.get("argument") == "image2" for option in options):
+        return True
+    return os.path.splitext(urlparse(input_data["file_url"]).path)[1].lower() in IMAGE_EXTENSIONS
+
+def needs_random_access(input_data):
+    if is_image_input(input_data):
+        return True
+    return any(option["option"] in RANDOM_ACCESS_INPUT_OPTIONS for option in input_data.get("options", []))
+
+def get_output_format(output):
+    for option in output["options"]:
+        if option["option"] == "-f":
+            return option.get("argument")
+    return None
+
+def can_stream_compose_output(data):
+    """
+    Whether the request's output can be piped straight to cloud storage.
+
+    Requires a single output with a streamable -f format, no metadata
+    (which is read from the local file) and no user -movflags, which could
+    ask for seeking such as +faststart.
+    """
+    if len(data["outputs"]) != 1 or data.get("metadata"):
+        return False
+    output = data["outputs"][0]
+    if any(option["option"] == "-movflags" for option in output["options"]):
+        return False
+    return can_stream_output(get_output_format(output))
+
+def process_ffmpeg_compose(data, job_id, stream_to_storage=False):
+    """
+    Run the composed FFmpeg command.
+
+    Returns (output paths, metadata). With stream_to_storage (see
+    can_stream_compose_output) the single output is piped to cloud storage
+    and its URL is returned in place of the path.
+    """
     output_filenames = []
     
     # Build FFmpeg command
@@ -106,43 +155,54 @@ def process_ffmpeg_compose(data, job_id):
         if "argument" in option and option["argument"] is not None:
             command.append(str(option["argument"]))
     
+    # Inputs FFmpeg can read sequentially over HTTP are passed as URLs, so decoding starts
+    # on the first bytes; the others (per input_mode, MEDIA_INPUT_MODE and the options)
+    # and any subtitle files referenced by the filters are downloaded concurrently
+    # Regex: subtitles='<url>' or subtitles="<url>"
+    subtitles_pattern = r"subtitles=['\"]([^'\"]+)"
+    subtitles_urls = [
+        match.group(1)
+        for filter_obj in data.get("filters") or []
+        for match in re.finditer(subtitles_pattern, filter_obj["filter"])
+    ]
+    input_urls = [input_data["file_url"] for input_data in data["inputs"]]
+    streamed = [
+        should_stream_input(input_data["file_url"], input_data.get("input_mode"), needs_random_access(input_data))
+        for input_data in data["inputs"]
+    ]
+    downloaded = iter(download_files([url for url, stream in zip(input_urls, streamed) if not stream] + subtitles_urls, LOCAL_STORAGE_PATH))
+    input_sources = [url if stream else next(downloaded) for url, stream in zip(input_urls, streamed)]
+    input_paths = [source for source, stream in zip(input_sources, streamed) if not stream]
+    subtitles_paths = list(downloaded)  # Track downloaded subtitles/filter files
+    
     # Add inputs
-    input_paths = []
-    for input_data in data["inputs"]:
+    for input_data, input_source in zip(data["inputs"], input_sources):
         if "options" in input_data:
             for option in input_data["options"]:
                 command.append(option["option"])
                 if "argument" in option and option["argument"] is not None:
                     command.append(str(option["argument"]))
-        input_path = download_file(input_data["file_url"], LOCAL_STORAGE_PATH)
-        input_paths.append(input_path)
-        command.extend(["-i", input_path])
+        command.extend(stream_input_args(input_source))
+        command.extend(["-i", input_source])
     
     # Add filters
-    subtitles_paths = []  # Track downloaded subtitles/filter files
     if data.get("filters"):
         new_filters = []
+        remaining_subtitles = iter(subtitles_paths)
         for filter_obj in data["filters"]:
             filter_str = filter_obj["filter"]
             def replace_subtitles_url(match):
-                url = match.group(1)
-                local_path = download_file(url, LOCAL_STORAGE_PATH)
-                subtitles_paths.append(local_path)
+                local_path = next(remaining_subtitles)
                 fixed_path = local_path.replace('\\', '/')
                 return f"subtitles='{fixed_path}"  # keep the opening quote
-            # Regex: subtitles='<url>' or subtitles="<url>"
-            filter_str = re.sub(r"subtitles=['\"]([^'\"]+)", replace_subtitles_url, filter_str)
+            filter_str = re.sub(subtitles_pattern, replace_subtitles_url, filter_str)
             new_filters.append(filter_str)
         filter_complex = ";".join(new_filters)
         command.extend(["-filter_complex", filter_complex])
     
     # Add outputs
     for i, output in enumerate(data["outputs"]):
-        format_name = None
-        for option in output["options"]:
-            if option["option"] == "-f":
-                format_name = option.get("argument")
-                break
+        format_name = get_output_format(output)
         
         extension = get_extension_from_format(format_name) if format_name else 'mp4'
         output_filename = os.path.join(LOCAL_STORAGE_PATH, f"{job_id}_output_{i}.{extension}")
@@ -152,11 +212,17 @@ def process_ffmpeg_compose(data, job_id):
             command.append(option["option"])
             if "argument" in option and option["argument"] is not None:
                 command.append(str(option["argument"]))
-        command.append(output_filename)
+        if stream_to_storage:
+            command.extend(stream_output_args(format_name) + ["pipe:1"])
+        else:
+            command.append(output_filename)
     
     # Execute FFmpeg command
     try:
-        subprocess.run(command, check=True, capture_output=True, text=True)
+        if stream_to_storage:
+            output_filenames = [run_ffmpeg_to_storage(command, os.path.basename(output_filenames[0]))]
+        else:
+            subprocess.run(command, check=True, capture_output=True, text=True)
     except subprocess.CalledProcessError as e:
         raise Exception(f"FFmpeg command failed: {e.stderr}")
     
@@ -18,14 +18,15 @@ import os
 import ffmpeg
 import subprocess
 import logging
-from services.file_management import download_file
+from services.file_management import prepare_media_input, stream_input_options
+from services.ffmpeg_stream import stream_output_options, run_ffmpeg_to_storage
 from config import LOCAL_STORAGE_PATH
 
 # Set up logging
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
-def process_media_convert(media_url, job_id, output_format='mp4', video_codec='libx264', video_preset='medium', video_crf=23, audio_codec='aac', audio_bitrate='128k', webhook_url=None):
+def process_media_convert(media_url, job_id, output_format='mp4', video_codec='libx264', video_preset='medium', video_crf=23, audio_codec='aac', audio_bitrate='128k', webhook_url=None, stream_to_storage=False):
     """
     Convert media to specified format with customizable encoding settings.
     
@@ -39,17 +40,20 @@ def process_media_convert(media_url, job_id, output_format='mp4', video_codec='l
         audio_codec (str): Audio codec to use (default: 'aac')
         audio_bitrate (str): Audio bitrate (default: '128k')
         webhook_url (str, optional): URL to send completion webhook
+        stream_to_storage (bool): Pipe the output straight to cloud storage; only for
+            formats accepted by ffmpeg_stream.can_stream_output
         
     Returns:
-        str: Path to the converted output file
+        str: Path to the converted output file, or its cloud URL when stream_to_storage is set
     """
-    input_filename = download_file(media_url, os.path.join(LOCAL_STORAGE_PATH, f"{job_id}_input"))
+    # Conversion reads the input sequentially, so stream it from the URL when possible
+    input_filename, is_local = prepare_media_input(media_url, os.path.join(LOCAL_STORAGE_PATH, f"{job_id}_input"))
     output_filename = f"{job_id}.{output_format}"
     output_path = os.path.join(LOCAL_STORAGE_PATH, output_filename)
 
     try:
         # Set up the ffmpeg conversion
-        stream = ffmpeg.input(input_filename)
+        stream = ffmpeg.input(input_filename, **stream_input_options(input_filename))
         output_options = {}
         
         # Add format if specified
@@ -94,6 +98,15 @@ def process_media_convert(media_url, job_id, output_format='mp4', video_codec='l
             if audio_codec != 'copy':
                 output_options['b:a'] = audio_bitrate
         
+        if stream_to_storage:
+            output_options.update(stream_output_options(output_format))
+            stream = ffmpeg.output(stream, 'pipe:1', **output_options)
+            cloud_url = run_ffmpeg_to_storage(ffmpeg.compile(stream), output_filename)
+            if is_local:
+                os.remove(input_filename)
+            logger.info(f"Media conversion streamed to cloud storage: {cloud_url}")
+            return cloud_url
+
         # Configure output
         stream = ffmpeg.output(stream, output_path, **output_options)
         
@@ -105,7 +118,8 @@ def process_media_convert(media_url, job_id, output_format='mp4', video_codec='l
         ffmpeg.run(stream, overwrite_output=True, capture_stdout=True, capture_stderr=True)
         
         # Clean up input file
-        os.remove(input_filename)
+        if is_local:
+            os.remove(input_filename)
         logger.info(f"Media conversion successful: {output_path} to format {output_format}")
 
         # Ensure the output file exists locally before attempting upload
@@ -127,7 +141,7 @@ def process_media_convert(media_url, job_id, output_format='mp4', video_codec='l
             raise Exception(f"{error_msg} - {detailed_error}")
         
         # Clean up input file if it exists
-        if 'input_filename' in locals() and os.path.exists(input_filename):
+        if is_local and os.path.exists(input_filename):
             try:
                 os.remove(input_filename)
                 logger.info(f"Cleaned up input file: {input_filename}")
@@ -17,11 +17,11 @@
 
 
 import os
-import whisper
 import srt
 from datetime import timedelta
-from whisper.utils import WriteSRT, WriteVTT
-from services.file_management import download_file
+from services.file_management import prepare_media_input
+from services.transcription_cache import transcribe
+from services.job_store import update_job_progress
 import logging
 from config import LOCAL_STORAGE_PATH
 
@@ -29,18 +29,16 @@ from config import LOCAL_STORAGE_PATH
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
-def process_transcribe_media(media_url, task, include_text, include_srt, include_segments, word_timestamps, response_type, language, job_id, words_per_line=None):
+def process_transcribe_media(media_url, task, include_text, include_srt, include_segments, word_timestamps, response_type, language, job_id, words_per_line=None, use_cache=True, backend=None):
     """Transcribe or translate media and return the transcript/translation, SRT or VTT file path."""
     logger.info(f"Starting {task} for media URL: {media_url}")
-    input_filename = download_file(media_url, os.path.join(LOCAL_STORAGE_PATH, f"{job_id}_input"))
-    logger.info(f"Downloaded media to local file: {input_filename}")
+    # Only the audio is needed, so let FFmpeg read it straight from the URL when it can
+    media_input, is_downloaded = prepare_media_input(media_url, os.path.join(LOCAL_STORAGE_PATH, f"{job_id}_input"))
 
     try:
         # Load a larger model for better translation quality
         #model_size = "large" if task == "translate" else "base"
         model_size = "base"
-        model = whisper.load_model(model_size)
-        logger.info(f"Loaded Whisper {model_size} model")
 
         # Configure transcription/translation options
         options = {
@@ -53,7 +51,11 @@ def process_transcribe_media(media_url, task, include_text, include_srt, include
         if language:
             options["language"] = language
 
-        result = model.transcribe(input_filename, **options)
+        result = transcribe(
+            media_input, model_size, use_cache=use_cache, backend=backend,
+            on_progress=lambda last_timestamp, duration: update_job_progress(job_id, last_timestamp, duration),
+            **options
+        )
         
         # For translation task, the result['text'] will be in English
         text = None
@@ -121,8 +123,9 @@ def process_transcribe_media(media_url, task, include_text, include_srt, include
         if include_segments is True:
             segments_json = result['segments']
 
-        os.remove(input_filename)
-        logger.info(f"Removed local file: {input_filename}")
+        if is_downloaded:
+            os.remove(media_input)
+            logger.info(f"Removed local file: {media_input}")
         logger.info(f"{task.capitalize()} successful, output type: {response_type}")
 
         if response_type == "direct":
@@ -134,7 +137,7 @@ def process_transcribe_media(media_url, task, include_text, include_srt, include
                 with open(text_filename, 'w') as f:
                     f.write(text)
             else:
-                text_file = None
+                text_filename = None
             
             if include_srt is True:
                 srt_filename = os.path.join(LOCAL_STORAGE_PATH, f"{job_id}.srt")
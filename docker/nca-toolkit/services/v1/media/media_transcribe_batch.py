@@ -0,0 +1,133 @@
+# Copyright (c) 2025 Stephen G. Pope
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+
+import os
+import srt
+import logging
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+from services.file_management import download_files
+from services.audio_extraction import extract_audio, read_pcm
+from services.whisper_models import whisper_model
+from services.transcription_backends import get_backend
+from services import transcription_cache
+from config import LOCAL_STORAGE_PATH, DOWNLOAD_WORKERS, TRANSCRIBE_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+MODEL_SIZE = "base"
+
+
+def _compose_srt(segments):
+    return srt.compose([
+        srt.Subtitle(index, timedelta(seconds=segment['start']), timedelta(seconds=segment['end']), segment['text'].strip())
+        for index, segment in enumerate(segments, start=1)
+    ])
+
+
+def _prepare(path, options, use_cache, backend):
+    """Decode a downloaded clip's audio and look it up in the transcription cache. Removes the download."""
+    try:
+        audio_path = extract_audio(path)
+    finally:
+        os.remove(path)
+    try:
+        key = None
+        if use_cache and transcription_cache.is_enabled():
+            key = transcription_cache.get_cache_key(audio_path, MODEL_SIZE, backend, options)
+            cached = transcription_cache.load_cached(key)
+            if cached is not None:
+                return cached, None, key
+        return None, read_pcm(audio_path), key
+    finally:
+        os.remove(audio_path)
+
+
+def process_transcribe_batch(media_items, task, include_text, include_srt, include_segments, word_timestamps, language, job_id, use_cache=True, backend=None):
+    """
+    Transcribe many short clips in one job.
+
+    The clips are downloaded concurrently and decoded to 16 kHz mono once
+    each, then transcribed with a single borrowed model, in batches where the
+    backend supports it. A clip that fails does not fail the others.
+
+    Args:
+        media_items (list): Dicts with 'media_url' and an optional 'id'
+        task (str): "transcribe" or "translate"
+        include_text, include_srt, include_segments (bool): Outputs to return per clip
+        word_timestamps (bool): Include word-level timestamps in segments
+        language (str): Source language, or None to detect it per clip
+        job_id (str): Job identifier for logging
+        use_cache (bool): Reuse and store results in the transcription cache
+        backend (str): Transcription backend name; defaults to TRANSCRIPTION_BACKEND
+
+    Returns:
+        list: One dict per item, in order, with the outputs or an 'error' message
+    """
+    options = {"task": task, "word_timestamps": word_timestamps, "verbose": False}
+    if language:
+        options["language"] = language
+
+    urls = [item['media_url'] for item in media_items]
+    logger.info(f"Job {job_id}: Transcribing a batch of {len(urls)} clip(s)")
+    outputs = download_files(urls, LOCAL_STORAGE_PATH, return_exceptions=True)
+
+    prepared = {}
+    with ThreadPoolExecutor(max_workers=max(1, DOWNLOAD_WORKERS), thread_name_prefix="decode") as executor:
+        futures = {
+            index: executor.submit(_prepare, path, options, use_cache, backend)
+            for index, path in enumerate(outputs) if not isinstance(path, Exception)
+        }
+        for index, future in futures.items():
+            try:
+                prepared[index] = future.result()
+            except Exception as e:
+                outputs[index] = e
+
+    pending = []
+    for index, (cached, audio, key) in prepared.items():
+        if cached is not None:
+            outputs[index] = cached
+        else:
+            pending.append((index, audio, key))
+    logger.info(f"Job {job_id}: {len(prepared) - len(pending)} clip(s) cached, {len(pending)} to transcribe, "
+                f"{len(urls) - len(prepared)} failed to download or decode")
+
+    if pending:
+        with whisper_model(MODEL_SIZE, backend=backend) as model:
+            results = get_backend(backend).transcribe_batch(
+                model, [audio for _, audio, _ in pending], batch_size=TRANSCRIBE_BATCH_SIZE, **options
+            )
+        for (index, _, key), result in zip(pending, results):
+            outputs[index] = result
+            if key and not isinstance(result, Exception):
+                transcription_cache.save_cached(key, result)
+
+    items = []
+    for item, output in zip(media_items, outputs):
+        entry = {"media_url": item['media_url'], "id": item.get('id')}
+        if isinstance(output, Exception):
+            logger.error(f"Job {job_id}: Failed to transcribe {item['media_url']}: {output}")
+            entry["error"] = str(output)
+        else:
+            entry["language"] = output.get('language')
+            entry["text"] = output['text'] if include_text else None
+            entry["srt"] = _compose_srt(output['segments']) if include_srt else None
+            entry["segments"] = output['segments'] if include_segments else None
+        items.append(entry)
+    return items
@@ -0,0 +1,137 @@
+# Copyright (c) 2025 Stephen G. Pope
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+
+import os
+import time
+import logging
+from config import LOCAL_STORAGE_PATH, TRANSCRIBE_STREAM_CHUNK_SECONDS, TRANSCRIBE_PROGRESS_INTERVAL
+from services.file_management import prepare_media_input
+from services.audio_extraction import extract_audio, pcm_duration, read_pcm
+from services.long_form_transcription import find_silences, plan_chunks, shift_segment
+from services.whisper_models import whisper_model
+from services.transcription_backends import get_backend
+from services.job_store import update_job_progress
+from services import transcription_cache
+
+logger = logging.getLogger(__name__)
+
+MODEL_SIZE = "base"
+
+
+class _ProgressReporter:
+    """Writes job progress to the job store at most every TRANSCRIBE_PROGRESS_INTERVAL seconds."""
+
+    def __init__(self, job_id, duration):
+        self.job_id = job_id
+        self.duration = duration
+        self._last_write = 0
+
+    def update(self, last_timestamp, segments, force=False):
+        now = time.time()
+        if force or now - self._last_write >= TRANSCRIBE_PROGRESS_INTERVAL:
+            self._last_write = now
+            update_job_progress(self.job_id, last_timestamp, self.duration, segments=segments)
+
+
+def _chunk_segments(audio_path, chunks, backend, options):
+    """Transcribe chunks one after another, yielding (segment, language, chunk) on the global timeline."""
+    language = options.get("language")
+    with whisper_model(MODEL_SIZE, backend=backend) as model:
+        for chunk in chunks:
+            audio = read_pcm(audio_path, chunk["start"], chunk["end"] - chunk["start"])
+            chunk_language, segments = get_backend(backend).iter_segments(model, audio, **options)
+            if language is None:
+                # Keep the language detected in the first chunk for the rest,
+                # as a single pass over the file would
+                language = chunk_language
+                options = dict(options, language=language)
+            for segment in segments:
+                shifted = shift_segment(segment, chunk["start"], chunk)
+                if shifted is not None:
+                    yield shifted, language, chunk
+            yield None, language, chunk
+
+
+def stream_transcribe_media(media_url, task, word_timestamps, language, job_id, use_cache=True, backend=None):
+    """
+    Transcribe media, yielding events as the transcript is produced.
+
+    The audio is extracted once and split at silences into chunks of about
+    TRANSCRIBE_STREAM_CHUNK_SECONDS that are transcribed in order. Each
+    segment is yielded as soon as its chunk (or, with the faster-whisper
+    backend, the segment itself) is decoded, and is not kept afterwards, so
+    memory does not grow with the length of the media. Progress is recorded
+    in the job store for /v1/toolkit/job/status.
+
+    Args:
+        media_url (str): URL of the media
+        task (str): "transcribe" or "translate"
+        word_timestamps (bool): Include word-level timestamps in segments
+        language (str): Source language, or None to detect it
+        job_id (str): Job whose status is updated with progress
+        use_cache (bool): Replay a cached result for the same audio if there is one
+        backend (str): Transcription backend name; defaults to TRANSCRIPTION_BACKEND
+
+    Yields:
+        tuple: (event, data) with event one of "started", "segment", "progress" and "done"
+    """
+    options = {"task": task, "word_timestamps": word_timestamps, "verbose": None}
+    if language:
+        options["language"] = language
+
+    media_input, is_downloaded = prepare_media_input(media_url, os.path.join(LOCAL_STORAGE_PATH, f"{job_id}_input"))
+    try:
+        audio_path = extract_audio(media_input)
+    finally:
+        if is_downloaded:
+            os.remove(media_input)
+
+    try:
+        duration = pcm_duration(audio_path)
+        reporter = _ProgressReporter(job_id, duration)
+        yield "started", {"job_id": job_id, "duration": round(duration, 3)}
+
+        cached = None
+        if use_cache and transcription_cache.is_enabled():
+            key = transcription_cache.get_cache_key(audio_path, MODEL_SIZE, backend, options)
+            cached = transcription_cache.load_cached(key)
+
+        count = 0
+        if cached is not None:
+            logger.info(f"Job {job_id}: Streaming cached transcription")
+            language = cached.get("language")
+            for segment in cached["segments"]:
+                count += 1
+                yield "segment", segment
+        else:
+            chunks = plan_chunks(duration, find_silences(audio_path), TRANSCRIBE_STREAM_CHUNK_SECONDS)
+            logger.info(f"Job {job_id}: Streaming transcription of {duration:.0f}s of audio in {len(chunks)} chunk(s)")
+            for segment, language, chunk in _chunk_segments(audio_path, chunks, backend, options):
+                if segment is None:
+                    # End of a chunk: everything before its end has been sent
+                    reporter.update(chunk["keep_end"], count, force=True)
+                    yield "progress", {"last_timestamp": round(chunk["keep_end"], 3), "duration": round(duration, 3), "segments": count}
+                    continue
+                segment["id"] = count
+                count += 1
+                reporter.update(segment["end"], count)
+                yield "segment", segment
+
+        yield "done", {"job_id": job_id, "language": language, "segments": count, "duration": round(duration, 3)}
+    finally:
+        os.remove(audio_path)
@@ -20,7 +20,7 @@ import os
 import subprocess
 import json
 import logging
-from services.file_management import download_file
+from services.file_management import prepare_media_input, stream_input_args, supports_range_requests
 from config import LOCAL_STORAGE_PATH
 
 # Set up logging
@@ -40,27 +40,23 @@ def get_media_metadata(media_url, job_id=None):
     """
     logger.info(f"Starting metadata extraction for {media_url}")
     
-    # Download the file
-    input_filename = download_file(media_url, os.path.join(LOCAL_STORAGE_PATH, f"{job_id}_metadata_input"))
-    logger.info(f"Downloaded media to local file: {input_filename}")
+    # Open the media; ffprobe only needs the container header, so read it
+    # straight from the URL when the server supports range requests
+    input_filename, is_local = prepare_media_input(media_url, os.path.join(LOCAL_STORAGE_PATH, f"{job_id}_metadata_input"))
+    logger.info(f"Reading media from: {input_filename}")
     
     try:
         # Initialize metadata dictionary
         metadata = {}
         
-        # Get file size
-        metadata['filesize'] = os.path.getsize(input_filename)
-        metadata['filesize_mb'] = round(metadata['filesize'] / (1024 * 1024), 2)  # Convert to MB
-        
         # Run ffprobe to get detailed metadata
         ffprobe_command = [
             'ffprobe',
             '-v', 'quiet',
             '-print_format', 'json',
             '-show_format',
-            '-show_streams',
-            input_filename
-        ]
+            '-show_streams'
+        ] + stream_input_args(input_filename) + [input_filename]
         
         logger.info(f"Running ffprobe command: {' '.join(ffprobe_command)}")
         result = subprocess.run(ffprobe_command, capture_output=True, text=True)
@@ -71,6 +67,16 @@ def get_media_metadata(media_url, job_id=None):
             
         probe_data = json.loads(result.stdout)
         
+        # Get file size, from the server when the file was not downloaded
+        if is_local:
+            metadata['filesize'] = os.path.getsize(input_filename)
+        elif probe_data.get('format', {}).get('size'):
+            metadata['filesize'] = int(probe_data['format']['size'])
+        else:
+            metadata['filesize'] = supports_range_requests(input_filename)[1]
+        if metadata['filesize'] is not None:
+            metadata['filesize_mb'] = round(metadata['filesize'] / (1024 * 1024), 2)  # Convert to MB
+        
         # Get format information
         if 'format' in probe_data:
             format_data = probe_data['format']
@@ -157,7 +163,7 @@ def get_media_metadata(media_url, job_id=None):
             metadata['has_audio'] = has_audio
         
         # Clean up the downloaded file
-        if os.path.exists(input_filename):
+        if is_local and os.path.exists(input_filename):
             os.remove(input_filename)
             logger.info(f"Removed temporary file: {input_filename}")
         
@@ -167,7 +173,7 @@ def get_media_metadata(media_url, job_id=None):
         logger.error(f"Metadata extraction failed: {str(e)}")
         
         # Clean up temporary file if it exists
-        if 'input_filename' in locals() and os.path.exists(input_filename):
+        if is_local and os.path.exists(input_filename):
             os.remove(input_filename)
             
         raise
\ No newline at end of file
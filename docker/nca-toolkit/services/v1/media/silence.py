@@ -21,13 +21,41 @@ import json
 import subprocess
 import logging
 import re
-from services.file_management import download_file
+from services.file_management import prepare_media_input, stream_input_args
 from config import LOCAL_STORAGE_PATH
 
 # Set up logging
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
+def parse_silencedetect_output(stderr):
+    """
+    Parse FFmpeg silencedetect log lines into silence intervals.
+    
+    Args:
+        stderr (str): FFmpeg stderr from a run with the silencedetect filter
+        
+    Returns:
+        list: (start, end, duration) tuples in seconds, in order
+    """
+    # Regular expressions to match the silence detection output
+    silence_start_pattern = r'silence_start: (-?\d+\.?\d*)'
+    silence_end_pattern = r'silence_end: (\d+\.?\d*) \| silence_duration: (\d+\.?\d*)'
+    
+    # Find all silence start times
+    silence_starts = re.findall(silence_start_pattern, stderr)
+    
+    # Find all silence end times and durations
+    silence_ends_durations = re.findall(silence_end_pattern, stderr)
+    
+    intervals = []
+    for i, (end, duration) in enumerate(silence_ends_durations):
+        # For the first silence period, the start time might not be detected correctly
+        # if the media starts with silence
+        start = silence_starts[i] if i < len(silence_starts) else "0.0"
+        intervals.append((max(0.0, float(start)), float(end), float(duration)))
+    return intervals
+
 def detect_silence(media_url, start_time=None, end_time=None, noise_threshold="-30dB", min_duration=0.5, mono=False, job_id=None):
     """
     Detect silence in media files using FFmpeg's silencedetect filter.
@@ -45,13 +73,14 @@ def detect_silence(media_url, start_time=None, end_time=None, noise_threshold="-
         list: List of dictionaries containing silence intervals with start, end, and duration
     """
     logger.info(f"Starting silence detection for media URL: {media_url}")
-    input_filename = download_file(media_url, os.path.join(LOCAL_STORAGE_PATH, f"{job_id}_input"))
-    logger.info(f"Downloaded media to local file: {input_filename}")
+    # silencedetect reads the input once from start to end, so it can stream from the URL
+    input_filename, is_local = prepare_media_input(media_url, os.path.join(LOCAL_STORAGE_PATH, f"{job_id}_input"))
+    logger.info(f"Reading media from: {input_filename}")
     
     try:
         # For reliable silence detection with time constraints, we need a different approach
         # We'll use FFmpeg without any time constraints and process the results later
-        cmd = ['ffmpeg', '-i', input_filename]
+        cmd = ['ffmpeg'] + stream_input_args(input_filename) + ['-i', input_filename]
         
         # We won't use audio trim filters as they're causing issues with silence detection
         # Instead, we'll filter the results after the analysis is complete
@@ -107,27 +136,7 @@ def detect_silence(media_url, start_time=None, end_time=None, noise_threshold="-
         # Parse the silence detection output
         silence_intervals = []
         
-        # Regular expressions to match the silence detection output
-        silence_start_pattern = r'silence_start: (\d+\.?\d*)'
-        silence_end_pattern = r'silence_end: (\d+\.?\d*) \| silence_duration: (\d+\.?\d*)'
-        
-        # Find all silence start times
-        silence_starts = re.findall(silence_start_pattern, result.stderr)
-        
-        # Find all silence end times and durations
-        silence_ends_durations = re.findall(silence_end_pattern, result.stderr)
-        
-        # Combine the results into a list of silence intervals
-        for i, (end, duration) in enumerate(silence_ends_durations):
-            # For the first silence period, the start time might not be detected correctly
-            # if the media starts with silence
-            start = silence_starts[i] if i < len(silence_starts) else "0.0"
-            
-            # Convert to float 
-            start_time_float = float(start) 
-            end_time_float = float(end)
-            duration_float = float(duration)
-            
+        for start_time_float, end_time_float, duration_float in parse_silencedetect_output(result.stderr):
             # Filter the results based on the specified time range
             # Only include silence periods that overlap with our requested range
             
@@ -152,15 +161,16 @@ def detect_silence(media_url, start_time=None, end_time=None, noise_threshold="-
             })
         
         # Clean up the downloaded file
-        os.remove(input_filename)
-        logger.info(f"Removed local file: {input_filename}")
+        if is_local:
+            os.remove(input_filename)
+            logger.info(f"Removed local file: {input_filename}")
         
         return silence_intervals
         
     except Exception as e:
         logger.error(f"Silence detection failed: {str(e)}")
         # Make sure to clean up even on error
-        if os.path.exists(input_filename):
+        if is_local and os.path.exists(input_filename):
             os.remove(input_filename)
         raise
 
@@ -17,9 +17,10 @@
 
 
 import os
-import boto3
+from services import s3_toolkit
+from services.s3_multipart import MultipartUpload
 import logging
-import requests
+from services import http_client
 from urllib.parse import urlparse, unquote, quote
 import uuid
 import re
@@ -27,19 +28,13 @@ import re
 logger = logging.getLogger(__name__)
 
 def get_s3_client():
-    """Create and return an S3 client using environment variables."""
+    """Return the shared S3 client for the credentials in the environment."""
     endpoint_url = os.getenv('S3_ENDPOINT_URL')
     access_key = os.getenv('S3_ACCESS_KEY')
     secret_key = os.getenv('S3_SECRET_KEY')
     region = os.environ.get('S3_REGION', '')
     
-    session = boto3.Session(
-        aws_access_key_id=access_key,
-        aws_secret_access_key=secret_key,
-        region_name=region
-    )
-    
-    return session.client('s3', endpoint_url=endpoint_url)
+    return s3_toolkit.get_s3_client(endpoint_url, access_key, secret_key, region)
 
 def get_filename_from_url(url):
     """Extract filename from URL."""
@@ -52,15 +47,20 @@ def get_filename_from_url(url):
     
     return filename
 
-def stream_upload_to_s3(file_url, custom_filename=None, make_public=False, download_headers=None):
+def stream_upload_to_s3(file_url, custom_filename=None, make_public=False, download_headers=None, job_id=None):
     """
     Stream a file from a URL directly to S3 without saving to disk.
     
+    Parts are uploaded in parallel while the download continues. If the job
+    is retried with the same job_id after its worker died, the upload resumes
+    after the parts that already reached S3.
+    
     Args:
         file_url (str): URL of the file to download
         custom_filename (str, optional): Custom filename for the uploaded file
         make_public (bool, optional): Whether to make the file publicly accessible
         download_headers (dict, optional): Headers to include in the download request for authentication
+        job_id (str, optional): Job ID used to resume an interrupted upload
     
     Returns:
         dict: Information about the uploaded file
@@ -79,75 +79,31 @@ def stream_upload_to_s3(file_url, custom_filename=None, make_public=False, downl
         else:
             filename = get_filename_from_url(file_url)
         
-        # Start a multipart upload
         logger.info(f"Starting multipart upload for {filename} to bucket {bucket_name}")
         acl = 'public-read' if make_public else 'private'
         
-        multipart_upload = s3_client.create_multipart_upload(
-            Bucket=bucket_name,
-            Key=filename,
-            ACL=acl
-        )
-        
-        upload_id = multipart_upload['UploadId']
-        
-        # Stream the file from URL
-        response = requests.get(file_url, stream=True, headers=download_headers)
-        response.raise_for_status()
-        
-        # Process in chunks using multipart upload
-        chunk_size = 5 * 1024 * 1024  # 5MB chunks (AWS minimum)
-        parts = []
-        part_number = 1
-        
-        buffer = bytearray()
-        
-        for chunk in response.iter_content(chunk_size=1024 * 1024):  # 1MB read chunks
-            buffer.extend(chunk)
-            
-            # When we have enough data for a part, upload it
-            if len(buffer) >= chunk_size:
-                logger.info(f"Uploading part {part_number}")
-                part = s3_client.upload_part(
-                    Bucket=bucket_name,
-                    Key=filename,
-                    PartNumber=part_number,
-                    UploadId=upload_id,
-                    Body=buffer
-                )
-                
-                parts.append({
-                    'PartNumber': part_number,
-                    'ETag': part['ETag']
-                })
-                
-                part_number += 1
-                buffer = bytearray()
-        
-        # Upload any remaining data as the final part
-        if buffer:
-            logger.info(f"Uploading final part {part_number}")
-            part = s3_client.upload_part(
-                Bucket=bucket_name,
-                Key=filename,
-                PartNumber=part_number,
-                UploadId=upload_id,
-                Body=buffer
-            )
-            
-            parts.append({
-                'PartNumber': part_number,
-                'ETag': part['ETag']
-            })
-        
-        # Complete the multipart upload
-        logger.info("Completing multipart upload")
-        s3_client.complete_multipart_upload(
-            Bucket=bucket_name,
-            Key=filename,
-            UploadId=upload_id,
-            MultipartUpload={'Parts': parts}
-        )
+        with MultipartUpload(s3_client, bucket_name, filename, extra_args={'ACL': acl}, session_id=job_id) as upload:
+            headers = dict(download_headers or {})
+            skip = upload.resume_offset
+            if skip:
+                headers['Range'] = f"bytes={skip}-"
+
+            # Stream the file from URL
+            response = http_client.get(file_url, stream=True, headers=headers)
+            response.raise_for_status()
+            if response.status_code == 206:
+                skip = 0
+            elif skip:
+                logger.info(f"Server ignored the range request, skipping {skip} already uploaded bytes")
+
+            for chunk in response.iter_content(chunk_size=1024 * 1024):  # 1MB read chunks
+                if skip:
+                    if len(chunk) <= skip:
+                        skip -= len(chunk)
+                        continue
+                    chunk = chunk[skip:]
+                    skip = 0
+                upload.write(chunk)
         
         # Generate the URL to the uploaded file
         if make_public:
@@ -171,4 +127,4 @@ def stream_upload_to_s3(file_url, custom_filename=None, make_public=False, downl
         
     except Exception as e:
         logger.error(f"Error streaming file to S3: {e}")
-        raise
\ No newline at end of file
+        raise
@@ -24,6 +24,7 @@ import uuid
 import tempfile
 from services.file_management import download_file
 from services.cloud_storage import upload_file
+from services.v1.video.smart_cut import probe_video_stream, probe_keyframes, resolve_cut_mode, extract_segment, concat_copy, has_audio_stream, smart_cut_output_args
 from config import LOCAL_STORAGE_PATH
 
 # Set up logging
@@ -53,8 +54,43 @@ def time_to_seconds(time_str):
     except ValueError:
         raise ValueError(f"Invalid time format: {time_str}. Expected HH:MM:SS[.mmm]")
 
+def build_cut_filter(kept_ranges, video=True, audio=True):
+    """
+    Build a filter graph that keeps the given ranges and joins them.
+
+    Each stream is split once per range, trimmed to it with its timestamps
+    reset, and the pieces are concatenated into [outv] and [outa].
+
+    Args:
+        kept_ranges (list): (start, end) tuples in seconds, in output order
+        video (bool): Whether the input has a video stream
+        audio (bool): Whether the input has an audio stream
+
+    Returns:
+        str: Value for -filter_complex
+    """
+    count = len(kept_ranges)
+    filters = []
+    if video:
+        filters.append(f"[0:v]split={count}" + ''.join(f"[vin{i}]" for i in range(count)))
+    if audio:
+        filters.append(f"[0:a]asplit={count}" + ''.join(f"[ain{i}]" for i in range(count)))
+
+    concat_inputs = ''
+    for i, (start, end) in enumerate(kept_ranges):
+        if video:
+            filters.append(f"[vin{i}]trim=start={start}:end={end},setpts=PTS-STARTPTS[v{i}]")
+            concat_inputs += f"[v{i}]"
+        if audio:
+            filters.append(f"[ain{i}]atrim=start={start}:end={end},asetpts=PTS-STARTPTS[a{i}]")
+            concat_inputs += f"[a{i}]"
+
+    outputs = ('[outv]' if video else '') + ('[outa]' if audio else '')
+    filters.append(f"{concat_inputs}concat=n={count}:v={int(video)}:a={int(audio)}{outputs}")
+    return ';'.join(filters)
+
 def cut_media(video_url, cuts, job_id=None, video_codec='libx264', video_preset='medium', 
-           video_crf=23, audio_codec='aac', audio_bitrate='128k'):
+           video_crf=23, audio_codec='aac', audio_bitrate='128k', mode='encode'):
     """
     Cuts specified segments from a video file with customizable encoding settings.
     
@@ -67,6 +103,7 @@ def cut_media(video_url, cuts, job_id=None, video_codec='libx264', video_preset=
         video_crf (int, optional): Constant Rate Factor for quality (0-51, default: 23)
         audio_codec (str, optional): Audio codec to use for encoding (default: 'aac')
         audio_bitrate (str, optional): Audio bitrate (default: '128k')
+        mode (str, optional): 'encode', 'copy' or 'smart', see smart_cut.CUT_MODES (default: 'encode')
         
     Returns:
         str: Path to the processed local file
@@ -138,7 +175,21 @@ def cut_media(video_url, cuts, job_id=None, video_codec='libx264', video_preset=
             merged_cuts.append((current_start, current_end))
         
         logger.info(f"Processing cuts: {merged_cuts}")
+
+        if merged_cuts and mode != "encode":
+            video_stream = probe_video_stream(input_filename)
+            mode = resolve_cut_mode(mode, video_stream)
         
+        # Ranges of the source to keep, between and around the cuts
+        kept_ranges = []
+        last_end = 0
+        for start, end in merged_cuts:
+            if start > last_end:
+                kept_ranges.append((last_end, start))
+            last_end = end
+        if last_end < file_duration:
+            kept_ranges.append((last_end, file_duration))
+
         if not merged_cuts:
             logger.info("No valid cuts to apply, copying the original file")
             cmd = [
@@ -148,112 +199,57 @@ def cut_media(video_url, cuts, job_id=None, video_codec='libx264', video_preset=
                 output_filename
             ]
             subprocess.run(cmd, check=True, capture_output=True, text=True)
-        else:
-            # Switch to a different approach: extract segments and concatenate
-            segment_files = []
-            
-            # Create segments to keep
-            last_end = 0
-            for i, (start, end) in enumerate(merged_cuts):
-                # If there's a gap between last segment end and current segment start, extract it
-                if start > last_end:
+        elif mode != "encode":
+            # Copy or smart cut each kept range and join them without re-encoding
+            keyframes = probe_keyframes(input_filename) if mode == "smart" else None
+
+            if not kept_ranges:
+                raise ValueError("The cuts remove the entire file")
+
+            if len(kept_ranges) == 1:
+                start, end = kept_ranges[0]
+                extract_segment(input_filename, start, end, output_filename, mode, keyframes, video_stream,
+                                video_preset=video_preset, video_crf=video_crf)
+            else:
+                segment_files = []
+                for i, (start, end) in enumerate(kept_ranges):
                     segment_file = os.path.join(LOCAL_STORAGE_PATH, f"{job_id}_segment_{i}{ext}")
                     segment_files.append(segment_file)
                     temp_files.append(segment_file)
-                    
-                    # Extract segment from last_end to start
-                    duration = start - last_end
-                    cmd = [
-                        'ffmpeg',
-                        '-i', input_filename,
-                        '-ss', str(last_end),
-                        '-t', str(duration),
-                        '-c:v', video_codec,
-                        '-preset', video_preset,
-                        '-crf', str(video_crf),
-                        '-c:a', audio_codec,
-                        '-b:a', audio_bitrate,
-                        '-pix_fmt', 'yuv420p',
-                        '-vsync', 'cfr',
-                        '-r', '30',
-                        '-avoid_negative_ts', 'make_zero',
-                        segment_file
-                    ]
-                    logger.info(f"Extracting segment {i}: {' '.join(cmd)}")
-                    process = subprocess.run(cmd, capture_output=True, text=True)
-                    
-                    if process.returncode != 0:
-                        logger.error(f"Error during segment {i} extraction: {process.stderr}")
-                        raise Exception(f"FFmpeg error: {process.stderr}")
-                
-                last_end = end
-            
-            # Add final segment if needed
-            if last_end < file_duration:
-                segment_file = os.path.join(LOCAL_STORAGE_PATH, f"{job_id}_segment_final{ext}")
-                segment_files.append(segment_file)
-                temp_files.append(segment_file)
-                
-                cmd = [
-                    'ffmpeg',
-                    '-i', input_filename,
-                    '-ss', str(last_end),
-                    '-c:v', video_codec,
-                    '-preset', video_preset,
-                    '-crf', str(video_crf),
-                    '-c:a', audio_codec,
-                    '-b:a', audio_bitrate,
-                    '-pix_fmt', 'yuv420p',
-                    '-vsync', 'cfr',
-                    '-r', '30',
-                    '-avoid_negative_ts', 'make_zero',
-                    segment_file
-                ]
-                logger.info(f"Extracting final segment: {' '.join(cmd)}")
-                process = subprocess.run(cmd, capture_output=True, text=True)
-                
-                if process.returncode != 0:
-                    logger.error(f"Error during final segment extraction: {process.stderr}")
-                    raise Exception(f"FFmpeg error: {process.stderr}")
-            
-            # If we have segments to concatenate
-            if segment_files:
-                # Create a concat file
-                concat_file = os.path.join(LOCAL_STORAGE_PATH, f"{job_id}_concat.txt")
-                temp_files.append(concat_file)
-                
-                with open(concat_file, 'w') as f:
-                    for segment in segment_files:
-                        f.write(f"file '{segment}'\n")
-                
-                # Concatenate the segments
-                cmd = [
-                    'ffmpeg',
-                    '-f', 'concat',
-                    '-safe', '0',
-                    '-i', concat_file,
-                    '-c:v', video_codec,
-                    '-preset', video_preset,
-                    '-crf', str(video_crf),
-                    '-c:a', audio_codec,
-                    '-b:a', audio_bitrate,
-                    '-vsync', 'cfr',
-                    '-r', '30',
-                    '-pix_fmt', 'yuv420p',
-                    '-movflags', '+faststart',
-                    output_filename
-                ]
-                logger.info(f"Concatenating segments: {' '.join(cmd)}")
-                process = subprocess.run(cmd, capture_output=True, text=True)
-                
-                if process.returncode != 0:
-                    logger.error(f"Error during concatenation: {process.stderr}")
-                    raise Exception(f"FFmpeg error: {process.stderr}")
-            else:
-                # No segments to keep
-                with open(output_filename, 'wb') as f:
-                    # Create an empty file
-                    pass
+                    extract_segment(input_filename, start, end, segment_file, mode, keyframes, video_stream,
+                                    video_preset=video_preset, video_crf=video_crf)
+                extra_args = smart_cut_output_args(output_filename, video_stream) if mode == "smart" else None
+                concat_copy(segment_files, output_filename, extra_args)
+        elif kept_ranges:
+            # Trim every kept range and concatenate them in one filter graph, so the
+            # source is decoded once and encoded once. Frame rate and pixel format
+            # are left as in the source.
+            video = probe_video_stream(input_filename) is not None
+            audio = has_audio_stream(input_filename)
+            filter_complex = build_cut_filter(kept_ranges, video, audio)
+
+            cmd = [
+                'ffmpeg', '-y',
+                '-i', input_filename,
+                '-filter_complex', filter_complex
+            ]
+            if video:
+                cmd.extend(['-map', '[outv]', '-c:v', video_codec, '-preset', video_preset, '-crf', str(video_crf)])
+            if audio:
+                cmd.extend(['-map', '[outa]', '-c:a', audio_codec, '-b:a', audio_bitrate])
+            cmd.extend(['-movflags', '+faststart', output_filename])
+
+            logger.info(f"Cutting video in a single pass: {' '.join(cmd)}")
+            process = subprocess.run(cmd, capture_output=True, text=True)
+
+            if process.returncode != 0:
+                logger.error(f"Error during cut: {process.stderr}")
+                raise Exception(f"FFmpeg error: {process.stderr}")
+        else:
+            # No segments to keep
+            with open(output_filename, 'wb') as f:
+                # Create an empty file
+                pass
         
         # Clean up temporary files
         for temp_file in temp_files:
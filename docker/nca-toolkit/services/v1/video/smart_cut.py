@@ -0,0 +1,304 @@
+# Copyright (c) 2025 Stephen G. Pope
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+import os
+import bisect
+import logging
+import subprocess
+
+logger = logging.getLogger(__name__)
+
+# How cut, split and trim produce each kept range:
+#   encode  re-encode everything with the requested codec settings (frame accurate)
+#   copy    stream-copy everything; ranges snap back to the previous keyframe
+#   smart   stream-copy whole GOPs and re-encode only the partial GOPs at each boundary
+CUT_MODES = ("encode", "copy", "smart")
+
+# Source codecs smart mode can re-encode boundary GOPs for so the result
+# still concatenates with the copied GOPs
+SMART_CUT_ENCODERS = {
+    "h264": "libx264",
+    "hevc": "libx265"
+}
+
+# MP4 sample entries that allow parameter sets to change in-band. The
+# re-encoded parts have different SPS/PPS from the copied GOPs, and under
+# avc1/hvc1 players only use the first part's, stored in the sample entry.
+INBAND_PARAMETER_SET_TAGS = {
+    "h264": "avc3",
+    "hevc": "hev1"
+}
+INBAND_TAG_EXTENSIONS = (".mp4", ".m4v", ".mov")
+
+
+def _run(cmd, description):
+    logger.info(f"Running FFmpeg command for {description}: {' '.join(cmd)}")
+    process = subprocess.run(cmd, capture_output=True, text=True)
+    if process.returncode != 0:
+        logger.error(f"Error during {description}: {process.stderr}")
+        raise Exception(f"FFmpeg error during {description}: {process.stderr}")
+
+
+def probe_video_stream(input_filename):
+    """Return codec_name and pix_fmt of the first video stream, or None for audio-only input."""
+    cmd = [
+        'ffprobe',
+        '-v', 'error',
+        '-select_streams', 'v:0',
+        '-show_entries', 'stream=codec_name,pix_fmt',
+        '-of', 'default=noprint_wrappers=1',
+        input_filename
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    stream = {}
+    for line in result.stdout.splitlines():
+        key, _, value = line.partition('=')
+        if value:
+            stream[key.strip()] = value.strip()
+    return stream if 'codec_name' in stream else None
+
+
+def has_audio_stream(input_filename):
+    cmd = [
+        'ffprobe',
+        '-v', 'error',
+        '-select_streams', 'a:0',
+        '-show_entries', 'stream=index',
+        '-of', 'csv=print_section=0',
+        input_filename
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    return bool(result.stdout.strip())
+
+
+def probe_keyframes(input_filename):
+    """
+    List the keyframe timestamps of the first video stream.
+
+    Reads packet flags only, so the file is demuxed but not decoded.
+
+    Returns:
+        list: Sorted (seconds, pts_time string) tuples; the string is passed
+        back to FFmpeg unchanged so seeks land exactly on the keyframe
+    """
+    cmd = [
+        'ffprobe',
+        '-v', 'error',
+        '-select_streams', 'v:0',
+        '-show_entries', 'packet=pts_time,flags',
+        '-of', 'csv=print_section=0',
+        input_filename
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise Exception(f"FFprobe error while reading keyframes: {result.stderr}")
+
+    keyframes = []
+    for line in result.stdout.splitlines():
+        pts_time, _, flags = line.partition(',')
+        if 'K' in flags and pts_time not in ('', 'N/A'):
+            keyframes.append((float(pts_time), pts_time))
+    keyframes.sort()
+    return keyframes
+
+
+def resolve_cut_mode(mode, video_stream):
+    """Fall back to a mode the input supports: smart needs a video codec we can re-encode to."""
+    if mode != "smart":
+        return mode
+    if video_stream is None:
+        # Audio packets are all independently decodable, so copying is already exact enough
+        return "copy"
+    if video_stream['codec_name'] not in SMART_CUT_ENCODERS:
+        logger.warning(f"Smart cut is not supported for {video_stream['codec_name']} video, re-encoding instead")
+        return "encode"
+    return mode
+
+
+def smart_cut_output_args(output_filename, video_stream):
+    """Muxer arguments for a file joining re-encoded and copied parts of video_stream."""
+    tag = INBAND_PARAMETER_SET_TAGS.get(video_stream['codec_name']) if video_stream else None
+    if tag and os.path.splitext(output_filename)[1].lower() in INBAND_TAG_EXTENSIONS:
+        return ['-tag:v', tag]
+    # Matroska and MPEG-TS players already follow in-band parameter set changes
+    return []
+
+
+def copy_segment(input_filename, start, end, output_filename):
+    """Stream-copy [start, end); the start snaps back to the keyframe at or before it."""
+    cmd = [
+        'ffmpeg', '-y',
+        '-ss', str(start),
+        '-i', input_filename,
+        '-t', str(end - start),
+        '-map', '0:v:0?',
+        '-map', '0:a?',
+        '-c', 'copy',
+        '-avoid_negative_ts', 'make_zero',
+        output_filename
+    ]
+    _run(cmd, f"stream copy of {start}-{end}s")
+
+
+def smart_cut_segment(input_filename, start, end, output_filename, keyframes, video_stream,
+                      video_preset='medium', video_crf=23):
+    """
+    Extract [start, end) re-encoding only the partial GOPs at its edges.
+
+    The video is built from up to three parts: frames from start to the first
+    keyframe inside the range (re-encoded), whole GOPs up to the last keyframe
+    inside the range (stream-copied) and the frames after it (re-encoded).
+    The parts are joined with the concat demuxer and the audio is
+    stream-copied from the source for the whole range. MP4 and MOV outputs
+    are tagged avc3/hev1 so players pick up each part's parameter sets.
+
+    Args:
+        input_filename (str): Local source file
+        start (float): Start of the range in seconds
+        end (float): End of the range in seconds
+        output_filename (str): Destination file
+        keyframes (list): Output of probe_keyframes()
+        video_stream (dict): Output of probe_video_stream()
+        video_preset (str): Encoder preset for the re-encoded parts
+        video_crf (int): Constant Rate Factor for the re-encoded parts
+    """
+    times = [seconds for seconds, _ in keyframes]
+    first = bisect.bisect_left(times, start)
+    last = bisect.bisect_right(times, end) - 1
+
+    if first >= len(times) or last < 0 or first >= last:
+        # No complete GOP inside the range; re-encoding the whole range is cheapest
+        inner = None
+    else:
+        inner = (keyframes[first], keyframes[last])
+
+    encoder = SMART_CUT_ENCODERS[video_stream['codec_name']]
+    encode_args = [
+        '-c:v', encoder,
+        '-preset', video_preset,
+        '-crf', str(video_crf),
+        '-pix_fmt', video_stream.get('pix_fmt', 'yuv420p')
+    ]
+
+    base, _ = os.path.splitext(output_filename)
+    parts = []
+    temp_files = []
+
+    def encode_part(part_start, part_end, name):
+        # MPEG-TS carries parameter sets in-band, so re-encoded and copied parts concatenate cleanly
+        part_file = f"{base}_{name}.ts"
+        temp_files.append(part_file)
+        cmd = [
+            'ffmpeg', '-y',
+            '-ss', str(part_start),
+            '-i', input_filename,
+            '-t', str(part_end - part_start),
+            '-map', '0:v:0',
+            '-an'
+        ] + encode_args + [part_file]
+        _run(cmd, f"re-encode of {part_start}-{part_end}s")
+        parts.append(part_file)
+
+    try:
+        if inner is None:
+            encode_part(start, end, "whole")
+        else:
+            (head_end, head_end_str), (tail_start, tail_start_str) = inner
+            if start < head_end:
+                encode_part(start, head_end, "head")
+
+            middle_file = f"{base}_middle.ts"
+            temp_files.append(middle_file)
+            cmd = [
+                'ffmpeg', '-y',
+                '-ss', head_end_str,
+                '-i', input_filename,
+                '-t', str(tail_start - head_end),
+                '-map', '0:v:0',
+                '-c', 'copy',
+                middle_file
+            ]
+            _run(cmd, f"stream copy of {head_end}-{tail_start}s")
+            parts.append(middle_file)
+
+            if tail_start < end:
+                encode_part(tail_start, end, "tail")
+
+        concat_file = f"{base}_parts.txt"
+        temp_files.append(concat_file)
+        with open(concat_file, 'w') as f:
+            for part in parts:
+                f.write(f"file '{part}'\n")
+
+        cmd = [
+            'ffmpeg', '-y',
+            '-f', 'concat',
+            '-safe', '0',
+            '-i', concat_file,
+            '-ss', str(start),
+            '-t', str(end - start),
+            '-i', input_filename,
+            '-map', '0:v:0',
+            '-map', '1:a?',
+            '-c', 'copy',
+            '-shortest',
+            '-movflags', '+faststart'
+        ] + smart_cut_output_args(output_filename, video_stream) + [output_filename]
+        _run(cmd, f"joining smart cut of {start}-{end}s")
+        logger.info(f"Smart cut {start}-{end}s: re-encoded {len(parts) - (0 if inner is None else 1)} "
+                    f"of {len(parts)} part(s)")
+    finally:
+        for temp_file in temp_files:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+
+
+def concat_copy(segment_files, output_filename, extra_args=None):
+    """Join segments produced from the same source without re-encoding.
+
+    extra_args go before the output file, e.g. smart_cut_output_args() when
+    the segments were smart cut.
+    """
+    concat_file = f"{os.path.splitext(output_filename)[0]}_concat.txt"
+    try:
+        with open(concat_file, 'w') as f:
+            for segment in segment_files:
+                f.write(f"file '{segment}'\n")
+        cmd = [
+            'ffmpeg', '-y',
+            '-f', 'concat',
+            '-safe', '0',
+            '-i', concat_file,
+            '-map', '0',
+            '-c', 'copy',
+            '-movflags', '+faststart'
+        ] + (extra_args or []) + [output_filename]
+        _run(cmd, "concatenation of copied segments")
+    finally:
+        if os.path.exists(concat_file):
+            os.remove(concat_file)
+
+
+def extract_segment(input_filename, start, end, output_filename, mode, keyframes=None, video_stream=None,
+                    video_preset='medium', video_crf=23):
+    """Extract [start, end) with the copy or smart strategy from CUT_MODES."""
+    if mode == "copy":
+        copy_segment(input_filename, start, end, output_filename)
+    elif mode == "smart":
+        smart_cut_segment(input_filename, start, end, output_filename, keyframes, video_stream,
+                          video_preset=video_preset, video_crf=video_crf)
+    else:
+        raise ValueError(f"extract_segment does not handle mode '{mode}'")
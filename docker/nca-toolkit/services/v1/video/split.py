@@ -21,9 +21,11 @@ import json
 import subprocess
 import logging
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from services.file_management import download_file
 from services.cloud_storage import upload_file
-from config import LOCAL_STORAGE_PATH
+from services.v1.video.smart_cut import probe_video_stream, probe_keyframes, resolve_cut_mode, extract_segment, has_audio_stream
+from config import LOCAL_STORAGE_PATH, SPLIT_PARALLEL_WORKERS, SPLIT_PARALLEL_MIN_SECONDS
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -52,8 +54,89 @@ def time_to_seconds(time_str):
     except ValueError:
         raise ValueError(f"Invalid time format: {time_str}. Expected HH:MM:SS[.mmm]")
 
+def _run_ffmpeg(cmd, description):
+    logger.info(f"Running FFmpeg command for {description}: {' '.join(cmd)}")
+    process = subprocess.run(cmd, capture_output=True, text=True)
+    if process.returncode != 0:
+        logger.error(f"Error processing {description}: {process.stderr}")
+        raise Exception(f"FFmpeg error for {description}: {process.stderr}")
+
+def should_split_in_parallel(ranges):
+    """Run one FFmpeg per split when the splits do not overlap and are long enough to be worth separate decodes."""
+    if SPLIT_PARALLEL_WORKERS < 2 or len(ranges) < 2:
+        return False
+    ordered = sorted(ranges)
+    disjoint = all(previous_end <= start for (_, previous_end), (start, _) in zip(ordered, ordered[1:]))
+    long_enough = all(end - start >= SPLIT_PARALLEL_MIN_SECONDS for start, end in ranges)
+    return disjoint and long_enough
+
+def encode_splits_single_pass(input_filename, ranges, output_files, encode_args):
+    """
+    Encode every split from one decode of the input.
+
+    The input is seeked to the earliest split start, decoded once, and fanned
+    out with split/asplit into a trim/atrim chain and an encoder per output.
+    """
+    base = min(start for start, _ in ranges)
+    span = max(end for _, end in ranges) - base
+    audio = has_audio_stream(input_filename)
+    video = probe_video_stream(input_filename) is not None
+    count = len(ranges)
+
+    filters = []
+    if video:
+        filters.append(f"[0:v]split={count}" + ''.join(f"[vin{i}]" for i in range(count)))
+    if audio:
+        filters.append(f"[0:a]asplit={count}" + ''.join(f"[ain{i}]" for i in range(count)))
+    for i, (start, end) in enumerate(ranges):
+        # Timestamps restart at zero after the input seek, so trim relative to base
+        if video:
+            filters.append(f"[vin{i}]trim=start={start - base}:end={end - base},setpts=PTS-STARTPTS[v{i}]")
+        if audio:
+            filters.append(f"[ain{i}]atrim=start={start - base}:end={end - base},asetpts=PTS-STARTPTS[a{i}]")
+
+    cmd = [
+        'ffmpeg', '-y',
+        '-ss', str(base),
+        '-t', str(span),
+        '-i', input_filename,
+        '-filter_complex', ';'.join(filters)
+    ]
+    for i, output_filename in enumerate(output_files):
+        if video:
+            cmd.extend(['-map', f"[v{i}]"])
+        if audio:
+            cmd.extend(['-map', f"[a{i}]"])
+        cmd.extend(encode_args)
+        cmd.append(output_filename)
+
+    _run_ffmpeg(cmd, f"{count} split(s) in a single pass")
+    logger.info(f"Successfully created {count} split(s) in a single pass")
+
+def encode_splits_in_parallel(input_filename, ranges, output_files, encode_args):
+    """Encode disjoint splits concurrently, each FFmpeg seeking straight to its own range."""
+    workers = min(SPLIT_PARALLEL_WORKERS, len(ranges))
+    # Share the cores between the concurrent encoders instead of oversubscribing them
+    threads = max(1, (os.cpu_count() or 1) // workers)
+
+    def encode(index):
+        start, end = ranges[index]
+        cmd = [
+            'ffmpeg', '-y',
+            '-ss', str(start),
+            '-t', str(end - start),
+            '-i', input_filename,
+            '-threads', str(threads)
+        ] + encode_args + [output_files[index]]
+        _run_ffmpeg(cmd, f"split {index+1}")
+        logger.info(f"Successfully created split {index+1}: {output_files[index]}")
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # list() re-raises the first FFmpeg failure
+        list(executor.map(encode, range(len(ranges))))
+
 def split_video(video_url, splits, job_id=None, video_codec='libx264', video_preset='medium', 
-               video_crf=23, audio_codec='aac', audio_bitrate='128k'):
+               video_crf=23, audio_codec='aac', audio_bitrate='128k', mode='encode'):
     """
     Splits a video file into multiple segments with customizable encoding settings.
     
@@ -66,6 +149,7 @@ def split_video(video_url, splits, job_id=None, video_codec='libx264', video_pre
         video_crf (int, optional): Constant Rate Factor for quality (0-51, default: 23)
         audio_codec (str, optional): Audio codec to use for encoding (default: 'aac')
         audio_bitrate (str, optional): Audio bitrate (default: '128k')
+        mode (str, optional): 'encode', 'copy' or 'smart', see smart_cut.CUT_MODES (default: 'encode')
         
     Returns:
         tuple: (list of output file paths, input file path)
@@ -130,39 +214,35 @@ def split_video(video_url, splits, job_id=None, video_codec='libx264', video_pre
             raise ValueError("No valid split segments specified")
             
         logger.info(f"Processing {len(valid_splits)} valid splits")
+
+        keyframes = None
+        video_stream = None
+        if mode != "encode":
+            video_stream = probe_video_stream(input_filename)
+            mode = resolve_cut_mode(mode, video_stream)
+            if mode == "smart":
+                keyframes = probe_keyframes(input_filename)
         
-        # Process each split
-        for index, (split_index, start_seconds, end_seconds, split_data) in enumerate(valid_splits):
-            # Create output filename for this split
-            output_filename = os.path.join(LOCAL_STORAGE_PATH, f"{job_id}_split_{index+1}{ext}")
-            
-            # Create FFmpeg command to extract the segment
-            cmd = [
-                'ffmpeg',
-                '-i', input_filename,
-                '-ss', str(start_seconds),
-                '-to', str(end_seconds),
-                '-c:v', video_codec,
-                '-preset', video_preset,
-                '-crf', str(video_crf),
-                '-c:a', audio_codec,
-                '-b:a', audio_bitrate,
-                '-avoid_negative_ts', 'make_zero',
-                output_filename
-            ]
-            
-            logger.info(f"Running FFmpeg command for split {index+1}: {' '.join(cmd)}")
-            
-            # Run the FFmpeg command
-            process = subprocess.run(cmd, capture_output=True, text=True)
-            
-            if process.returncode != 0:
-                logger.error(f"Error processing split {index+1}: {process.stderr}")
-                raise Exception(f"FFmpeg error for split {index+1}: {process.stderr}")
-            
-            # Add the output file to the list
-            output_files.append(output_filename)
-            logger.info(f"Successfully created split {index+1}: {output_filename}")
+        output_files = [os.path.join(LOCAL_STORAGE_PATH, f"{job_id}_split_{index+1}{ext}")
+                        for index in range(len(valid_splits))]
+        ranges = [(start_seconds, end_seconds) for _, start_seconds, end_seconds, _ in valid_splits]
+        encode_args = [
+            '-c:v', video_codec,
+            '-preset', video_preset,
+            '-crf', str(video_crf),
+            '-c:a', audio_codec,
+            '-b:a', audio_bitrate
+        ]
+
+        if mode != "encode":
+            for index, ((start_seconds, end_seconds), output_filename) in enumerate(zip(ranges, output_files)):
+                extract_segment(input_filename, start_seconds, end_seconds, output_filename, mode, keyframes,
+                                video_stream, video_preset=video_preset, video_crf=video_crf)
+                logger.info(f"Successfully created split {index+1}: {output_filename}")
+        elif should_split_in_parallel(ranges):
+            encode_splits_in_parallel(input_filename, ranges, output_files, encode_args)
+        else:
+            encode_splits_single_pass(input_filename, ranges, output_files, encode_args)
         
         # Return the list of output files and the input filename
         return output_files, input_filename
@@ -18,7 +18,7 @@
 
 import os
 import ffmpeg
-from services.file_management import download_file
+from services.file_management import prepare_media_input, stream_input_options
 from config import LOCAL_STORAGE_PATH
 
 def extract_thumbnail(video_url, job_id, second=0):
@@ -33,8 +33,9 @@ def extract_thumbnail(video_url, job_id, second=0):
     Returns:
         str: Path to the extracted thumbnail image
     """
-    # Download the video from the provided URL
-    video_path = download_file(video_url, os.path.join(LOCAL_STORAGE_PATH, f"{job_id}_input"))
+    # Open the video; with an input-side seek FFmpeg only fetches the bytes around
+    # the requested frame, so read straight from the URL when the server allows it
+    video_path, is_local = prepare_media_input(video_url, os.path.join(LOCAL_STORAGE_PATH, f"{job_id}_input"))
     
     # Set output path for the thumbnail
     thumbnail_path = os.path.join(LOCAL_STORAGE_PATH, f"{job_id}_thumbnail.jpg")
@@ -43,14 +44,15 @@ def extract_thumbnail(video_url, job_id, second=0):
         # Extract thumbnail using ffmpeg at the specified timestamp
         (
             ffmpeg
-            .input(video_path, ss=second)  # 'ss' is the seek parameter for the timestamp
+            .input(video_path, ss=second, **stream_input_options(video_path))  # 'ss' is the seek parameter for the timestamp
             .output(thumbnail_path, vframes=1)  # vframes=1 extracts a single frame
             .overwrite_output()
             .run(capture_stdout=True, capture_stderr=True)
         )
         
         # Clean up the downloaded video file
-        os.remove(video_path)
+        if is_local:
+            os.remove(video_path)
         
         # Ensure the thumbnail file exists
         if not os.path.exists(thumbnail_path):
@@ -61,6 +63,6 @@ def extract_thumbnail(video_url, job_id, second=0):
     except Exception as e:
         print(f"Thumbnail extraction failed: {str(e)}")
         # Clean up any downloaded files on error
-        if os.path.exists(video_path):
+        if is_local and os.path.exists(video_path):
             os.remove(video_path)
         raise
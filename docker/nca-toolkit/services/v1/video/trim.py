@@ -23,6 +23,7 @@ import logging
 import uuid
 from services.file_management import download_file
 from services.cloud_storage import upload_file
+from services.v1.video.smart_cut import probe_video_stream, probe_keyframes, resolve_cut_mode, extract_segment
 from config import LOCAL_STORAGE_PATH
 
 # Set up logging
@@ -56,7 +57,7 @@ def time_to_seconds(time_str):
         raise ValueError(f"Invalid time format: {time_str}. Expected HH:MM:SS[.mmm]")
 
 def trim_video(video_url, start=None, end=None, job_id=None, video_codec='libx264', video_preset='medium', 
-               video_crf=23, audio_codec='aac', audio_bitrate='128k'):
+               video_crf=23, audio_codec='aac', audio_bitrate='128k', mode='encode'):
     """
     Trims a video by removing specified portions from the beginning and/or end with customizable encoding settings.
     
@@ -70,6 +71,7 @@ def trim_video(video_url, start=None, end=None, job_id=None, video_codec='libx26
         video_crf (int, optional): Constant Rate Factor for quality (0-51, default: 23)
         audio_codec (str, optional): Audio codec to use for encoding (default: 'aac')
         audio_bitrate (str, optional): Audio bitrate (default: '128k')
+        mode (str, optional): 'encode', 'copy' or 'smart', see smart_cut.CUT_MODES (default: 'encode')
         
     Returns:
         tuple: (output_filename, input_filename)
@@ -120,6 +122,17 @@ def trim_video(video_url, start=None, end=None, job_id=None, video_codec='libx26
             
         if start_seconds is not None and end_seconds is not None and start_seconds >= end_seconds:
             raise ValueError(f"Invalid trim: start time ({start}) must be before end time ({end})")
+
+        if mode != "encode":
+            video_stream = probe_video_stream(input_filename)
+            mode = resolve_cut_mode(mode, video_stream)
+
+        if mode != "encode":
+            keyframes = probe_keyframes(input_filename) if mode == "smart" else None
+            logger.info(f"Trimming video from {start_seconds}s to {end_seconds}s using {mode} mode")
+            extract_segment(input_filename, start_seconds, end_seconds, output_filename, mode, keyframes,
+                            video_stream, video_preset=video_preset, video_crf=video_crf)
+            return output_filename, input_filename
         
         # Prepare FFmpeg command based on trim parameters
         cmd = ['ffmpeg', '-i', input_filename]
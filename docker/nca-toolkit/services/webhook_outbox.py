@@ -0,0 +1,418 @@
+# Copyright (c) 2025 Stephen G. Pope
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from abc import ABC, abstractmethod
+from services import http_client
+from services.webhook import send_webhook
+from config import (LOCAL_STORAGE_PATH, REDIS_URL, JOB_STATUS_TTL, WEBHOOK_OUTBOX_BACKEND, WEBHOOK_WORKERS,
+                    WEBHOOK_TIMEOUT, WEBHOOK_MAX_ATTEMPTS, WEBHOOK_RETRY_BACKOFF, WEBHOOK_RETRY_MAX_DELAY)
+
+logger = logging.getLogger(__name__)
+
+# A claimed delivery is hidden from other workers for this long; if its worker
+# dies mid-delivery it becomes due again afterwards
+CLAIM_LEASE = 2 * WEBHOOK_TIMEOUT + 30
+
+# Dead letters kept for inspection
+MAX_DEAD_LETTERS = 1000
+
+
+class WebhookDelivery:
+    def __init__(self, delivery_id, url, payload, attempts, created_at):
+        self.delivery_id = delivery_id
+        self.url = url
+        self.payload = payload
+        # Attempts made so far, including the one this claim is for
+        self.attempts = attempts
+        self.created_at = created_at
+
+
+class WebhookOutbox(ABC):
+    """Persistent queue of webhook deliveries, shared by all worker processes using the same backend."""
+
+    @abstractmethod
+    def add(self, url: str, payload: dict) -> str:
+        """Queue a delivery that is due immediately and return its id."""
+        pass
+
+    @abstractmethod
+    def claim_due(self, limit: int) -> list:
+        """Lease up to limit due deliveries for CLAIM_LEASE seconds and return them as WebhookDelivery objects."""
+        pass
+
+    @abstractmethod
+    def complete(self, delivery: WebhookDelivery) -> None:
+        pass
+
+    @abstractmethod
+    def retry_at(self, delivery: WebhookDelivery, next_attempt_at: float, error: str) -> None:
+        pass
+
+    @abstractmethod
+    def dead_letter(self, delivery: WebhookDelivery, error: str) -> None:
+        pass
+
+    @abstractmethod
+    def list_dead_letters(self, limit=100) -> list:
+        """Most recent dead letters first, as dicts with delivery_id, url, payload, attempts, error and failed_at."""
+        pass
+
+    @abstractmethod
+    def counts(self) -> dict:
+        """Number of pending and dead-lettered deliveries."""
+        pass
+
+
+class SQLiteWebhookOutbox(WebhookOutbox):
+    """Outbox table in a WAL-mode SQLite database shared by all worker processes on the host."""
+
+    def __init__(self, db_path, dead_letter_ttl=0):
+        self.db_path = db_path
+        self.dead_letter_ttl = dead_letter_ttl
+        self._local = threading.local()
+        self._connection().executescript("""
+            CREATE TABLE IF NOT EXISTS webhooks (
+                delivery_id TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                last_error TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_webhooks_status_next_attempt ON webhooks (status, next_attempt_at);
+        """)
+
+    def _connection(self):
+        # sqlite3 connections must not be shared across threads, so keep one per thread
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def add(self, url, payload):
+        delivery_id = str(uuid.uuid4())
+        now = time.time()
+        self._connection().execute(
+            "INSERT INTO webhooks (delivery_id, url, payload, status, next_attempt_at, created_at, updated_at) "
+            "VALUES (?, ?, ?, 'pending', ?, ?, ?)",
+            (delivery_id, url, json.dumps(payload), now, now, now)
+        )
+        return delivery_id
+
+    def claim_due(self, limit):
+        conn = self._connection()
+        now = time.time()
+        # IMMEDIATE takes the write lock up front, so two processes never lease the same row
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                "SELECT delivery_id, url, payload, attempts, created_at FROM webhooks "
+                "WHERE status = 'pending' AND next_attempt_at <= ? ORDER BY next_attempt_at LIMIT ?",
+                (now, limit)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE webhooks SET attempts = attempts + 1, next_attempt_at = ?, updated_at = ? WHERE delivery_id = ?",
+                [(now + CLAIM_LEASE, now, row[0]) for row in rows]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return [WebhookDelivery(row[0], row[1], json.loads(row[2]), row[3] + 1, row[4]) for row in rows]
+
+    def complete(self, delivery):
+        self._connection().execute("DELETE FROM webhooks WHERE delivery_id = ?", (delivery.delivery_id,))
+
+    def retry_at(self, delivery, next_attempt_at, error):
+        self._connection().execute(
+            "UPDATE webhooks SET next_attempt_at = ?, updated_at = ?, last_error = ? WHERE delivery_id = ?",
+            (next_attempt_at, time.time(), error, delivery.delivery_id)
+        )
+
+    def dead_letter(self, delivery, error):
+        conn = self._connection()
+        now = time.time()
+        conn.execute(
+            "UPDATE webhooks SET status = 'dead', updated_at = ?, last_error = ? WHERE delivery_id = ?",
+            (now, error, delivery.delivery_id)
+        )
+        # Keep the dead-letter list bounded by age and count
+        if self.dead_letter_ttl > 0:
+            conn.execute("DELETE FROM webhooks WHERE status = 'dead' AND updated_at < ?", (now - self.dead_letter_ttl,))
+        conn.execute(
+            "DELETE FROM webhooks WHERE status = 'dead' AND delivery_id NOT IN "
+            "(SELECT delivery_id FROM webhooks WHERE status = 'dead' ORDER BY updated_at DESC LIMIT ?)",
+            (MAX_DEAD_LETTERS,)
+        )
+
+    def list_dead_letters(self, limit=100):
+        rows = self._connection().execute(
+            "SELECT delivery_id, url, payload, attempts, last_error, updated_at FROM webhooks "
+            "WHERE status = 'dead' ORDER BY updated_at DESC LIMIT ?",
+            (limit,)
+        ).fetchall()
+        return [
+            {"delivery_id": row[0], "url": row[1], "payload": json.loads(row[2]), "attempts": row[3],
+             "error": row[4], "failed_at": row[5]}
+            for row in rows
+        ]
+
+    def counts(self):
+        rows = self._connection().execute("SELECT status, COUNT(*) FROM webhooks GROUP BY status").fetchall()
+        counts = dict(rows)
+        return {"pending": counts.get('pending', 0), "dead": counts.get('dead', 0)}
+
+
+# Lease every due delivery id in one step, so two workers never claim the same one
+CLAIM_SCRIPT = """
+local ids = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[3])
+for _, id in ipairs(ids) do
+    redis.call('ZADD', KEYS[1], ARGV[2], id)
+end
+return ids
+"""
+
+
+class RedisWebhookOutbox(WebhookOutbox):
+    """
+    Outbox in Redis, shared across hosts.
+
+    Keys (all under key_prefix):
+        due             ZSET of delivery ids scored by next attempt time
+        delivery:<id>   JSON delivery record
+        dead            LIST of dead-letter records, newest first
+    """
+
+    def __init__(self, client, key_prefix="nca:webhooks"):
+        self.client = client
+        self.prefix = key_prefix
+        self._claim_script = client.register_script(CLAIM_SCRIPT)
+
+    @property
+    def _due_key(self):
+        return f"{self.prefix}:due"
+
+    @property
+    def _dead_key(self):
+        return f"{self.prefix}:dead"
+
+    def _delivery_key(self, delivery_id):
+        return f"{self.prefix}:delivery:{delivery_id}"
+
+    def add(self, url, payload):
+        delivery_id = str(uuid.uuid4())
+        now = time.time()
+        record = {"url": url, "payload": payload, "attempts": 0, "created_at": now}
+        pipe = self.client.pipeline()
+        pipe.set(self._delivery_key(delivery_id), json.dumps(record))
+        pipe.zadd(self._due_key, {delivery_id: now})
+        pipe.execute()
+        return delivery_id
+
+    def claim_due(self, limit):
+        now = time.time()
+        ids = self._claim_script(keys=[self._due_key], args=[now, now + CLAIM_LEASE, limit])
+        deliveries = []
+        for delivery_id in ids:
+            raw = self.client.get(self._delivery_key(delivery_id))
+            if raw is None:
+                self.client.zrem(self._due_key, delivery_id)
+                continue
+            record = json.loads(raw)
+            record["attempts"] += 1
+            self.client.set(self._delivery_key(delivery_id), json.dumps(record))
+            deliveries.append(WebhookDelivery(delivery_id, record["url"], record["payload"], record["attempts"], record["created_at"]))
+        return deliveries
+
+    def complete(self, delivery):
+        pipe = self.client.pipeline()
+        pipe.zrem(self._due_key, delivery.delivery_id)
+        pipe.delete(self._delivery_key(delivery.delivery_id))
+        pipe.execute()
+
+    def retry_at(self, delivery, next_attempt_at, error):
+        self.client.zadd(self._due_key, {delivery.delivery_id: next_attempt_at}, xx=True)
+
+    def dead_letter(self, delivery, error):
+        record = {"delivery_id": delivery.delivery_id, "url": delivery.url, "payload": delivery.payload,
+                  "attempts": delivery.attempts, "error": error, "failed_at": time.time()}
+        pipe = self.client.pipeline()
+        pipe.zrem(self._due_key, delivery.delivery_id)
+        pipe.delete(self._delivery_key(delivery.delivery_id))
+        pipe.lpush(self._dead_key, json.dumps(record))
+        pipe.ltrim(self._dead_key, 0, MAX_DEAD_LETTERS - 1)
+        pipe.execute()
+
+    def list_dead_letters(self, limit=100):
+        return [json.loads(raw) for raw in self.client.lrange(self._dead_key, 0, limit - 1)]
+
+    def counts(self):
+        pipe = self.client.pipeline()
+        pipe.zcard(self._due_key)
+        pipe.llen(self._dead_key)
+        pending, dead = pipe.execute()
+        return {"pending": pending, "dead": dead}
+
+
+class WebhookDispatcher:
+    """
+    Delivers queued webhooks on its own worker threads, so job workers never wait on webhook I/O.
+
+    Failed deliveries are retried with exponential backoff, surviving restarts
+    since they live in the outbox, and dead-lettered after max_attempts.
+    """
+
+    def __init__(self, outbox, workers=4, max_attempts=6, backoff=5, max_delay=600, timeout=30, poll_interval=1):
+        self.outbox = outbox
+        self.workers = max(1, workers)
+        self.max_attempts = max(1, max_attempts)
+        self.backoff = backoff
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self._wakeup = threading.Event()
+        self._stats = {"queued": 0, "delivered": 0, "failed_attempts": 0, "dead_lettered": 0, "delivery_seconds": 0.0}
+        self._stats_lock = threading.Lock()
+
+    def start(self):
+        for i in range(self.workers):
+            threading.Thread(target=self._worker, name=f"webhook-{i}", daemon=True).start()
+        logger.info(f"Started {self.workers} webhook delivery thread(s) using {type(self.outbox).__name__}")
+
+    def enqueue(self, url, payload):
+        delivery_id = self.outbox.add(url, payload)
+        self._count("queued")
+        self._wakeup.set()
+        return delivery_id
+
+    def _count(self, name, amount=1):
+        with self._stats_lock:
+            self._stats[name] += amount
+
+    def retry_delay(self, attempts):
+        return min(self.max_delay, self.backoff * (2 ** (attempts - 1)))
+
+    def _worker(self):
+        while True:
+            try:
+                deliveries = self.outbox.claim_due(1)
+            except Exception as e:
+                logger.error(f"Error claiming webhook deliveries: {str(e)}")
+                deliveries = []
+
+            if not deliveries:
+                # Woken early by enqueue() in this process; other processes' deliveries are found by polling
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+
+            for delivery in deliveries:
+                try:
+                    self._deliver(delivery)
+                except Exception as e:
+                    logger.error(f"Webhook {delivery.delivery_id}: Error updating outbox: {str(e)}")
+
+    def _deliver(self, delivery):
+        start_time = time.time()
+        try:
+            response = http_client.post(delivery.url, json=delivery.payload, timeout=self.timeout)
+            response.raise_for_status()
+        except Exception as e:
+            error = str(e)
+            self._count("failed_attempts")
+            if delivery.attempts >= self.max_attempts:
+                logger.error(f"Webhook {delivery.delivery_id} to {delivery.url} failed after {delivery.attempts} attempt(s), dead-lettering: {error}")
+                self.outbox.dead_letter(delivery, error)
+                self._count("dead_lettered")
+            else:
+                delay = self.retry_delay(delivery.attempts)
+                logger.warning(f"Webhook {delivery.delivery_id} to {delivery.url} failed (attempt {delivery.attempts} of {self.max_attempts}), retrying in {delay:.1f}s: {error}")
+                self.outbox.retry_at(delivery, time.time() + delay, error)
+            return
+
+        self.outbox.complete(delivery)
+        self._count("delivered")
+        self._count("delivery_seconds", time.time() - start_time)
+        logger.info(f"Webhook {delivery.delivery_id} delivered to {delivery.url} "
+                    f"(attempt {delivery.attempts}, {time.time() - delivery.created_at:.2f}s after it was queued)")
+
+    def get_stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["average_delivery_seconds"] = round(stats["delivery_seconds"] / stats["delivered"], 3) if stats["delivered"] else None
+        stats["delivery_seconds"] = round(stats["delivery_seconds"], 3)
+        stats["outbox"] = self.outbox.counts()
+        return stats
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def _create_outbox():
+    if WEBHOOK_OUTBOX_BACKEND == 'redis':
+        from services.redis_job_queue import get_redis_client
+        return RedisWebhookOutbox(get_redis_client(REDIS_URL))
+    if WEBHOOK_OUTBOX_BACKEND == 'sqlite':
+        os.makedirs(LOCAL_STORAGE_PATH, exist_ok=True)
+        return SQLiteWebhookOutbox(os.path.join(LOCAL_STORAGE_PATH, 'webhooks.db'), JOB_STATUS_TTL)
+    raise ValueError(f"Unknown WEBHOOK_OUTBOX_BACKEND: {WEBHOOK_OUTBOX_BACKEND}")
+
+
+def get_webhook_dispatcher() -> WebhookDispatcher:
+    """Return the process-wide dispatcher, creating and starting it on first use."""
+    global _dispatcher
+    if _dispatcher is not None:
+        return _dispatcher
+
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            dispatcher = WebhookDispatcher(
+                _create_outbox(),
+                workers=WEBHOOK_WORKERS,
+                max_attempts=WEBHOOK_MAX_ATTEMPTS,
+                backoff=WEBHOOK_RETRY_BACKOFF,
+                max_delay=WEBHOOK_RETRY_MAX_DELAY,
+                timeout=WEBHOOK_TIMEOUT
+            )
+            dispatcher.start()
+            _dispatcher = dispatcher
+    return _dispatcher
+
+
+def enqueue_webhook(webhook_url, data):
+    """Queue a webhook for background delivery and return immediately."""
+    try:
+        get_webhook_dispatcher().enqueue(webhook_url, data)
+    except Exception as e:
+        # The outbox is unavailable; deliver inline once rather than lose the result
+        logger.error(f"Failed to queue webhook for {webhook_url}, sending it directly: {str(e)}")
+        send_webhook(webhook_url, data)
@@ -0,0 +1,204 @@
+# Copyright (c) 2025 Stephen G. Pope
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+
+import time
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from config import WHISPER_DEVICE, WHISPER_MODEL_MEMORY_MB, WHISPER_PRELOAD_MODELS
+from services.transcription_backends import get_backend
+
+logger = logging.getLogger(__name__)
+
+# Process-wide registry of loaded Whisper models, keyed by (backend, model_size, device).
+# Ordered from least to most recently used so eviction can pop from the front.
+_models = OrderedDict()
+_registry_lock = threading.Lock()
+
+
+class _ModelEntry:
+    def __init__(self, backend, model_size, device):
+        self.backend = backend
+        self.model_size = model_size
+        self.device = device
+        self.model = None
+        self.memory_bytes = 0
+        self.loaded_at = None
+        self.last_used = None
+        self.uses = 0
+        self.in_use = 0
+        # Whisper installs kv-cache hooks on the model during decoding, so a
+        # single model instance must not run two transcriptions at once.
+        self.lock = threading.Lock()
+        self.ready = threading.Event()
+        self.error = None
+
+
+def _resolve_device(device=None):
+    """Pick the device to load a model on: explicit argument, WHISPER_DEVICE, then CUDA if available."""
+    if device:
+        return device
+    if WHISPER_DEVICE:
+        return WHISPER_DEVICE
+    try:
+        import torch
+        return "cuda" if torch.cuda.is_available() else "cpu"
+    except ImportError:
+        return "cpu"
+
+
+def _resident_bytes():
+    return sum(entry.memory_bytes for entry in _models.values())
+
+
+def _evict_to_budget():
+    """Drop idle models, least recently used first, until the resident set fits in the budget.
+
+    The most recently used model is never evicted, so a single model larger
+    than the budget still stays resident. Must be called with _registry_lock held.
+    """
+    budget = WHISPER_MODEL_MEMORY_MB * 1024 * 1024
+    if budget <= 0:
+        return
+
+    for key in list(_models.keys())[:-1]:
+        if _resident_bytes() <= budget:
+            break
+        entry = _models[key]
+        if entry.in_use or not entry.ready.is_set():
+            continue
+        del _models[key]
+        logger.info(f"Evicted {entry.backend.name} model {entry.model_size} on {entry.device} "
+                    f"({entry.memory_bytes / (1024 * 1024):.0f} MB) to stay within memory budget")
+
+
+def _load_entry(entry):
+    start_time = time.time()
+    try:
+        model = entry.backend.load(entry.model_size, entry.device)
+        entry.memory_bytes = entry.backend.memory_bytes(model)
+        entry.model = model
+        entry.loaded_at = time.time()
+        logger.info(f"Loaded {entry.backend.name} {entry.model_size} model on {entry.device} in "
+                    f"{entry.loaded_at - start_time:.2f}s ({entry.memory_bytes / (1024 * 1024):.0f} MB)")
+    except Exception as e:
+        entry.error = e
+        logger.error(f"Failed to load {entry.backend.name} {entry.model_size} model on {entry.device}: {e}")
+    finally:
+        entry.ready.set()
+
+
+def _get_entry(backend, model_size, device):
+    key = (backend.name, model_size, device)
+    load = False
+
+    with _registry_lock:
+        entry = _models.get(key)
+        if entry is None:
+            entry = _ModelEntry(backend, model_size, device)
+            _models[key] = entry
+            load = True
+        else:
+            _models.move_to_end(key)
+        entry.in_use += 1
+
+    if load:
+        # Load outside the registry lock so other sizes stay available meanwhile;
+        # concurrent callers for the same key wait on entry.ready instead.
+        _load_entry(entry)
+        with _registry_lock:
+            if entry.error is not None:
+                _models.pop(key, None)
+            else:
+                _evict_to_budget()
+    else:
+        entry.ready.wait()
+
+    if entry.error is not None:
+        with _registry_lock:
+            entry.in_use -= 1
+        raise entry.error
+
+    return entry
+
+
+@contextmanager
+def whisper_model(model_size="base", device=None, backend=None):
+    """
+    Borrow a shared Whisper model, loading it on first use in this process.
+
+    The model stays resident after the block exits and is reused by later
+    jobs. While borrowed it is locked for exclusive use and cannot be evicted.
+
+    Args:
+        model_size (str): Whisper model name, e.g. "base" or "small"
+        device (str): Torch device; defaults to WHISPER_DEVICE or auto-detection
+        backend (str): Transcription backend name; defaults to TRANSCRIPTION_BACKEND
+
+    Yields:
+        A model with openai-whisper's transcribe() interface
+    """
+    entry = _get_entry(get_backend(backend), model_size, _resolve_device(device))
+    try:
+        with entry.lock:
+            entry.uses += 1
+            entry.last_used = time.time()
+            yield entry.model
+    finally:
+        with _registry_lock:
+            entry.in_use -= 1
+            _evict_to_budget()
+
+
+def preload_models(model_sizes=None):
+    """Load the given models (default: WHISPER_PRELOAD_MODELS) so the first job does not pay for it."""
+    if model_sizes is None:
+        model_sizes = [size.strip() for size in WHISPER_PRELOAD_MODELS.split(',') if size.strip()]
+
+    for model_size in model_sizes:
+        try:
+            with whisper_model(model_size):
+                pass
+        except Exception as e:
+            logger.error(f"Failed to preload Whisper {model_size} model: {e}")
+
+
+def list_loaded_models():
+    """Describe the models currently resident in this process, most recently used last."""
+    with _registry_lock:
+        entries = list(_models.values())
+
+    return {
+        "models": [
+            {
+                "backend": entry.backend.name,
+                "model_size": entry.model_size,
+                "device": entry.device,
+                "status": "loaded" if entry.model is not None else "loading",
+                "memory_mb": round(entry.memory_bytes / (1024 * 1024), 1),
+                "loaded_at": entry.loaded_at,
+                "last_used": entry.last_used,
+                "uses": entry.uses,
+                "in_use": entry.in_use > 0
+            }
+            for entry in entries
+        ],
+        "resident_mb": round(sum(entry.memory_bytes for entry in entries) / (1024 * 1024), 1),
+        "memory_budget_mb": WHISPER_MODEL_MEMORY_MB if WHISPER_MODEL_MEMORY_MB > 0 else "unlimited"
+    }
@@ -0,0 +1,238 @@
+import json
+import threading
+import time
+
+import fakeredis
+import pytest
+
+from services.job_executor import QueuedJob, CPU_POOL, IO_POOL
+from services.redis_job_queue import RedisJobExecutor
+
+PREFIX = "test:jobs"
+ENDPOINT = "/v1/test/echo"
+
+
+@pytest.fixture
+def client():
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+class Harness:
+    """Collects the callbacks a RedisJobExecutor makes so tests can assert on them."""
+
+    def __init__(self, registry=None):
+        self.registry = {} if registry is None else registry
+        self.ran = []
+        self.failed = []
+        self.done = threading.Event()
+
+    def resolve_task(self, task_name, job_id, data, args, kwargs):
+        f = self.registry[task_name]
+        return lambda: f(job_id=job_id, data=data, *args, **kwargs)
+
+    def run_job(self, job):
+        self.ran.append(job.task_func())
+        self.done.set()
+
+    def fail_job(self, job, message):
+        self.failed.append((job.job_id, message))
+
+    def executor(self, client, **kwargs):
+        kwargs.setdefault("key_prefix", PREFIX)
+        kwargs.setdefault("visibility_timeout", 30)
+        kwargs.setdefault("max_attempts", 2)
+        kwargs.setdefault("poll_interval", 0.01)
+        return RedisJobExecutor(
+            self.run_job,
+            {CPU_POOL: 1, IO_POOL: 1},
+            kwargs.pop("endpoint_limits", {}),
+            client,
+            self.resolve_task,
+            self.fail_job,
+            **kwargs
+        )
+
+
+def echo(job_id, data):
+    return (job_id, data["value"])
+
+
+def make_job(job_id, pool=CPU_POOL, endpoint=ENDPOINT):
+    return QueuedJob(job_id, {"value": job_id}, None, endpoint, pool, time.time(), task_name="echo")
+
+
+def pending(client, pool=CPU_POOL):
+    return client.lrange(f"{PREFIX}:pending:{pool}", 0, -1)
+
+
+def processing(client):
+    return client.zrange(f"{PREFIX}:processing", 0, -1, withscores=True)
+
+
+def attempts(client, job_id):
+    return json.loads(client.get(f"{PREFIX}:job:{job_id}"))["attempts"]
+
+
+def test_claim_is_fifo_and_leases_the_job(client):
+    harness = Harness({"echo": echo})
+    executor = harness.executor(client)
+    executor.submit(make_job("a"))
+    executor.submit(make_job("b"))
+    assert executor.qsize() == 2
+
+    before = time.time()
+    job = executor._claim_next(CPU_POOL)
+
+    assert job.job_id == "a"
+    assert job.task_func() == ("a", "a")
+    assert pending(client) == ["b"]
+    [(leased_id, deadline)] = processing(client)
+    assert leased_id == "a"
+    assert deadline >= before + 30
+    assert attempts(client, "a") == 1
+
+
+def test_a_job_is_claimed_by_only_one_executor(client):
+    first = Harness({"echo": echo}).executor(client)
+    second = Harness({"echo": echo}).executor(client)
+    first.submit(make_job("a"))
+
+    assert first._claim_next(CPU_POOL).job_id == "a"
+    assert second._claim_next(CPU_POOL) is None
+
+
+def test_jobs_stay_in_their_pool(client):
+    executor = Harness({"echo": echo}).executor(client)
+    executor.submit(make_job("a", pool=IO_POOL))
+
+    assert executor._claim_next(CPU_POOL) is None
+    assert executor._claim_next(IO_POOL).job_id == "a"
+
+
+def test_endpoint_limit_releases_job_behind_the_others(client):
+    executor = Harness({"echo": echo}).executor(client, endpoint_limits={ENDPOINT: 1})
+    executor.submit(make_job("a"))
+    executor.submit(make_job("b"))
+    executor.submit(make_job("c", endpoint="/v1/test/other"))
+
+    assert executor._claim_next(CPU_POOL).job_id == "a"
+    assert executor._claim_next(CPU_POOL) is None
+    assert pending(client) == ["b", "c"]
+    assert attempts(client, "b") == 0
+
+    # The job for an endpoint with free capacity is not stuck behind it
+    assert executor._claim_next(CPU_POOL).job_id == "c"
+    assert [job_id for job_id, _ in processing(client)] == ["a", "c"]
+
+
+def test_heartbeat_extends_only_local_leases(client):
+    executor = Harness({"echo": echo}).executor(client)
+    executor.submit(make_job("a"))
+    executor._claim_next(CPU_POOL)
+    client.zadd(f"{PREFIX}:processing", {"a": time.time() - 1})
+
+    executor._extend_leases()
+
+    [(_, deadline)] = processing(client)
+    assert deadline > time.time() + 20
+
+    # A lease that was already reclaimed elsewhere is not resurrected
+    client.zrem(f"{PREFIX}:processing", "a")
+    executor._extend_leases()
+    assert processing(client) == []
+
+
+def test_expired_lease_is_requeued_for_another_worker(client):
+    crashed = Harness({"echo": echo}).executor(client)
+    survivor = Harness({"echo": echo}).executor(client)
+    crashed.submit(make_job("a"))
+    crashed._claim_next(CPU_POOL)
+
+    # The owner stops heartbeating and its lease runs out
+    client.zadd(f"{PREFIX}:processing", {"a": time.time() - 1})
+    survivor._requeue_expired()
+
+    assert processing(client) == []
+    assert pending(client) == ["a"]
+    job = survivor._claim_next(CPU_POOL)
+    assert job.job_id == "a"
+    assert attempts(client, "a") == 2
+
+
+def test_job_fails_after_max_attempts(client):
+    harness = Harness({"echo": echo})
+    executor = harness.executor(client, max_attempts=2)
+    executor.submit(make_job("a"))
+
+    for _ in range(2):
+        assert executor._claim_next(CPU_POOL).job_id == "a"
+        client.zadd(f"{PREFIX}:processing", {"a": time.time() - 1})
+        executor._requeue_expired()
+
+    assert pending(client) == []
+    assert processing(client) == []
+    assert client.get(f"{PREFIX}:job:a") is None
+    assert len(harness.failed) == 1
+    job_id, message = harness.failed[0]
+    assert job_id == "a"
+    assert "2 attempt(s)" in message
+
+
+def test_unresolvable_task_is_returned_to_the_queue(client):
+    harness = Harness({})
+    executor = harness.executor(client, max_attempts=3)
+    executor.submit(make_job("a"))
+    executor.submit(make_job("b"))
+
+    assert executor._claim_next(CPU_POOL) is None
+
+    # The job goes behind the others instead of being acked and failed
+    assert harness.failed == []
+    assert processing(client) == []
+    assert pending(client) == ["a", "b"]
+    assert attempts(client, "a") == 1
+
+    # A process that serves the endpoint still runs it
+    other = Harness({"echo": echo}).executor(client)
+    assert other._claim_next(CPU_POOL).job_id == "b"
+    assert other._claim_next(CPU_POOL).job_id == "a"
+
+
+def test_unresolvable_task_fails_after_max_attempts(client):
+    harness = Harness({})
+    executor = harness.executor(client, max_attempts=2)
+    executor.submit(make_job("a"))
+
+    assert executor._claim_next(CPU_POOL) is None
+    assert harness.failed == []
+    assert executor._claim_next(CPU_POOL) is None
+
+    assert pending(client) == []
+    assert processing(client) == []
+    assert client.get(f"{PREFIX}:job:a") is None
+    assert len(harness.failed) == 1
+    job_id, message = harness.failed[0]
+    assert job_id == "a"
+    assert "Cannot resolve task echo" in message
+
+
+def test_jobs_persisted_before_restart_run_once_tasks_are_registered(client):
+    previous = Harness({"echo": echo}).executor(client)
+    previous.submit(make_job("a"))
+
+    # A new process builds its executor before the route modules have
+    # registered their tasks, then registers them and starts the workers
+    registry = {}
+    harness = Harness(registry)
+    executor = harness.executor(client)
+    registry["echo"] = echo
+    executor.start()
+
+    assert harness.done.wait(5)
+    assert harness.ran == [("a", "a")]
+    assert harness.failed == []
+    deadline = time.time() + 5
+    while client.exists(f"{PREFIX}:job:a") and time.time() < deadline:
+        time.sleep(0.01)
+    assert client.get(f"{PREFIX}:job:a") is None
+    assert processing(client) == []